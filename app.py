@@ -1,8 +1,6 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort
 from werkzeug.utils import secure_filename
 import os
-import pandas as pd
-import json
 from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
@@ -14,8 +12,24 @@ import logging
 import random
 from dotenv import load_dotenv
 
-from ccpayroll.database import get_db, init_db
-from ccpayroll.database.migration import save_timesheet_entry, save_pay_period, migrate_database
+from ccpayroll.database import get_db, close_db
+from ccpayroll.database.cache import employee_roster
+from ccpayroll.database.commands import register_commands
+from ccpayroll.database.jobs import get_job
+from ccpayroll.database.migration import migrate_json_to_db
+from ccpayroll.database.notify import get_listener
+from ccpayroll.database.schema import upgrade_database, verify_schema_version
+from ccpayroll.importer import check_workbook_path
+from ccpayroll.models.adjustment import Adjustment, ADJUSTMENT_KINDS
+from ccpayroll.models.crew import Crew, group_roster
+from ccpayroll.models.period_grid import PeriodGrid, TEXT_FIELDS
+from ccpayroll.reports.aggregate import aggregate_payroll
+from ccpayroll.reports.artifacts import ArtifactStore, artifact_key
+from ccpayroll.reports.workbook import write_timesheet_workbook
+from ccpayroll.models.timesheet_entry import TimesheetEntry, EDITABLE_FIELDS
+from ccpayroll.routes.jobs import jobs, job_status
+from ccpayroll.routes.metrics import metrics
+from ccpayroll.worker import job_handler, submit_job
 
 # Load environment variables
 load_dotenv()
@@ -28,11 +42,24 @@ app.secret_key = os.environ.get('SECRET_KEY', 'creative_closets_payroll_app')
 def inject_now():
     return {'now': datetime.now()}
 
+# Return pooled database connections at the end of each request
+@app.teardown_appcontext
+def teardown_db(exception):
+    close_db()
+
+# Expose database pool and query metrics at /metrics
+app.register_blueprint(metrics)
+
+# Background job status and downloads at /jobs
+app.register_blueprint(jobs)
+
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
 DATA_FOLDER = 'data'
 REPORTS_FOLDER = 'static/reports'
+# Generated workbooks hold pay data, so they are kept out of the static folder
+EXPORTS_FOLDER = os.path.join(UPLOAD_FOLDER, 'exports')
 
 # Create necessary directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -84,7 +111,7 @@ def allowed_file(filename):
 def get_pay_periods():
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM pay_periods ORDER BY start_date DESC')
+        cursor.execute('SELECT * FROM pay_periods ORDER BY start_on DESC')
         return cursor.fetchall()
 
 def save_employee(employee_data):
@@ -105,16 +132,10 @@ def save_employee(employee_data):
             employee_data.setdefault('salary', None)
             employee_data.setdefault('commission_rate', None)
             
-            # Check if employee already exists with this name
-            cursor.execute('SELECT id FROM employees WHERE name = %s', (employee_data['name'],))
-            existing = cursor.fetchone()
-            
+            # If an employee already exists with this name, update it
+            existing = employee_roster.get('name', employee_data['name'])
             if existing:
-                # If employee exists, update with ID from database
-                if isinstance(existing, dict):
-                    employee_data['id'] = existing['id']
-                else:
-                    employee_data['id'] = existing[0]
+                employee_data['id'] = existing['id']
             
             cursor.execute(
                 'INSERT INTO employees (id, name, rate, install_crew, position, pay_type, salary, commission_rate) '
@@ -131,128 +152,25 @@ def save_employee(employee_data):
                 )
             )
             conn.commit()
-            return True
+        employee_roster.invalidate()
+        return True
     except Exception as e:
         logger.error(f"Error saving employee {employee_data.get('name', 'unknown')}: {str(e)}")
         return False
 
 def get_employees():
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM employees ORDER BY name')
-        return cursor.fetchall()
+    """Return all employees, ordered by name, from the process-wide roster cache"""
+    return list(employee_roster.rows())
 
 def get_timesheet(period_id):
-    """Get timesheet data for a pay period"""
-    timesheet = {}
-    
-    # Get employees
-    employees = get_employees()
-    
-    # Get timesheet entries
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT * FROM timesheet_entries WHERE period_id = %s',
-            (period_id,)
-        )
-        entries = cursor.fetchall()
-
-        # Debug - log all entries with reimbursement values
-        for entry in entries:
-            if entry.get('reimbursement'):
-                print(f"DEBUG: Found reimbursement value {entry['reimbursement']} for {entry['employee_name']} on day {entry['day']}")
-    
-    # Get pay period details
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM pay_periods WHERE id = %s', (period_id,))
-        period = cursor.fetchone()
-    
-    if not period:
-        return timesheet
-    
-    # Calculate date range
-    start_date = datetime.strptime(period['start_date'], '%Y-%m-%d')
-    end_date = datetime.strptime(period['end_date'], '%Y-%m-%d')
-    days = []
-    current_date = start_date
-    while current_date <= end_date:
-        days.append(current_date.strftime('%Y-%m-%d'))
-        current_date += timedelta(days=1)
-    
-    # Initialize timesheet structure
-    for employee in employees:
-        timesheet[employee['name']] = {}
-        for day in days:
-            timesheet[employee['name']][day] = {
-                'hours': '',
-                'pay': '',
-                'project_name': '',
-                'install_days': '',
-                'install': '',
-                'regular_hours': 0,
-                'overtime_hours': 0,
-                'job_name': '',
-                'notes': '',
-                'reimbursement': ''
-            }
-    
-    # Fill in timesheet entries from database
-    for entry in entries:
-        employee_name = entry['employee_name']
-        day = entry['day']
-        
-        if employee_name in timesheet and day in timesheet[employee_name]:
-            # Fill in all fields from the entry
-            for field in ['hours', 'pay', 'project_name', 'install_days', 'install', 
-                         'regular_hours', 'overtime_hours', 'job_name', 'notes', 'reimbursement']:
-                # Check if the field exists in the entry dictionary
-                if field in entry and entry[field] is not None:
-                    timesheet[employee_name][day][field] = entry[field]
-    
-    # Process reimbursements - this is critical for persistence
-    print(f"DEBUG: Processing reimbursements for timesheet {period_id}")
+    """Get timesheet data for a pay period
     
-    # Create a separate dictionary to store reimbursement values by employee
-    employee_reimbursements = {}
-    
-    # First scan the database entries directly for any reimbursement values
-    for entry in entries:
-        employee_name = entry['employee_name']
-        if entry.get('reimbursement') and entry['reimbursement'].strip():
-            print(f"DEBUG: Found reimbursement in DB: {entry['reimbursement']} for {employee_name} on day {entry['day']}")
-            employee_reimbursements[employee_name] = entry['reimbursement']
-    
-    # Apply the reimbursement values to all days for each employee
-    for employee_name, reimbursement_value in employee_reimbursements.items():
-        if employee_name in timesheet:
-            print(f"DEBUG: Applying reimbursement {reimbursement_value} for {employee_name} to all days")
-            # Apply to all days
-            for day in timesheet[employee_name]:
-                timesheet[employee_name][day]['reimbursement'] = reimbursement_value
-            
-            # Also ensure it's saved to the first day
-            first_day = days[0] if days else None
-            if first_day:
-                print(f"DEBUG: Ensuring reimbursement {reimbursement_value} is on first day {first_day}")
-                # Check if we need to save it to the database
-                try:
-                    with get_db() as conn:
-                        cursor = conn.cursor()
-                        cursor.execute(
-                            'SELECT reimbursement FROM timesheet_entries WHERE period_id = %s AND employee_name = %s AND day = %s',
-                            (period_id, employee_name, first_day)
-                        )
-                        first_day_entry = cursor.fetchone()
-                        
-                        if not first_day_entry or not first_day_entry.get('reimbursement'):
-                            print(f"DEBUG: Saving reimbursement {reimbursement_value} to first day {first_day}")
-                            save_timesheet_entry(period_id, employee_name, first_day, 'reimbursement', reimbursement_value)
-                except Exception as e:
-                    print(f"ERROR: Failed to ensure reimbursement on first day: {str(e)}")
-    
-    return timesheet
+    Builds an employee -> day -> fields grid from the stored entries (see
+    PeriodGrid.to_timesheet). This is a pure read: it never writes, even to
+    repair data. Code that only needs numbers should use PeriodGrid directly.
+    """
+    grid = PeriodGrid.load(period_id, text_fields=TEXT_FIELDS)
+    return grid.to_timesheet() if grid else {}
 
 def save_pay_period(period_data):
     """Save a pay period to the database"""
@@ -281,67 +199,41 @@ def generate_report(period_id=None):
         # Process all periods
         periods_to_process = pay_periods
     
-    # Initialize data structures for report
-    employee_total_pay = {emp['name']: 0 for emp in employees}
-    employee_reimbursements = {emp['name']: 0 for emp in employees}
-    employee_pay_by_period = {emp['name']: [] for emp in employees}
-    period_totals = {}
+    # Charts are cached under a hash of the periods and their data generations
+    report_id = artifact_key('payroll_charts', [p['id'] for p in periods_to_process])
+    
+    # Sum pay and reimbursements for every employee and period at once
+    names = [emp['name'] for emp in employees]
+    totals = aggregate_payroll([p['id'] for p in periods_to_process], names)
+    pay, reimbursements = totals['pay'], totals['reimbursement']
     
-    # Process each pay period
+    employee_total_pay = {name: float(value) for name, value in pay.sum(axis=1).items()}
+    employee_reimbursements = {name: float(value) for name, value in reimbursements.sum(axis=1).items()}
+    employee_pay_by_period = {
+        name: [
+            {
+                'period': period['name'],
+                'pay': float(pay.at[name, period['id']]),
+                'reimbursement': float(reimbursements.at[name, period['id']])
+            }
+            for period in periods_to_process
+        ]
+        for name in names
+    }
+    
+    period_totals = {}
+    pay_sums, reimbursement_sums = pay.sum(axis=0), reimbursements.sum(axis=0)
     for period in periods_to_process:
-        period_id = period['id']
-        timesheet = get_timesheet(period_id)
-        
-        period_total = 0
-        period_reimbursement_total = 0
         period_data = {'period': period['name']}
-        
-        # Process each employee
-        for employee in employees:
-            emp_name = employee['name']
-            employee_total = 0
-            employee_reimbursement = 0
-            
-            # Get employee data for this period
-            if emp_name in timesheet:
-                # Process pay
-                for day, day_data in timesheet[emp_name].items():
-                    if 'pay' in day_data and day_data['pay']:
-                        try:
-                            pay = float(day_data['pay'])
-                            employee_total += pay
-                        except (ValueError, TypeError):
-                            pass
-                
-                # Process reimbursement (only stored on first day)
-                first_day = sorted(timesheet[emp_name].keys())[0] if timesheet[emp_name] else None
-                if first_day and 'reimbursement' in timesheet[emp_name][first_day] and timesheet[emp_name][first_day]['reimbursement']:
-                    try:
-                        reimbursement = float(timesheet[emp_name][first_day]['reimbursement'])
-                        employee_reimbursement = reimbursement
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Update totals
-            employee_total_pay[emp_name] += employee_total
-            employee_reimbursements[emp_name] += employee_reimbursement
-            employee_pay_by_period[emp_name].append({
-                'period': period['name'],
-                'pay': employee_total,
-                'reimbursement': employee_reimbursement
-            })
-            
-            period_data[emp_name] = employee_total
-            period_data[f"{emp_name}_reimbursement"] = employee_reimbursement
-            period_total += employee_total
-            period_reimbursement_total += employee_reimbursement
-        
-        period_data['total'] = period_total
-        period_data['reimbursement_total'] = period_reimbursement_total
+        for name in names:
+            period_data[name] = float(pay.at[name, period['id']])
+            period_data[f"{name}_reimbursement"] = float(reimbursements.at[name, period['id']])
+        period_data['total'] = float(pay_sums[period['id']])
+        period_data['reimbursement_total'] = float(reimbursement_sums[period['id']])
         period_totals[period['name']] = period_data
     
     # Generate visualizations
-    report_id = str(uuid.uuid4())
+    chart_store = ArtifactStore(REPORTS_FOLDER)
     
     # Filter to employees with non-zero pay
     active_employees = [emp['name'] for emp in employees if employee_total_pay[emp['name']] > 0]
@@ -349,35 +241,40 @@ def generate_report(period_id=None):
     if active_employees:
         # Only generate multi-period graphs if we have more than one period
         if len(periods_to_process) > 1:
-            plt.figure(figsize=(12, 6))
-            for employee in active_employees:
-                periods = [p['period'] for p in employee_pay_by_period[employee]]
-                pays = [p['pay'] for p in employee_pay_by_period[employee]]
-                if any(pay > 0 for pay in pays):
-                    plt.plot(range(len(periods)), pays, marker='o', label=employee)
-            
-            plt.title('Pay Trend Over Time')
-            plt.xlabel('Pay Period')
-            plt.ylabel('Pay Amount ($)')
-            plt.xticks(range(len(periods_to_process)), [p['name'] for p in periods_to_process], rotation=45, ha='right')
-            plt.legend()
-            plt.grid(True, linestyle='--', alpha=0.7)
-            plt.tight_layout()
-            plt.savefig(os.path.join(REPORTS_FOLDER, f'pay_trend_over_time_{report_id}.png'))
-            plt.close()
+            def build_pay_trend(path):
+                plt.figure(figsize=(12, 6))
+                for employee in active_employees:
+                    periods = [p['period'] for p in employee_pay_by_period[employee]]
+                    pays = [p['pay'] for p in employee_pay_by_period[employee]]
+                    if any(pay > 0 for pay in pays):
+                        plt.plot(range(len(periods)), pays, marker='o', label=employee)
+                
+                plt.title('Pay Trend Over Time')
+                plt.xlabel('Pay Period')
+                plt.ylabel('Pay Amount ($)')
+                plt.xticks(range(len(periods_to_process)), [p['name'] for p in periods_to_process], rotation=45, ha='right')
+                plt.legend()
+                plt.grid(True, linestyle='--', alpha=0.7)
+                plt.tight_layout()
+                plt.savefig(path)
+                plt.close()
             
             # Total Payroll by Period
-            plt.figure(figsize=(12, 6))
-            period_names = [p['name'] for p in periods_to_process]
-            period_sums = [sum(period_totals[p]['total'] for p in period_names if p in period_totals)]
-            plt.bar(range(len(period_names)), period_sums)
-            plt.title('Total Payroll by Period')
-            plt.xlabel('Pay Period')
-            plt.ylabel('Total Payroll ($)')
-            plt.xticks(range(len(period_names)), period_names, rotation=45, ha='right')
-            plt.tight_layout()
-            plt.savefig(os.path.join(REPORTS_FOLDER, f'total_payroll_by_period_{report_id}.png'))
-            plt.close()
+            def build_total_payroll(path):
+                plt.figure(figsize=(12, 6))
+                period_names = [p['name'] for p in periods_to_process]
+                period_sums = [float(pay_sums[p['id']]) for p in periods_to_process]
+                plt.bar(range(len(period_names)), period_sums)
+                plt.title('Total Payroll by Period')
+                plt.xlabel('Pay Period')
+                plt.ylabel('Total Payroll ($)')
+                plt.xticks(range(len(period_names)), period_names, rotation=45, ha='right')
+                plt.tight_layout()
+                plt.savefig(path)
+                plt.close()
+            
+            chart_store.get_or_create(report_id, 'pay_trend_over_time.png', build_pay_trend)
+            chart_store.get_or_create(report_id, 'total_payroll_by_period.png', build_total_payroll)
     
     return {
         'report_id': report_id,
@@ -407,16 +304,12 @@ def index():
         'total_overtime_hours': 0
     }
     
-    # If there's a current period, get timesheet data
+    # If there's a current period, add up its per-employee totals
     if current_period:
-        timesheet = get_timesheet(current_period['id'])
-        
-        # Calculate totals from timesheet entries
-        for employee_entries in timesheet.values():
-            for day_data in employee_entries.values():
-                stats['total_entries'] += 1
-                stats['total_regular_hours'] += float(day_data.get('regular_hours', 0))
-                stats['total_overtime_hours'] += float(day_data.get('overtime_hours', 0))
+        for totals in TimesheetEntry.get_period_totals(current_period['id']).values():
+            stats['total_entries'] += totals['entries']
+            stats['total_regular_hours'] += totals['regular_hours']
+            stats['total_overtime_hours'] += totals['overtime_hours']
     
     return render_template('index.html', 
                          pay_periods=pay_periods[:5],  # Show only 5 most recent pay periods
@@ -463,12 +356,9 @@ def add_employee():
             return redirect(url_for('add_employee'))
         
         # Check if employee already exists
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT id FROM employees WHERE name = %s', (name,))
-            if cursor.fetchone():
-                flash('Employee already exists', 'danger')
-                return redirect(url_for('add_employee'))
+        if employee_roster.get('name', name):
+            flash('Employee already exists', 'danger')
+            return redirect(url_for('add_employee'))
         
         # Add new employee
         employee_data = {
@@ -490,12 +380,9 @@ def add_employee():
 
 @app.route('/employees/edit/<employee_id>', methods=['GET', 'POST'])
 def edit_employee(employee_id):
-    # Get the employee from the database
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM employees WHERE id = %s', (employee_id,))
-        row = cursor.fetchone()
-        employee = dict(row) if row else None
+    # Get the employee from the roster cache
+    row = employee_roster.get('id', employee_id)
+    employee = dict(row) if row else None
     
     if not employee:
         flash('Employee not found', 'danger')
@@ -556,6 +443,7 @@ def delete_employee(employee_id):
         cursor = conn.cursor()
         cursor.execute('DELETE FROM employees WHERE id = %s', (employee_id,))
         conn.commit()
+    employee_roster.invalidate()
     
     flash('Employee deleted successfully', 'success')
     return redirect(url_for('employees'))
@@ -563,7 +451,8 @@ def delete_employee(employee_id):
 @app.route('/pay-periods')
 def pay_periods():
     pay_periods_list = get_pay_periods()
-    return render_template('pay_periods.html', pay_periods=pay_periods_list)
+    export_years = sorted({p['start_date'][:4] for p in pay_periods_list}, reverse=True)
+    return render_template('pay_periods.html', pay_periods=pay_periods_list, export_years=export_years)
 
 @app.route('/pay-periods/add', methods=['GET', 'POST'])
 def add_pay_period():
@@ -658,51 +547,7 @@ def timesheet(period_id):
         current_date += timedelta(days=1)
     
     # Organize employees by position and crew
-    position_groups = {
-        'install_crews': {},  # Installers (grouped by crew)
-        'project_managers': [],
-        'engineers': [],
-        'salesmen': [],
-        'ceo': [],
-        'other': []
-    }
-    
-    # First, organize installers by crew
-    for employee in employees:
-        position = employee.get('position', 'none')
-        crew_num = employee.get('install_crew', 0)
-        
-        if position in ['lead', 'assistant'] and crew_num > 0:
-            if crew_num not in position_groups['install_crews']:
-                position_groups['install_crews'][crew_num] = []
-            position_groups['install_crews'][crew_num].append(employee)
-        elif position == 'project_manager':
-            position_groups['project_managers'].append(employee)
-        elif position == 'engineer':
-            position_groups['engineers'].append(employee)
-        elif position == 'salesman':
-            position_groups['salesmen'].append(employee)
-        elif position == 'ceo':
-            position_groups['ceo'].append(employee)
-        else:
-            position_groups['other'].append(employee)
-    
-    # Sort installers within each crew - lead installers first, then assistant installers
-    for crew_num in position_groups['install_crews']:
-        position_groups['install_crews'][crew_num] = sorted(position_groups['install_crews'][crew_num], 
-            key=lambda emp: (
-                0 if emp.get('position') == 'lead' else 
-                1 if emp.get('position') == 'assistant' else 2,
-                emp.get('name', '')  # Secondary sort by name
-            )
-        )
-    
-    # Sort crews by number
-    sorted_install_crews = sorted(position_groups['install_crews'].items())
-    
-    # Sort other groups by name
-    for key in ['project_managers', 'engineers', 'salesmen', 'ceo', 'other']:
-        position_groups[key] = sorted(position_groups[key], key=lambda emp: emp.get('name', ''))
+    position_groups, sorted_install_crews = group_roster(employees)
     
     return render_template('timesheet.html', 
                           period=period, 
@@ -727,54 +572,19 @@ def update_timesheet(period_id):
         calculate_only = data.get('calculate_only', False)
         
         response_data = {'success': True}
+        values = {field: value}
         
-        # Direct handling path for reimbursement
-        if field == 'reimbursement':
-            # Always use first day of the period for reimbursement
-            with get_db() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT start_date FROM pay_periods WHERE id = %s', (period_id,))
-                period = cursor.fetchone()
-                if period:
-                    first_day = period['start_date']
-                    print(f"REIMBURSEMENT SAVE: {value} for {employee} on first day {first_day}")
-                    
-                    # Direct DB save for reimbursement
-                    try:
-                        # Check if timesheet_entries has reimbursement column
-                        try:
-                            cursor.execute("""
-                                SELECT column_name 
-                                FROM information_schema.columns 
-                                WHERE table_name='timesheet_entries' AND column_name='reimbursement'
-                            """)
-                            column_exists = cursor.fetchone() is not None
-                            
-                            if not column_exists:
-                                # Add the column if it doesn't exist
-                                cursor.execute("""
-                                    ALTER TABLE timesheet_entries
-                                    ADD COLUMN reimbursement TEXT
-                                """)
-                                conn.commit()
-                                print("Added missing reimbursement column!")
-                        except Exception as e:
-                            print(f"Error checking/adding column: {str(e)}")
-                        
-                        # Save the value
-                        from ccpayroll.database.migration import save_timesheet_entry
-                        save_timesheet_entry(period_id, employee, first_day, 'reimbursement', value)
-                        
-                        return jsonify({'success': True, 'message': 'Reimbursement value saved'})
-                    except Exception as e:
-                        print(f"REIMBURSEMENT SAVE ERROR: {str(e)}")
-                        return jsonify({'success': False, 'error': f'Failed to save reimbursement: {str(e)}'})
+        # Reimbursements, bonuses and deductions are stored once per period
+        if field in ADJUSTMENT_KINDS:
+            if not calculate_only:
+                Adjustment.set_amounts(period_id, {(employee, field): value})
+                response_data['totals'] = TimesheetEntry.get_period_totals(period_id, [employee]).get(employee)
+                response_data['message'] = f'{field.capitalize()} value saved'
+            return jsonify(response_data)
         
-        # For non-reimbursement fields, continue with normal processing
+        # Hours also set the day's pay from the employee's hourly rate
         if field == 'hours' and value:
-            # Get employee to check hourly rate
-            employees = get_employees()
-            employee_data = next((e for e in employees if e['name'] == employee), None)
+            employee_data = employee_roster.get('name', employee)
             
             if employee_data:
                 # Check for both 'hourly_rate' and 'rate' fields for compatibility
@@ -792,30 +602,19 @@ def update_timesheet(period_id):
                 
                 if hourly_rate:
                     try:
-                        hours = float(value)
-                        pay = hours * hourly_rate
+                        pay = float(value) * hourly_rate
                         response_data['pay'] = f"{pay:.2f}"
-                        
-                        # Only update the pay field if not in calculate_only mode
-                        if not calculate_only:
-                            from ccpayroll.database.migration import save_timesheet_entry
-                            save_timesheet_entry(period_id, employee, day, 'pay', f"{pay:.2f}")
+                        values['pay'] = response_data['pay']
                     except (ValueError, TypeError) as e:
-                        print(f"Error calculating pay: {str(e)}")
-            
-            # Always update hours field unless in calculate_only mode
-            if not calculate_only:
-                from ccpayroll.database.migration import save_timesheet_entry
-                save_timesheet_entry(period_id, employee, day, field, value)
-        else:
-            # For other fields, just update normally
-            if not calculate_only and field != 'reimbursement':  # We already handled reimbursement above
-                from ccpayroll.database.migration import save_timesheet_entry
-                save_timesheet_entry(period_id, employee, day, field, value)
+                        logger.warning(f"Error calculating pay: {str(e)}")
+        
+        # One upsert writes every changed field and returns the employee's totals
+        if not calculate_only:
+            response_data['totals'] = TimesheetEntry.upsert(period_id, employee, day, values)
             
         return jsonify(response_data)
     except Exception as e:
-        print(f"Error in update_timesheet: {str(e)}")
+        logger.error(f"Error in update_timesheet: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/reports')
@@ -836,20 +635,73 @@ def generate_report_route():
                            report=report, 
                            report_id=report['report_id'])
 
-@app.route('/get_employee_rate')
-def get_employee_rate():
-    name = request.args.get('name')
-    if not name:
-        return jsonify({'success': False, 'error': 'Employee name is required'})
-    
-    employees = get_employees()
-    employee = next((e for e in employees if e['name'] == name), None)
+# Timesheet fields that must hold a number (or be blank)
+NUMERIC_TIMESHEET_FIELDS = ('hours', 'pay', 'install_days', 'install',
+                            'regular_hours', 'overtime_hours') + ADJUSTMENT_KINDS
+
+def validate_timesheet_change(change):
+    """Return an error message for an invalid batch change, or None"""
+    if not isinstance(change, dict) or not all(k in change for k in ('employee', 'day', 'field', 'value')):
+        return 'Missing required fields'
+    if change['field'] not in EDITABLE_FIELDS and change['field'] not in ADJUSTMENT_KINDS:
+        return f"Invalid field '{change['field']}'"
+    if change['field'] in NUMERIC_TIMESHEET_FIELDS and change['value'] not in ('', None):
+        try:
+            float(change['value'])
+        except (ValueError, TypeError):
+            return f"{change['field']} must be a number"
+    return None
+
+@app.route('/timesheet/<period_id>/batch', methods=['POST'])
+def batch_update_timesheet(period_id):
+    """Validate and apply several timesheet changes in one transaction
     
-    if not employee:
-        return jsonify({'success': False, 'error': 'Employee not found'})
+    Expects a JSON array of {employee, day, field, value} changes. Nothing is
+    written unless every change is valid. Returns the pay derived from hours
+    changes and the new period totals of every touched employee.
+    """
+    try:
+        changes = request.json
+        if not isinstance(changes, list) or not changes:
+            return jsonify({'success': False, 'error': 'Expected a list of changes'})
+        
+        errors = []
+        for index, change in enumerate(changes):
+            error = validate_timesheet_change(change)
+            if error:
+                errors.append({'index': index, 'error': error})
+        if errors:
+            return jsonify({'success': False, 'error': 'Invalid changes', 'errors': errors})
+        
+        writes = []
+        pay = {}
+        for change in changes:
+            employee, day, field = change['employee'], change['day'], change['field']
+            value = '' if change['value'] is None else change['value']
+            writes.append({'employee': employee, 'day': day, 'field': field, 'value': value})
+            
+            # Derive pay from the employee's hourly rate
+            employee_data = employee_roster.get('name', employee) if field == 'hours' and value != '' else None
+            if employee_data and employee_data['rate']:
+                amount = f"{float(value) * employee_data['rate']:.2f}"
+                writes.append({'employee': employee, 'day': day, 'field': 'pay', 'value': amount})
+                pay.setdefault(employee, {})[day] = amount
+        
+        totals = TimesheetEntry.upsert_many(period_id, writes)
+        return jsonify({'success': True, 'pay': pay, 'totals': totals})
+    except Exception as e:
+        logger.error(f"Error in batch_update_timesheet: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/timesheet/<period_id>/crew-pay')
+def crew_pay(period_id):
+    """Lead and assistant pay for every install crew and day of a pay period
     
-    rate = employee.get('rate', 0)
-    return jsonify({'success': True, 'rate': rate})
+    Pass ?crew=<number> to calculate a single crew.
+    """
+    crew_number = request.args.get('crew', type=int)
+    crews = Crew.calculate_period_pay(period_id, crew_number)
+    return jsonify({'success': True, 'crews': crews})
 
 @app.route('/import', methods=['GET', 'POST'])
 def import_data():
@@ -869,149 +721,34 @@ def import_data():
         
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
             try:
-                # Process the Excel file
-                xl = pd.ExcelFile(filepath)
-                sheet_names = xl.sheet_names
-                
-                # Skip the first sheet which is a template
-                sheet_names = [sheet for sheet in sheet_names if sheet != 'PAYROLL TIMESHEET']
-                
-                # Process each sheet (pay period)
-                for sheet in sheet_names:
-                    df = pd.read_excel(filepath, sheet_name=sheet)
-                    
-                    # Extract period name from sheet name
-                    period_name = sheet.replace('payroll ', '')
-                    
-                    # Create pay period
-                    pay_periods = get_pay_periods()
-                    
-                    # Check if period already exists
-                    if any(p['name'] == period_name for p in pay_periods):
-                        continue
-                    
-                    # Try to parse dates from period name
-                    try:
-                        dates = period_name.split(' to ')
-                        start_date = datetime.strptime(dates[0].strip(), '%m.%d.%y')
-                        end_date = datetime.strptime(dates[1].strip(), '%m.%d.%y')
-                    except:
-                        # Use current date as fallback
-                        start_date = datetime.now()
-                        end_date = start_date + timedelta(days=6)
-                    
-                    # Add new pay period
-                    period_id = str(uuid.uuid4())
-                    pay_periods.append({
-                        'id': period_id,
-                        'name': period_name,
-                        'start_date': start_date.strftime('%Y-%m-%d'),
-                        'end_date': end_date.strftime('%Y-%m-%d')
-                    })
-                    
-                    save_pay_period(pay_periods)
-                    
-                    # Extract employees and timesheet data
-                    employees = get_employees()
-                    employee_names = set()
-                    timesheet = {}
-                    
-                    # Find employee names (they are typically in the first column)
-                    for idx, value in enumerate(df.iloc[:, 0]):
-                        if pd.notna(value) and isinstance(value, str) and value.strip().upper() == value.strip() and len(value.strip()) > 3 and value.strip() not in ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY', 'DAY', 'DATE', 'CREATIVE CLOSETS PAYROLL TIME SHEET']:
-                            employee_names.add(value.strip())
-                    
-                    # Add new employees
-                    for emp_name in employee_names:
-                        if not any(emp['name'] == emp_name for emp in employees):
-                            employees.append({
-                                'id': str(uuid.uuid4()),
-                                'name': emp_name,
-                                'rate': '',
-                                'install_crew': 0,
-                                'position': 'none'
-                            })
-                    
-                    save_employee(employees)
-                    
-                    # Find the PAY column
-                    pay_col_idx = None
-                    for col_idx, col_name in enumerate(df.iloc[1]):
-                        if pd.notna(col_name) and isinstance(col_name, str) and 'PAY' in col_name.upper():
-                            pay_col_idx = col_idx
-                            break
-                    
-                    if pay_col_idx is None:
-                        continue
-                    
-                    # Generate days between start and end date
-                    days = []
-                    current_date = start_date
-                    while current_date <= end_date:
-                        days.append(current_date.strftime('%Y-%m-%d'))
-                        current_date += timedelta(days=1)
-                    
-                    # Initialize timesheet for each employee
-                    for employee in employee_names:
-                        timesheet[employee] = {}
-                        
-                        # Find rows for this employee
-                        employee_rows = []
-                        employee_found = False
-                        
-                        for idx, row in df.iterrows():
-                            if pd.notna(row.iloc[0]) and isinstance(row.iloc[0], str) and row.iloc[0].strip() == employee:
-                                employee_found = True
-                            elif employee_found and pd.notna(row.iloc[0]) and isinstance(row.iloc[0], str) and row.iloc[0].strip() in ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']:
-                                employee_rows.append(row)
-                            elif employee_found and pd.notna(row.iloc[0]) and isinstance(row.iloc[0], str) and row.iloc[0].strip().upper() == row.iloc[0].strip() and len(row.iloc[0].strip()) > 3 and row.iloc[0].strip() not in ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY', 'DAY', 'DATE']:
-                                # Found next employee
-                                employee_found = False
-                        
-                        # Map days to employee rows
-                        for i, day in enumerate(days):
-                            if i < len(employee_rows):
-                                row = employee_rows[i]
-                                day_name = datetime.strptime(day, '%Y-%m-%d').strftime('%A').upper()
-                                
-                                # Extract pay
-                                pay = ''
-                                if pd.notna(row.iloc[pay_col_idx]) and row.iloc[pay_col_idx] != '':
-                                    try:
-                                        pay = str(float(row.iloc[pay_col_idx]))
-                                    except (ValueError, TypeError):
-                                        pass
-                                
-                                timesheet[employee][day] = {
-                                    'day': day_name,
-                                    'hours': '',
-                                    'pay': pay
-                                }
-                            else:
-                                day_name = datetime.strptime(day, '%Y-%m-%d').strftime('%A').upper()
-                                timesheet[employee][day] = {
-                                    'day': day_name,
-                                    'hours': '',
-                                    'pay': ''
-                                }
-                    
-                    save_timesheet_entry(period_id, employee, day, field, value)
-                
-                flash('Data imported successfully', 'success')
-                return redirect(url_for('index'))
-            
-            except Exception as e:
-                flash(f'Error importing data: {str(e)}', 'danger')
+                check_workbook_path(filename)
+            except ValueError as e:
+                flash(str(e), 'danger')
                 return redirect(url_for('import_data'))
+            
+            # The workbook is imported by a background worker; the upload is stored with the job
+            job_id = submit_job('workbook_import', upload=file.read(), filename=filename)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({
+                    'job_id': job_id,
+                    'status_url': url_for('jobs.status', job_id=job_id),
+                    'results_url': url_for('import_result', job_id=job_id)
+                }), 202
+            return redirect(url_for('import_result', job_id=job_id))
     
     # Get pay periods to display in the dropdown
     pay_periods = get_pay_periods()
     return render_template('import.html', pay_periods=pay_periods)
 
+@app.route('/import/<job_id>')
+def import_result(job_id):
+    """Show an import job's progress, then its results"""
+    job = get_job(job_id)
+    if not job or job['kind'] != 'workbook_import':
+        abort(404)
+    return render_template('import_result.html', job=job_status(job))
+
 @app.route('/export/<period_id>')
 def export_data(period_id):
     pay_periods = get_pay_periods()
@@ -1021,244 +758,63 @@ def export_data(period_id):
         flash('Pay period not found', 'danger')
         return redirect(url_for('pay_periods'))
     
-    timesheet_data = get_timesheet(period_id)
-    employees = get_employees()
-    
-    # Organize employees by position and crew similar to the timesheet route
-    position_groups = {
-        'install_crews': {},  # Installers (grouped by crew)
-        'project_managers': [],
-        'engineers': [],
-        'salesmen': [],
-        'ceo': [],
-        'other': []
-    }
-    
-    # First, organize installers by crew
-    for employee in employees:
-        position = employee.get('position', 'none')
-        crew_num = employee.get('install_crew', 0)
-        
-        if position in ['lead', 'assistant'] and crew_num > 0:
-            if crew_num not in position_groups['install_crews']:
-                position_groups['install_crews'][crew_num] = []
-            position_groups['install_crews'][crew_num].append(employee)
-        elif position == 'project_manager':
-            position_groups['project_managers'].append(employee)
-        elif position == 'engineer':
-            position_groups['engineers'].append(employee)
-        elif position == 'salesman':
-            position_groups['salesmen'].append(employee)
-        elif position == 'ceo':
-            position_groups['ceo'].append(employee)
-        else:
-            position_groups['other'].append(employee)
-    
-    # Sort installers within each crew - lead installers first, then assistant installers
-    for crew_num in position_groups['install_crews']:
-        position_groups['install_crews'][crew_num] = sorted(position_groups['install_crews'][crew_num], 
-            key=lambda emp: (
-                0 if emp.get('position') == 'lead' else 
-                1 if emp.get('position') == 'assistant' else 2,
-                emp.get('name', '')  # Secondary sort by name
-            )
-        )
-    
-    # Sort crews by number
-    sorted_install_crews = sorted(position_groups['install_crews'].items())
-    
-    # Sort other groups by name
-    for key in ['project_managers', 'engineers', 'salesmen', 'ceo', 'other']:
-        position_groups[key] = sorted(position_groups[key], key=lambda emp: emp.get('name', ''))
-    
-    # Create a DataFrame for export
-    data = []
-    
-    # Add title
-    data.append(['CREATIVE CLOSETS PAYROLL TIME SHEET'])
-    data.append([f'PAY PERIOD: {period["name"]}'])
-    data.append([])  # Empty row
+    # Build the workbook in a background job and wait for it to download
+    job_id = submit_job('period_export', period_ids=[period_id])
+    return redirect(url_for('jobs.wait', job_id=job_id))
+
+@app.route('/export')
+def export_periods():
+    """Export several pay periods as one workbook, a sheet per period
     
-    # Process each install crew
-    for crew_num, crew_employees in sorted_install_crews:
-        data.append([f'INSTALL CREW # {crew_num}'])
-        
-        for employee in crew_employees:
-            # Add employee name
-            data.append([employee['name']])
-            
-            # Add header row
-            header = ['DAY', 'DATE', 'PROJECT NAME', 'DAYS', 'INSTALL', 'HOURS', 'PAY']
-            data.append(header)
-            
-            # Add days
-            total_pay = 0
-            total_hours = 0
-            for day in sorted(timesheet_data.get(employee['name'], {}).keys()):
-                day_data = timesheet_data[employee['name']][day]
-                day_row = [
-                    day_data.get('day', ''),
-                    day,
-                    day_data.get('project_name', ''),
-                    day_data.get('install_days', ''),
-                    day_data.get('install', ''),
-                    day_data.get('hours', ''),
-                    day_data.get('pay', '')
-                ]
-                data.append(day_row)
-                
-                # Calculate totals
-                if day_data.get('hours'):
-                    try:
-                        total_hours += float(day_data['hours'])
-                    except (ValueError, TypeError):
-                        pass
-                
-                if day_data.get('pay'):
-                    try:
-                        total_pay += float(day_data['pay'])
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Add total row
-            data.append(['', '', '', '', '', f'{total_hours:.1f}', f'${total_pay:.2f}'])
-            
-            # Add reimbursement row for non-salesperson 
-            if employee['position'] != 'salesman' and employee['name'] in timesheet_data:
-                first_day = sorted(timesheet_data[employee['name']].keys())[0]
-                reimbursement = timesheet_data[employee['name']][first_day].get('reimbursement', '')
-                if reimbursement:
-                    data.append(['REIMBURSEMENT', '', '', '', '', '', f'${reimbursement}'])
-            
-            # Add empty row
-            data.append([])
+    Takes repeated period_id parameters, or a year to export every pay
+    period starting in it.
+    """
+    pay_periods = get_pay_periods()
+    year = request.args.get('year')
+    if year:
+        periods = [p for p in pay_periods if p['start_date'].startswith(f'{year}-')]
+    else:
+        period_ids = set(request.args.getlist('period_id'))
+        periods = [p for p in pay_periods if p['id'] in period_ids]
     
-    # Process non-install crew employees by position group
-    position_titles = {
-        'project_managers': 'PROJECT MANAGERS',
-        'engineers': 'ENGINEERS',
-        'salesmen': 'SALES TEAM',
-        'ceo': 'EXECUTIVE',
-        'other': 'OTHER EMPLOYEES'
-    }
+    if not periods:
+        flash('No pay periods to export', 'danger')
+        return redirect(url_for('pay_periods'))
     
-    for group_key, title in position_titles.items():
-        if position_groups[group_key]:
-            data.append([title])
-            
-            for employee in position_groups[group_key]:
-                # Add employee name
-                employee_display_name = employee['name']
-                if employee.get('pay_type') == 'salary' and employee.get('salary'):
-                    employee_display_name += f" (Salary: ${employee['salary']}/year)"
-                data.append([employee_display_name])
-                
-                # Add header row
-                is_salaried = employee.get('pay_type') == 'salary' and group_key in ['project_managers', 'engineers', 'ceo']
-                
-                if is_salaried:
-                    # For salaried project managers, engineers, and executives, show a single row
-                    header = ['PERIOD', 'PAY TYPE', 'PROJECT NAME', 'HOURS', 'PAY']
-                    data.append(header)
-                    
-                    # Calculate weekly pay (annual salary / 52 weeks)
-                    weekly_pay = 0
-                    if employee.get('salary'):
-                        try:
-                            weekly_pay = float(employee['salary']) / 52
-                        except (ValueError, TypeError):
-                            pass
-                    
-                    # Add a single row for the pay period
-                    first_day = sorted(timesheet_data.get(employee['name'], {}).keys())[0] if employee['name'] in timesheet_data and timesheet_data[employee['name']] else None
-                    project_name = ""
-                    pay_value = str(round(weekly_pay, 2))
-                    
-                    if first_day and employee['name'] in timesheet_data and first_day in timesheet_data[employee['name']]:
-                        day_data = timesheet_data[employee['name']][first_day]
-                        project_name = day_data.get('project_name', '')
-                        # If pay was manually set, use that instead of calculated weekly pay
-                        if day_data.get('pay'):
-                            pay_value = day_data['pay']
-                    
-                    data.append([
-                        period['name'],
-                        'Salary',
-                        project_name,
-                        'Salaried',
-                        pay_value
-                    ])
-                    
-                    # Add total row
-                    data.append(['', '', '', '', pay_value])
-                    
-                    # Add reimbursement row for non-salesperson
-                    if employee['position'] != 'salesman' and employee['name'] in timesheet_data and first_day:
-                        reimbursement = timesheet_data[employee['name']][first_day].get('reimbursement', '')
-                        if reimbursement:
-                            data.append(['REIMBURSEMENT', '', '', '', f'${reimbursement}'])
-                else:
-                    # Standard hourly employees
-                    header = ['DAY', 'DATE', 'PROJECT NAME', 'HOURS', 'PAY']
-                    data.append(header)
-                    
-                    # Add days
-                    total_pay = 0
-                    total_hours = 0
-                    for day in sorted(timesheet_data.get(employee['name'], {}).keys()):
-                        day_data = timesheet_data[employee['name']][day]
-                        day_row = [
-                            day_data.get('day', ''),
-                            day,
-                            day_data.get('project_name', ''),
-                            day_data.get('hours', ''),
-                            day_data.get('pay', '')
-                        ]
-                        data.append(day_row)
-                        
-                        # Calculate totals
-                        if day_data.get('hours'):
-                            try:
-                                total_hours += float(day_data['hours'])
-                            except (ValueError, TypeError):
-                                pass
-                        
-                        if day_data.get('pay'):
-                            try:
-                                total_pay += float(day_data['pay'])
-                            except (ValueError, TypeError):
-                                pass
-                    
-                    # Add total row
-                    data.append(['', '', '', f'{total_hours:.1f}', f'${total_pay:.2f}'])
-                    
-                    # Add reimbursement row for non-salesperson
-                    if employee['position'] != 'salesman' and employee['name'] in timesheet_data:
-                        first_day = sorted(timesheet_data[employee['name']].keys())[0]
-                        reimbursement = timesheet_data[employee['name']][first_day].get('reimbursement', '')
-                        if reimbursement:
-                            data.append(['REIMBURSEMENT', '', '', '', f'${reimbursement}'])
-                
-                # Add empty row
-                data.append([])
+    # Sheets in date order, oldest first
+    periods = sorted(periods, key=lambda p: p['start_date'])
+    name = f'{year} pay periods' if year else None
+    job_id = submit_job('period_export', period_ids=[p['id'] for p in periods], name=name)
+    return redirect(url_for('jobs.wait', job_id=job_id))
+
+@job_handler('period_export')
+def build_period_export(period_ids, name=None):
+    """Background job: write the timesheet workbook of one or more pay periods"""
+    periods = {p['id']: p for p in get_pay_periods()}
+    if not name:
+        name = periods[period_ids[0]]['name'] if len(period_ids) == 1 and period_ids[0] in periods else 'pay periods'
     
-    # Create DataFrame
-    df = pd.DataFrame(data)
+    # Sanitize the name for the filename
+    safe_name = name.replace('/', '-').replace('\\', '-').replace(':', '-')
+    filename = f'export_{safe_name}.xlsx'
     
-    # Save to Excel - sanitize period name for filename
-    safe_period_name = period["name"].replace('/', '-').replace('\\', '-').replace(':', '-')
-    output_file = os.path.join(app.config['UPLOAD_FOLDER'], f'export_{safe_period_name}.xlsx')
-    df.to_excel(output_file, index=False, header=False)
+    # Each export is written to a temporary file and renamed into its own
+    # cache entry, so concurrent jobs never write to the same file
+    key = artifact_key('period_export', period_ids)
+    output_file = ArtifactStore(EXPORTS_FOLDER).get_or_create(
+        key, filename, lambda path: write_timesheet_workbook(path, period_ids)
+    )
     
-    return send_file(output_file, as_attachment=True)
+    return output_file, filename
 
 @app.route('/fix-timesheet/<period_id>', methods=['GET'])
 def fix_timesheet(period_id):
     try:
-        # Delete all timesheet entries for this period and recreate an empty structure
+        # Delete the period's timesheet entries and adjustments and recreate an empty structure
         with get_db() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM timesheet_entries WHERE period_id = %s', (period_id,))
+            cursor.execute('DELETE FROM employee_period_adjustments WHERE period_id = %s', (period_id,))
             conn.commit()
         
         flash('Timesheet has been reset. Please re-enter your data.', 'warning')
@@ -1372,89 +928,34 @@ def init_sample_data():
             
             logger.info("Initialized database with sample employees")
 
-# Initialize database and migrate data from JSON if needed
-def migrate_json_to_db():
-    """Migrate data from JSON files to the PostgreSQL database"""
-    # Check if we need to migrate (if tables are empty)
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM pay_periods')
-        result = cursor.fetchone()
-        pay_periods_count = result['count'] if isinstance(result, dict) else result[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM employees')
-        result = cursor.fetchone()
-        employees_count = result['count'] if isinstance(result, dict) else result[0]
-        
-        # If we already have data, skip migration
-        if pay_periods_count > 0 or employees_count > 0:
-            return
-        
-        # Migrate pay periods
-        if os.path.exists(os.path.join(DATA_FOLDER, 'pay_periods.json')):
-            try:
-                with open(os.path.join(DATA_FOLDER, 'pay_periods.json'), 'r') as f:
-                    pay_periods = json.load(f)
-                    for period in pay_periods:
-                        save_pay_period(period)
-                app.logger.info("Migrated pay periods from JSON to database")
-            except Exception as e:
-                app.logger.error(f"Error migrating pay periods: {str(e)}")
-        
-        # Migrate employees
-        if os.path.exists(os.path.join(DATA_FOLDER, 'employees.json')):
-            try:
-                with open(os.path.join(DATA_FOLDER, 'employees.json'), 'r') as f:
-                    employees = json.load(f)
-                    for employee in employees:
-                        save_employee(employee)
-                app.logger.info("Migrated employees from JSON to database")
-            except Exception as e:
-                app.logger.error(f"Error migrating employees: {str(e)}")
-        
-        # Migrate timesheets
-        for filename in os.listdir(DATA_FOLDER):
-            if filename.startswith('timesheet_') and filename.endswith('.json'):
-                try:
-                    period_id = filename.replace('timesheet_', '').replace('.json', '')
-                    
-                    with open(os.path.join(DATA_FOLDER, filename), 'r') as f:
-                        timesheet_data = json.load(f)
-                        
-                        # Valid timesheet fields
-                        valid_fields = ['hours', 'pay', 'project_name', 'install_days', 'install', 
-                                      'regular_hours', 'overtime_hours', 'job_name', 'notes', 'reimbursement']
-                        
-                        for employee_name, days in timesheet_data.items():
-                            for day, data in days.items():
-                                for field, value in data.items():
-                                    # Only save valid fields with non-empty values
-                                    if value and field in valid_fields:
-                                        save_timesheet_entry(period_id, employee_name, day, field, value)
-                    
-                    app.logger.info(f"Migrated timesheet {filename} to database")
-                except Exception as e:
-                    app.logger.error(f"Error migrating timesheet {filename}: {str(e)}")
-
 # Initialize the app
 def init_app(app):
-    """Initialize the database and migrate data"""
+    """Check that the database schema is current before serving requests
+    
+    Migrations and data imports run in the release phase via
+    'flask --app app upgrade-db', so web workers only read the schema version.
+    """
+    # 'python app.py' upgrades below, and CLI commands manage the schema themselves
+    if __name__ == '__main__' or os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        return
+    
     with app.app_context():
-        # Initialize database schema
-        init_db()
+        verify_schema_version()
         
-        # Migrate JSON data if needed
-        migrate_json_to_db()
-        
-        # Initialize with sample data if needed
-        init_sample_data()
-        
-        # Clean up SQLite database if needed
-        cleanup_sqlite()
+        # Listen for writes by other workers so process-wide caches stay current
+        get_listener()
 
-# Initialize the application when this module is imported
+# Verify the schema version when this module is imported
 init_app(app)
 
+# Register database CLI commands (flask --app app upgrade-db / explain-queries)
+register_commands(app, data_migrations=[migrate_json_to_db, init_sample_data, cleanup_sqlite])
+
 if __name__ == '__main__':
-    # The database is already initialized when the module is imported
+    # Bring a development database up to date before serving
+    with app.app_context():
+        upgrade_database()
+        migrate_json_to_db()
+        init_sample_data()
+        cleanup_sqlite()
     app.run(debug=True) 
\ No newline at end of file
@@ -69,13 +69,15 @@ def create_app(test_config=None):
         return dict(now=now)
     
     # Register blueprints
-    from .routes import main, employees, pay_periods, timesheet, reports
+    from .routes import main, employees, pay_periods, timesheet, reports, metrics, jobs
     
     app.register_blueprint(main)
     app.register_blueprint(employees)
     app.register_blueprint(pay_periods)
     app.register_blueprint(timesheet)
     app.register_blueprint(reports)
+    app.register_blueprint(metrics)
+    app.register_blueprint(jobs)
     
     # Add URL rule for the index page
     app.add_url_rule('/', endpoint='index')
@@ -3,100 +3,129 @@ Database management module for Creative Closets Payroll
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import extensions
 import threading
 import os
 import re
+import time
 from contextlib import contextmanager
-from datetime import datetime
 from dotenv import load_dotenv
 from flask import current_app, g
+from .pool import ConnectionPool, PoolTimeout
+from .metrics import MetricsCursor, registry as metrics
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Thread-local storage for database connections
-db_local = threading.local()
-db_connections = {}  # Track connections for monitoring
+# Process-wide connection pool, created on first use
+_pool = None
+_pool_lock = threading.Lock()
 
-@contextmanager
-def get_db():
-    """Context manager for getting database connection"""
-    thread_id = threading.get_ident()
+def _reset_pool_after_fork():
+    """Give a forked child (e.g. gunicorn --preload) its own pool
+
+    The inherited connections belong to the parent, so they are forgotten
+    without being closed (see ConnectionPool.forget).
+    """
+    global _pool, _pool_lock
+    if _pool is not None:
+        _pool.forget()
+    _pool = None
+    _pool_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+def _connect():
+    """Open a new PostgreSQL connection"""
+    # Check for Heroku DATABASE_URL first
+    database_url = os.environ.get('DATABASE_URL')
     
-    if not hasattr(db_local, 'connection'):
-        # Check for Heroku DATABASE_URL first
-        database_url = os.environ.get('DATABASE_URL')
-        
-        if database_url:
-            # Handle Heroku's postgres:// vs postgresql:// in the connection URL
-            if database_url.startswith('postgres://'):
-                database_url = database_url.replace('postgres://', 'postgresql://', 1)
-            
-            # Connect using the DATABASE_URL
-            db_local.connection = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-            current_app.logger.info(f"Connected to Heroku PostgreSQL database for thread {thread_id}")
-        else:
-            # Use local configuration
-            host = os.environ.get('PG_HOST', 'localhost')
-            port = os.environ.get('PG_PORT', '5432')
-            user = os.environ.get('PG_USER', 'postgres')
-            password = os.environ.get('PG_PASSWORD', 'postgres')
-            db_name = os.environ.get('PG_DB', 'ccpayroll')
-            
-            # Connect to PostgreSQL
-            db_local.connection = psycopg2.connect(
-                host=host,
-                port=port,
-                user=user,
-                password=password,
-                dbname=db_name,
-                cursor_factory=RealDictCursor
-            )
-            current_app.logger.info(f"Connected to local PostgreSQL database for thread {thread_id}")
+    if database_url:
+        # Handle Heroku's postgres:// vs postgresql:// in the connection URL
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
         
-        db_connections[thread_id] = {
-            'created_at': datetime.now(),
-            'last_used': datetime.now()
-        }
+        # Connect using the DATABASE_URL
+        connection = psycopg2.connect(database_url, cursor_factory=MetricsCursor)
+        current_app.logger.info(f"Opened Heroku PostgreSQL connection in process {os.getpid()}")
     else:
-        # Update last used time
-        if thread_id in db_connections:
-            db_connections[thread_id]['last_used'] = datetime.now()
+        # Use local configuration
+        host = os.environ.get('PG_HOST', 'localhost')
+        port = os.environ.get('PG_PORT', '5432')
+        user = os.environ.get('PG_USER', 'postgres')
+        password = os.environ.get('PG_PASSWORD', 'postgres')
+        db_name = os.environ.get('PG_DB', 'ccpayroll')
+        
+        # Connect to PostgreSQL
+        connection = psycopg2.connect(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            dbname=db_name,
+            cursor_factory=MetricsCursor
+        )
+        current_app.logger.info(f"Opened local PostgreSQL connection in process {os.getpid()}")
+    
+    return connection
+
+def get_pool():
+    """Get the connection pool for this process, creating it if needed
+    
+    Pool limits come from DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT,
+    DB_POOL_MAX_AGE and DB_POOL_CHECK_IDLE (seconds).
+    """
+    global _pool
+    
+    if _pool is not None:
+        return _pool
+    
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                _connect,
+                min_size=int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+                max_size=int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+                timeout=float(os.environ.get('DB_POOL_TIMEOUT', '30')),
+                max_age=float(os.environ.get('DB_POOL_MAX_AGE', '3600')),
+                check_idle=float(os.environ.get('DB_POOL_CHECK_IDLE', '30')),
+            )
+    
+    return _pool
+
+@contextmanager
+def get_db():
+    """Context manager for getting a pooled database connection
+    
+    A connection is checked out once per application context and reused by
+    every get_db() call within it. close_db() returns it to the pool.
+    """
+    connection = g.get('_db_connection')
+    if connection is None:
+        start = time.perf_counter()
+        connection = get_pool().getconn()
+        metrics.record_checkout(time.perf_counter() - start)
+        g._db_connection = connection
     
     try:
-        yield db_local.connection
+        yield connection
     except Exception as e:
-        db_local.connection.rollback()
-        current_app.logger.error(f"Database error in thread {thread_id}: {str(e)}")
+        connection.rollback()
+        metrics.record_rollback('error')
+        current_app.logger.error(f"Database error in process {os.getpid()}: {str(e)}")
         raise
-    finally:
-        # Keep connection open for this thread's lifetime
-        pass
 
 def close_db():
-    """Close database connection if it exists"""
-    thread_id = threading.get_ident()
+    """Return this context's database connection to the pool"""
+    connection = g.pop('_db_connection', None)
+    if connection is None:
+        return
     
-    if hasattr(db_local, 'connection'):
-        db_local.connection.close()
-        if thread_id in db_connections:
-            del db_connections[thread_id]
-        del db_local.connection
-        current_app.logger.info(f"Closed DB connection for thread {thread_id}")
-
-def monitor_db_connections():
-    """Log information about current database connections"""
-    now = datetime.now()
-    for thread_id, info in list(db_connections.items()):
-        age = (now - info['created_at']).total_seconds()
-        idle_time = (now - info['last_used']).total_seconds()
-        
-        if idle_time > 300:  # 5 minutes idle
-            current_app.logger.warning(f"Thread {thread_id} has idle DB connection for {idle_time:.1f} seconds")
-        
-        if age > 3600:  # 1 hour old
-            current_app.logger.info(f"Thread {thread_id} has DB connection open for {age:.1f} seconds")
+    metrics.record_request(g.pop('_db_query_count', 0))
+    if not connection.closed and connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+        # Uncommitted work is discarded when the connection is reset by the pool
+        metrics.record_rollback('reset')
+    get_pool().putconn(connection)
 
 def init_db():
     """Initialize the database schema"""
@@ -143,7 +172,6 @@ def init_db():
             overtime_hours REAL DEFAULT 0,
             job_name TEXT,
             notes TEXT,
-            reimbursement TEXT,
             FOREIGN KEY (period_id) REFERENCES pay_periods(id),
             UNIQUE (period_id, employee_name, day)
         )
@@ -151,26 +179,38 @@ def init_db():
         
         conn.commit()
 
+# Secondary indexes for the models' access patterns: (name, table, columns)
+# employees(name) and timesheet_entries(period_id, employee_name, day) are
+# already covered by their UNIQUE constraints.
+INDEXES = [
+    ('pay_periods_start_on_idx', 'pay_periods', '(start_on DESC)'),
+]
+
+def ensure_indexes():
+    """Create any secondary indexes in INDEXES that do not exist yet"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        for name, table, columns in INDEXES:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} {columns}')
+        conn.commit()
+
 def init_app(app):
     """Initialize database connection and schema for the Flask app"""
-    # Add before_request function to periodically monitor connections
-    @app.before_request
-    def before_request():
-        """Run before each request"""
-        # Random chance to monitor connections (1%)
-        import random
-        if random.random() < 0.01:
-            monitor_db_connections()
-    
-    # Add teardown function to close connections
+    # Add teardown function to return connections to the pool
     @app.teardown_appcontext
     def teardown_db(exception):
-        """Close database connection at the end of the request"""
+        """Return the database connection at the end of the request"""
         close_db()
     
-    # Initialize database
-    with app.app_context():
-        init_db()
-        # Migrate any existing JSON data to database
-        from .migration import migrate_json_to_db
-        migrate_json_to_db() 
\ No newline at end of file
+    # Schema changes are applied by 'flask upgrade-db'; workers only check the
+    # version on boot. CLI commands manage the schema themselves.
+    if os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        with app.app_context():
+            from .schema import verify_schema_version
+            from .notify import get_listener
+            verify_schema_version()
+            get_listener()
+    
+    from .commands import register_commands
+    from .migration import migrate_json_to_db
+    register_commands(app, data_migrations=[migrate_json_to_db])
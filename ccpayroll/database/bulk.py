@@ -0,0 +1,104 @@
+"""
+Bulk loading for Creative Closets Payroll
+
+Imports and migrations write thousands of rows at once. Instead of one
+INSERT per row, load_rows() streams them into a temporary staging table with
+COPY FROM STDIN and merges the staging table into the target with a single
+INSERT ... ON CONFLICT. Nothing is committed: callers load several tables on
+one cursor and commit once, so a load lands completely or not at all.
+"""
+
+import io
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence, Tuple
+
+@dataclass
+class LoadResult:
+    """Row counts of one load_rows() call"""
+    table: str
+    staged: int = 0
+    inserted: int = 0
+    updated: int = 0
+
+    @property
+    def unchanged(self) -> int:
+        """Staged rows that matched an existing row and were left alone"""
+        return self.staged - self.inserted - self.updated
+
+def load_rows(cursor, table: str, columns: Sequence[str], rows: Iterable[Tuple],
+              key: Sequence[str], update: Optional[Sequence[str]] = None,
+              keep_existing: bool = False) -> LoadResult:
+    """Insert or update many rows of a table in two statements, without committing
+
+    Rows with the same key are merged before loading, the last one winning,
+    because one INSERT ... ON CONFLICT cannot touch a row twice.
+
+    Args:
+        cursor: Cursor of the caller's open transaction
+        columns: Column names, in the order of each row's values
+        rows: Tuples of values; None is NULL
+        key: Columns of the unique constraint that identifies existing rows
+        update: Columns written to existing rows (default: every column not
+            in key); empty to leave existing rows alone
+        keep_existing: If true, a NULL value does not overwrite an existing one
+
+    Returns:
+        LoadResult with the rows staged, inserted and updated
+    """
+    key_index = [columns.index(name) for name in key]
+    staged = {tuple(row[i] for i in key_index): row for row in rows}
+    result = LoadResult(table, staged=len(staged))
+    if not staged:
+        return result
+
+    stage = f'_stage_{table}'
+    column_list = ', '.join(columns)
+    cursor.execute(f'DROP TABLE IF EXISTS {stage}')
+    cursor.execute(
+        f'CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA'
+    )
+
+    buffer = io.StringIO()
+    for row in staged.values():
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(f'COPY {stage} ({column_list}) FROM STDIN', buffer)
+
+    if update is None:
+        update = [name for name in columns if name not in key]
+    if update:
+        if keep_existing:
+            updates = ', '.join(f'{name} = COALESCE(EXCLUDED.{name}, target.{name})' for name in update)
+        else:
+            updates = ', '.join(f'{name} = EXCLUDED.{name}' for name in update)
+        conflict = f'DO UPDATE SET {updates}'
+    else:
+        conflict = 'DO NOTHING'
+
+    # New rows have no deleting transaction yet (xmax = 0); updated rows do
+    cursor.execute(
+        f'''
+        WITH merged AS (
+            INSERT INTO {table} AS target ({column_list})
+            SELECT {column_list} FROM {stage}
+            ON CONFLICT ({', '.join(key)}) {conflict}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted) AS inserted,
+               COUNT(*) FILTER (WHERE NOT inserted) AS updated
+        FROM merged
+        '''
+    )
+    row = cursor.fetchone()
+    result.inserted, result.updated = (row['inserted'], row['updated']) if isinstance(row, dict) else row
+    cursor.execute(f'DROP TABLE {stage}')
+
+    return result
+
+def _copy_value(value) -> str:
+    """Format a value for COPY's text format"""
+    if value is None:
+        return r'\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
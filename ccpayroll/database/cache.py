@@ -0,0 +1,104 @@
+"""
+Process-wide table caches for Creative Closets Payroll
+
+A cached table is loaded once per worker process and indexed in memory.
+While this process's change listener is connected (web workers start one,
+see notify.py), a cache is stale when the table's local generation (bumped
+by NOTIFY) has moved. Otherwise, e.g. in CLI commands and the job worker,
+every write bumps the table's row in cache_generations (via a statement
+trigger), and the cache compares that one integer per request.
+"""
+
+import threading
+from flask import g, has_app_context
+from . import get_db
+from .notify import generations, running_listener
+
+def get_generation(conn, name):
+    """Return the current write generation of a cached table"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT generation FROM cache_generations WHERE name = %s', (name,))
+    row = cursor.fetchone()
+    return row['generation'] if row else 0
+
+class TableCache:
+    """In-memory copy of a table, indexed by one or more unique columns
+
+    The generation is checked at most once per application context, and the
+    table is only reloaded when it has changed. ``version`` counts local
+    reloads, so derived data can record the version it was built from and
+    detect that it is stale.
+    """
+
+    def __init__(self, table, query, keys=()):
+        """Create a cache
+
+        Args:
+            table: Table name, as recorded in cache_generations
+            query: SELECT statement that loads the cached rows
+            keys: Unique columns to index the rows by
+        """
+        self.table = table
+        self.query = query
+        self.keys = keys
+        self.version = 0
+
+        self._lock = threading.Lock()
+        self._generation = None
+        self._rows = []
+        self._indexes = {key: {} for key in keys}
+
+    def rows(self):
+        """Return all cached rows in query order"""
+        self._refresh()
+        return self._rows
+
+    def get(self, key, value):
+        """Return the row whose ``key`` column equals ``value``, or None"""
+        self._refresh()
+        return self._indexes[key].get(value)
+
+    def invalidate(self):
+        """Force a reload on next access, e.g. after this process wrote the table"""
+        with self._lock:
+            self._generation = None
+        if has_app_context():
+            g.pop(self._checked_flag, None)
+
+    @property
+    def _checked_flag(self):
+        return f'_cache_checked_{self.table}'
+
+    def _refresh(self):
+        """Reload the rows if the table changed since they were loaded"""
+        if has_app_context() and g.get(self._checked_flag):
+            return
+
+        # While notifications arrive, an unchanged table costs no database round trip
+        generation = None
+        listener = running_listener()
+        if listener is not None and listener.listening:
+            generation = ('notify', generations.get(self.table))
+
+        if generation is None or generation != self._generation:
+            with get_db() as conn:
+                if generation is None:
+                    generation = ('table', get_generation(conn, self.table))
+
+                if generation != self._generation:
+                    cursor = conn.cursor()
+                    cursor.execute(self.query)
+                    rows = [dict(row) for row in cursor.fetchall()]
+                    indexes = {key: {row[key]: row for row in rows} for key in self.keys}
+
+                    with self._lock:
+                        self._rows = rows
+                        self._indexes = indexes
+                        self._generation = generation
+                        self.version += 1
+
+        if has_app_context():
+            setattr(g, self._checked_flag, True)
+
+# Every employee, indexed by id and name
+employee_roster = TableCache('employees', 'SELECT * FROM employees ORDER BY name', keys=('id', 'name'))
@@ -0,0 +1,76 @@
+"""
+Database CLI commands for Creative Closets Payroll
+"""
+
+import click
+
+def register_commands(app, data_migrations=()):
+    """Register the database commands on a Flask app's CLI
+    
+    Args:
+        app: Flask application
+        data_migrations: Callables run by upgrade-db after the schema is
+            current, e.g. importing legacy JSON data
+    """
+    
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Create tables, apply schema migrations and run data migrations"""
+        from .schema import upgrade_database
+        
+        version = upgrade_database()
+        for migrate in data_migrations:
+            migrate()
+        
+        click.echo(f"Database schema is at version {version}")
+    
+    @app.cli.command('rebuild-totals')
+    @click.option('--period', 'period_id', default=None, help='Only rebuild this pay period.')
+    def rebuild_totals_command(period_id):
+        """Recompute the employee_period_totals rollup from the timesheet entries"""
+        from .totals import rebuild_period_totals
+        
+        rows = rebuild_period_totals(period_id)
+        click.echo(f"Rebuilt {rows} employee period totals")
+    
+    @app.cli.command('run-worker')
+    @click.option('--poll-interval', default=2.0, show_default=True,
+                  help='Seconds to wait between polls of an empty queue.')
+    @click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+    def run_worker_command(poll_interval, burst):
+        """Run background jobs (reports and exports) from the jobs table"""
+        from ..worker import run_worker
+        
+        run_worker(poll_interval=poll_interval, burst=burst)
+    
+    @app.cli.command('explain-queries')
+    @click.option('--no-seqscan', is_flag=True,
+                  help='Plan with sequential scans disabled to check that an index can serve each query.')
+    def explain_queries_command(no_seqscan):
+        """EXPLAIN every query the models emit and flag sequential scans"""
+        from ..models import Employee, PayPeriod
+        from .explain import explain_model_queries
+        
+        periods = PayPeriod.get_all()
+        employees = Employee.get_all()
+        if not periods or not employees:
+            raise click.ClickException('Need at least one pay period and one employee to explain queries')
+        
+        results = explain_model_queries(periods[0], employees[0], disable_seqscan=no_seqscan)
+        
+        flagged = 0
+        for result in results:
+            if result['error']:
+                flagged += 1
+                click.echo(f"ERROR    {result['label']}: {result['error']}")
+            elif result['seq_scans']:
+                flagged += 1
+                tables = ', '.join(f"{scan['table']} (~{scan['rows']} rows)" for scan in result['seq_scans'])
+                click.echo(f"SEQSCAN  {result['label']}: {tables}")
+                click.echo(f"         {result['sql']}")
+            elif result['sql'] is None:
+                click.echo(f"ok       {result['label']}: no SQL issued (cached)")
+            else:
+                click.echo(f"ok       {result['label']}")
+        
+        click.echo(f"\n{len(results)} queries explained, {flagged} flagged")
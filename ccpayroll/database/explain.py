@@ -0,0 +1,110 @@
+"""
+Query plan checks for Creative Closets Payroll
+
+Runs the model read methods against real data, captures the SQL they emit
+and reports every sequential scan in the resulting query plans. Table
+caches are invalidated before each method runs, so reads they serve from
+memory still reach the database and get explained.
+"""
+
+from flask import g
+from . import get_db
+from .metrics import fingerprint
+from .cache import employee_roster
+
+def model_queries(period, employee):
+    """Model and report read methods to exercise, as (label, callable) pairs"""
+    from ..models import Employee, PayPeriod, TimesheetEntry, Adjustment, Crew, PeriodGrid
+    from ..reports.aggregate import aggregate_payroll
+    
+    return [
+        ('PayPeriod.get_all', lambda: PayPeriod.get_all()),
+        ('PayPeriod.get_by_id', lambda: PayPeriod.get_by_id(period.id)),
+        ('Employee.get_all', lambda: Employee.get_all()),
+        ('Employee.get_by_id', lambda: Employee.get_by_id(employee.id)),
+        ('Employee.get_by_name', lambda: Employee.get_by_name(employee.name)),
+        ('TimesheetEntry.get_by_period_and_employee',
+         lambda: TimesheetEntry.get_by_period_and_employee(period.id, employee.name)),
+        ('TimesheetEntry.get_by_date',
+         lambda: TimesheetEntry.get_by_date(period.id, employee.name, period.start_date)),
+        ('TimesheetEntry.get_total_hours_for_period',
+         lambda: TimesheetEntry.get_total_hours_for_period(period.id, employee.name)),
+        ('TimesheetEntry.get_period_totals', lambda: TimesheetEntry.get_period_totals(period.id)),
+        ('TimesheetEntry.get_period_totals (employees)',
+         lambda: TimesheetEntry.get_period_totals(period.id, [employee.name])),
+        ('Adjustment.get_by_period', lambda: Adjustment.get_by_period(period.id)),
+        ('Adjustment.get_amounts', lambda: Adjustment.get_amounts([period.id])),
+        ('PeriodGrid.load', lambda: PeriodGrid.load(period.id).load_text('project_name', 'notes')),
+        ('Crew.get_all', lambda: Crew.get_all()),
+        ('Crew.calculate_period_pay', lambda: Crew.calculate_period_pay(period.id)),
+        ('aggregate_payroll', lambda: aggregate_payroll([period.id], [employee.name])),
+    ]
+
+def capture_queries(func):
+    """Call func with cold table caches and return the SQL statements it executed"""
+    employee_roster.invalidate()
+    g._db_query_log = []
+    try:
+        func()
+        return g._db_query_log
+    finally:
+        g.pop('_db_query_log', None)
+
+def find_seq_scans(plan):
+    """Yield every Seq Scan node in an EXPLAIN (FORMAT JSON) plan tree"""
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan
+    for child in plan.get('Plans', []):
+        yield from find_seq_scans(child)
+
+def explain_model_queries(period, employee, disable_seqscan=False):
+    """EXPLAIN every query the model read methods emit
+    
+    Args:
+        period: PayPeriod used as the lookup target
+        employee: Employee used as the lookup target
+        disable_seqscan: Plan with enable_seqscan off, so that any remaining
+            sequential scan means no index can serve the query
+    
+    Returns:
+        List of dicts with 'label', 'sql', 'seq_scans' and 'error' keys;
+        'sql' is None for a method that issued no SQL
+    """
+    results = []
+    seen = set()
+    
+    for label, func in model_queries(period, employee):
+        try:
+            statements = capture_queries(func)
+        except Exception as e:
+            results.append({'label': label, 'sql': None, 'seq_scans': [], 'error': str(e)})
+            continue
+        
+        if not statements:
+            results.append({'label': label, 'sql': None, 'seq_scans': [], 'error': None})
+        
+        for statement in statements:
+            sql = statement.decode('utf-8') if isinstance(statement, bytes) else statement
+            key = fingerprint(sql)
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            with get_db() as conn:
+                cursor = conn.cursor()
+                try:
+                    if disable_seqscan:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                    plan = cursor.fetchone()['QUERY PLAN'][0]['Plan']
+                    seq_scans = [
+                        {'table': node.get('Relation Name'), 'rows': node.get('Plan Rows')}
+                        for node in find_seq_scans(plan)
+                    ]
+                    results.append({'label': label, 'sql': key, 'seq_scans': seq_scans, 'error': None})
+                except Exception as e:
+                    results.append({'label': label, 'sql': key, 'seq_scans': [], 'error': str(e)})
+                finally:
+                    conn.rollback()
+    
+    return results
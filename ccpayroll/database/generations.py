@@ -0,0 +1,90 @@
+"""
+Per-period data generations for Creative Closets Payroll
+
+Reports of a pay period depend on its timesheet entries and adjustments,
+on the employees and on the pay period rows themselves. Every write to
+those bumps a counter in cache_generations: 'period:<id>' for the period's
+entries and adjustments, 'employees' and 'pay_periods' for those tables.
+A generated report can be reused for as long as these counters stand
+still (see reports/artifacts.py).
+"""
+
+from . import get_db
+
+# Tables whose generation every report depends on
+SHARED_GENERATIONS = ('employees', 'pay_periods')
+
+def migrate_period_generations(conn):
+    """Count writes per pay period and to the pay_periods table
+
+    The period triggers run once per statement and read the changed rows
+    from transition tables, so a statement writing many entries of a
+    period bumps its generation once. Transition tables need one trigger
+    per event.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE OR REPLACE FUNCTION ccp_bump_period_generation() RETURNS trigger AS $$
+    BEGIN
+        -- Sorted, so concurrent statements lock the counters in the same order
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO cache_generations (name, generation)
+            SELECT DISTINCT 'period:' || period_id, 1 FROM new_rows ORDER BY 1
+            ON CONFLICT (name) DO UPDATE SET generation = cache_generations.generation + 1;
+        ELSIF TG_OP = 'UPDATE' THEN
+            INSERT INTO cache_generations (name, generation)
+            SELECT 'period:' || period_id, 1 FROM (
+                SELECT period_id FROM old_rows UNION SELECT period_id FROM new_rows
+            ) changed ORDER BY 1
+            ON CONFLICT (name) DO UPDATE SET generation = cache_generations.generation + 1;
+        ELSE
+            INSERT INTO cache_generations (name, generation)
+            SELECT DISTINCT 'period:' || period_id, 1 FROM old_rows ORDER BY 1
+            ON CONFLICT (name) DO UPDATE SET generation = cache_generations.generation + 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    ''')
+
+    for table in ('timesheet_entries', 'employee_period_adjustments'):
+        cursor.execute(f'''
+        DROP TRIGGER IF EXISTS {table}_bump_period_generation_insert ON {table};
+        CREATE TRIGGER {table}_bump_period_generation_insert
+            AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION ccp_bump_period_generation();
+
+        DROP TRIGGER IF EXISTS {table}_bump_period_generation_update ON {table};
+        CREATE TRIGGER {table}_bump_period_generation_update
+            AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION ccp_bump_period_generation();
+
+        DROP TRIGGER IF EXISTS {table}_bump_period_generation_delete ON {table};
+        CREATE TRIGGER {table}_bump_period_generation_delete
+            AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION ccp_bump_period_generation();
+        ''')
+
+    cursor.execute('''
+    DROP TRIGGER IF EXISTS pay_periods_bump_generation ON pay_periods;
+    CREATE TRIGGER pay_periods_bump_generation
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pay_periods
+        FOR EACH STATEMENT EXECUTE FUNCTION ccp_bump_generation();
+    ''')
+    conn.commit()
+
+def get_data_generations(period_ids):
+    """Return the generations a report of the given pay periods depends on
+
+    Returns:
+        Dictionary of counter name to generation, 0 for counters never bumped
+    """
+    names = list(SHARED_GENERATIONS) + [f'period:{period_id}' for period_id in period_ids]
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT name, generation FROM cache_generations WHERE name = ANY(%s)',
+            (names,)
+        )
+        current = {row['name']: row['generation'] for row in cursor.fetchall()}
+    return {name: current.get(name, 0) for name in names}
@@ -0,0 +1,210 @@
+"""
+Postgres-backed background job queue for Creative Closets Payroll
+
+Jobs are rows in the jobs table. Workers claim the oldest queued job with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker processes can
+poll the table without handing out the same job twice. A job's output file
+is stored in the row, so the web process that serves the download does not
+need to share a filesystem with the worker that built it.
+"""
+
+import uuid
+from psycopg2.extras import Json
+from . import get_db
+
+# A running job whose worker has not finished it within this many seconds
+# is assumed lost and handed out again
+JOB_LEASE_SECONDS = 900
+
+# Attempts before a job that keeps getting lost is marked failed
+MAX_ATTEMPTS = 3
+
+# Finished jobs, and their output, are deleted after this many seconds
+JOB_RETENTION_SECONDS = 86400
+
+def migrate_jobs(conn):
+    """Create the jobs table and the partial index workers poll"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        params JSONB NOT NULL DEFAULT '{}',
+        status TEXT NOT NULL DEFAULT 'queued'
+            CHECK (status IN ('queued', 'running', 'done', 'failed')),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        output BYTEA,
+        output_name TEXT,
+        output_type TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS jobs_pending_idx ON jobs (created_at)
+        WHERE status IN ('queued', 'running');
+    ''')
+    conn.commit()
+
+def migrate_job_progress(conn):
+    """Let jobs report progress and carry an uploaded input file"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    ALTER TABLE jobs
+        ADD COLUMN IF NOT EXISTS progress JSONB NOT NULL DEFAULT '{}',
+        ADD COLUMN IF NOT EXISTS upload BYTEA;
+    ''')
+    conn.commit()
+
+# Columns returned to callers; the files themselves are only read when needed
+JOB_COLUMNS = '''id, kind, params, status, attempts, error, progress, output_name, output_type,
+                 created_at, started_at, finished_at'''
+
+def enqueue_job(kind, params=None, upload=None):
+    """Queue a job and return its id
+
+    Args:
+        upload: Bytes of a file for the job to read (see get_job_upload),
+            e.g. a workbook to import
+    """
+    job_id = str(uuid.uuid4())
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'INSERT INTO jobs (id, kind, params, upload) VALUES (%s, %s, %s, %s)',
+            (job_id, kind, Json(params or {}), upload)
+        )
+        conn.commit()
+    return job_id
+
+def get_job(job_id, with_output=False):
+    """Return a job as a dictionary, or None if it does not exist"""
+    columns = JOB_COLUMNS + (', output' if with_output else '')
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {columns} FROM jobs WHERE id = %s', (job_id,))
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+def get_job_upload(job_id):
+    """Return the bytes uploaded with a job, or None"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT upload FROM jobs WHERE id = %s', (job_id,))
+        row = cursor.fetchone()
+    return bytes(row['upload']) if row and row['upload'] is not None else None
+
+def set_job_progress(job_id, progress):
+    """Replace a job's progress, a JSON-serializable dictionary
+
+    This commits the connection, so call it between the job's transactions.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('UPDATE jobs SET progress = %s WHERE id = %s', (Json(progress), job_id))
+        conn.commit()
+
+def claim_job(job_id=None):
+    """Mark the oldest runnable job as running and return it, or None
+
+    Runnable jobs are queued ones, and running ones whose lease expired
+    (their worker died) with attempts left. Jobs that ran out of attempts
+    are marked failed first. The returned 'attempts' identifies this claim
+    to finish_job and fail_job.
+
+    Args:
+        job_id: Claim only this job, e.g. one just submitted to run inline
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            UPDATE jobs SET status = 'failed', finished_at = NOW(), upload = NULL,
+                   error = 'Job did not finish after ' || attempts || ' attempts'
+            WHERE status = 'running' AND attempts >= %s
+              AND started_at < NOW() - make_interval(secs => %s)
+            ''',
+            (MAX_ATTEMPTS, JOB_LEASE_SECONDS)
+        )
+        cursor.execute(
+            f'''
+            UPDATE jobs SET status = 'running', started_at = NOW(), attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE (status = 'queued'
+                       OR (status = 'running' AND started_at < NOW() - make_interval(secs => %s)))
+                  AND (%s IS NULL OR id = %s)
+                ORDER BY created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING {JOB_COLUMNS}
+            ''',
+            (JOB_LEASE_SECONDS, job_id, job_id)
+        )
+        row = cursor.fetchone()
+        conn.commit()
+    return dict(row) if row else None
+
+def finish_job(job_id, attempt, output=None, output_name=None, output_type=None):
+    """Mark a job done, store its output file (if any) and drop its upload
+
+    Args:
+        attempt: The job's 'attempts' when it was claimed; if the lease
+            expired and the job was claimed again since, nothing is written
+
+    Returns:
+        Whether the job was updated
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            UPDATE jobs SET status = 'done', finished_at = NOW(), error = NULL, upload = NULL,
+                   output = %s, output_name = %s, output_type = %s
+            WHERE id = %s AND attempts = %s
+            ''',
+            (output, output_name, output_type, job_id, attempt)
+        )
+        updated = cursor.rowcount == 1
+        conn.commit()
+    return updated
+
+def fail_job(job_id, attempt, error):
+    """Mark a job failed with an error message
+
+    Args:
+        attempt: The job's 'attempts' when it was claimed (see finish_job)
+
+    Returns:
+        Whether the job was updated
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            UPDATE jobs SET status = 'failed', finished_at = NOW(), error = %s, upload = NULL
+            WHERE id = %s AND attempts = %s
+            ''',
+            (error, job_id, attempt)
+        )
+        updated = cursor.rowcount == 1
+        conn.commit()
+    return updated
+
+def purge_jobs(retention_seconds=JOB_RETENTION_SECONDS):
+    """Delete finished jobs older than the retention period and return how many"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            DELETE FROM jobs
+            WHERE status IN ('done', 'failed')
+              AND finished_at < NOW() - make_interval(secs => %s)
+            ''',
+            (retention_seconds,)
+        )
+        deleted = cursor.rowcount
+        conn.commit()
+    return deleted
@@ -0,0 +1,32 @@
+"""
+Import manifest for Creative Closets Payroll
+
+import_manifest remembers, for every workbook sheet imported, the pay period
+it was loaded into and a hash of its cell values. Re-uploading a workbook
+only parses and loads the sheets whose hash changed (see
+ccpayroll.importer.pipeline). A deleted pay period drops out of the
+manifest with it, so its sheet is imported afresh next time.
+"""
+
+from typing import Dict, Tuple
+from . import get_db
+
+def migrate_import_manifest(conn):
+    """Create the import_manifest table"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS import_manifest (
+        sheet TEXT PRIMARY KEY,
+        period_id TEXT NOT NULL REFERENCES pay_periods(id) ON DELETE CASCADE,
+        content_hash TEXT NOT NULL,
+        imported_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )
+    ''')
+    conn.commit()
+
+def get_import_manifest() -> Dict[str, Tuple[str, str]]:
+    """Return the imported sheets, mapping sheet name to (period id, content hash)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT sheet, period_id, content_hash FROM import_manifest')
+        return {row['sheet']: (row['period_id'], row['content_hash']) for row in cursor.fetchall()}
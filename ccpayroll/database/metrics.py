@@ -0,0 +1,173 @@
+"""
+Database metrics for Creative Closets Payroll
+
+Counts pool checkouts, wait time, rollbacks and queries, and renders them in
+the Prometheus text exposition format. Metrics are kept per worker process.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_app_context
+from psycopg2.extras import RealDictCursor
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))+\s*\)")
+# One or more row tuples after VALUES, e.g. from execute_values pages of any size
+_VALUES_ROWS = re.compile(r"\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(sql):
+    """Reduce a SQL statement to a stable label by stripping literals and whitespace"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _STRING_LITERAL.sub('?', str(sql))
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _VALUES_ROWS.sub('VALUES (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()[:200]
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels=''):
+        """Render the _bucket, _sum and _count series for this histogram"""
+        lines = []
+        cumulative = 0
+        prefix = f'{labels},' if labels else ''
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum:.6f}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+class MetricsRegistry:
+    """Thread-safe store for the database metrics of one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait = Histogram(LATENCY_BUCKETS)
+        self.rollbacks = {'error': 0, 'reset': 0}
+        self.queries_per_request = Histogram(QUERY_COUNT_BUCKETS)
+        self.query_latency = {}
+
+    def record_checkout(self, wait_seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait.observe(wait_seconds)
+
+    def record_rollback(self, reason):
+        with self._lock:
+            self.rollbacks[reason] = self.rollbacks.get(reason, 0) + 1
+
+    def record_query(self, sql, seconds):
+        key = fingerprint(sql)
+        with self._lock:
+            histogram = self.query_latency.get(key)
+            if histogram is None:
+                histogram = self.query_latency[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def record_request(self, query_count):
+        with self._lock:
+            self.queries_per_request.observe(query_count)
+
+    def render(self, pool=None):
+        """Render all metrics in the Prometheus text format
+
+        Args:
+            pool: Optional ConnectionPool whose current state is reported as gauges
+        """
+        lines = []
+        with self._lock:
+            if pool is not None:
+                lines += [
+                    '# HELP ccpayroll_db_pool_connections Open pooled connections by state.',
+                    '# TYPE ccpayroll_db_pool_connections gauge',
+                    f'ccpayroll_db_pool_connections{{state="active"}} {pool.size - pool.idle}',
+                    f'ccpayroll_db_pool_connections{{state="idle"}} {pool.idle}',
+                    '# HELP ccpayroll_db_pool_max_connections Configured pool maximum size.',
+                    '# TYPE ccpayroll_db_pool_max_connections gauge',
+                    f'ccpayroll_db_pool_max_connections {pool.max_size}',
+                ]
+
+            lines += [
+                '# HELP ccpayroll_db_pool_checkouts_total Connections checked out of the pool.',
+                '# TYPE ccpayroll_db_pool_checkouts_total counter',
+                f'ccpayroll_db_pool_checkouts_total {self.checkouts}',
+                '# HELP ccpayroll_db_pool_wait_seconds Time spent waiting for a pooled connection.',
+                '# TYPE ccpayroll_db_pool_wait_seconds histogram',
+            ]
+            lines += self.checkout_wait.render('ccpayroll_db_pool_wait_seconds')
+
+            lines += [
+                '# HELP ccpayroll_db_rollbacks_total Transactions rolled back, by reason.',
+                '# TYPE ccpayroll_db_rollbacks_total counter',
+            ]
+            for reason, count in sorted(self.rollbacks.items()):
+                lines.append(f'ccpayroll_db_rollbacks_total{{reason="{reason}"}} {count}')
+
+            lines += [
+                '# HELP ccpayroll_db_queries_per_request Queries executed per application context.',
+                '# TYPE ccpayroll_db_queries_per_request histogram',
+            ]
+            lines += self.queries_per_request.render('ccpayroll_db_queries_per_request')
+
+            lines += [
+                '# HELP ccpayroll_db_query_duration_seconds Query latency by SQL fingerprint.',
+                '# TYPE ccpayroll_db_query_duration_seconds histogram',
+            ]
+            for key, histogram in sorted(self.query_latency.items()):
+                label = key.replace('\\', '\\\\').replace('"', '\\"')
+                lines += histogram.render('ccpayroll_db_query_duration_seconds', f'fingerprint="{label}"')
+
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+class MetricsCursor(RealDictCursor):
+    """RealDictCursor that records the latency of every statement it executes"""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, time.perf_counter() - start)
+
+    def _record(self, query, seconds):
+        registry.record_query(query, seconds)
+        if has_app_context():
+            g._db_query_count = g.get('_db_query_count', 0) + 1
+            
+            # Statements are collected when a query log is active (see explain.py)
+            query_log = g.get('_db_query_log')
+            if query_log is not None and self.query:
+                query_log.append(self.query)
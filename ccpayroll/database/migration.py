@@ -7,234 +7,129 @@ import json
 import uuid
 from flask import current_app
 from . import get_db
+from .bulk import load_rows
+from ..models.timesheet_entry import EDITABLE_FIELDS
+from ..models.adjustment import ADJUSTMENT_KINDS
+from .cache import employee_roster
+
+PERIOD_COLUMNS = ('id', 'name', 'start_date', 'end_date')
+EMPLOYEE_COLUMNS = ('id', 'name', 'rate', 'install_crew', 'position', 'pay_type', 'salary', 'commission_rate')
+EMPLOYEE_DEFAULTS = {'install_crew': 0, 'pay_type': 'hourly'}
+
+# Timesheet columns the app reads as numbers; missing ones load as 0, not NULL
+ENTRY_DEFAULTS = {'regular_hours': 0, 'overtime_hours': 0}
 
 def migrate_json_to_db():
     """Migrate data from JSON files to the PostgreSQL database
-    
+
     This is only used for backward compatibility with the old JSON-based storage.
+    Everything is bulk loaded in one transaction, so a failed migration
+    leaves the tables empty and is retried by the next upgrade.
     """
     # Check if we need to migrate (if tables are empty)
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT COUNT(*) FROM pay_periods')
         pay_periods_count = cursor.fetchone()['count']
-        
+
         cursor.execute('SELECT COUNT(*) FROM employees')
         employees_count = cursor.fetchone()['count']
-        
+
         # If we already have data, skip migration
         if pay_periods_count > 0 or employees_count > 0:
             return
-    
+
     data_folder = current_app.config['DATA_FOLDER']
-    
-    # Migrate pay periods
-    try_migrate_pay_periods(data_folder)
-    
-    # Migrate employees
-    try_migrate_employees(data_folder)
-    
-    # Migrate timesheets
-    try_migrate_timesheets(data_folder)
-
-def try_migrate_pay_periods(data_folder):
-    """Attempt to migrate pay periods from JSON file"""
-    json_path = os.path.join(data_folder, 'pay_periods.json')
-    if not os.path.exists(json_path):
+    pay_periods = read_json(data_folder, 'pay_periods.json') or []
+    employees = read_json(data_folder, 'employees.json') or []
+    if not pay_periods and not employees:
         return
-    
+
+    period_ids = {period['id'] for period in pay_periods}
+    entries, adjustments = [], []
+    for filename in sorted(os.listdir(data_folder)):
+        if not (filename.startswith('timesheet_') and filename.endswith('.json')):
+            continue
+
+        period_id = filename.replace('timesheet_', '').replace('.json', '')
+        if period_id not in period_ids:
+            current_app.logger.warning(f"Skipping timesheet {filename}: no pay period {period_id}")
+            continue
+
+        timesheet_data = read_json(data_folder, filename)
+        if timesheet_data:
+            timesheet_rows(period_id, timesheet_data, entries, adjustments)
+
     try:
-        with open(json_path, 'r') as f:
-            pay_periods = json.load(f)
-        
-        for period in pay_periods:
-            save_pay_period(period)
-        current_app.logger.info("Migrated pay periods from JSON to database")
+        with get_db() as conn:
+            cursor = conn.cursor()
+            results = [
+                load_rows(cursor, 'pay_periods', PERIOD_COLUMNS,
+                          [tuple(period[name] for name in PERIOD_COLUMNS) for period in pay_periods],
+                          key=('id',)),
+                load_rows(cursor, 'employees', EMPLOYEE_COLUMNS,
+                          [employee_row(employee) for employee in employees], key=('id',)),
+                load_rows(cursor, 'timesheet_entries', ('period_id', 'employee_name', 'day') + EDITABLE_FIELDS,
+                          entries, key=('period_id', 'employee_name', 'day')),
+                load_rows(cursor, 'employee_period_adjustments', ('period_id', 'employee_name', 'kind', 'amount'),
+                          adjustments, key=('period_id', 'employee_name', 'kind'))
+            ]
+            conn.commit()
     except Exception as e:
-        current_app.logger.error(f"Error migrating pay periods: {str(e)}")
+        current_app.logger.error(f"Error migrating JSON data, nothing was migrated: {str(e)}")
+        return
+
+    employee_roster.invalidate()
+    for result in results:
+        current_app.logger.info(
+            f"Migrated {result.table} from JSON: {result.inserted} inserted, {result.updated} updated"
+        )
 
-def try_migrate_employees(data_folder):
-    """Attempt to migrate employees from JSON file"""
-    json_path = os.path.join(data_folder, 'employees.json')
+def read_json(data_folder, filename):
+    """Read one JSON data file, or None if it is missing or unreadable"""
+    json_path = os.path.join(data_folder, filename)
     if not os.path.exists(json_path):
-        return
-    
+        return None
+
     try:
         with open(json_path, 'r') as f:
-            employees = json.load(f)
-        
-        for employee in employees:
-            save_employee(employee)
-        current_app.logger.info("Migrated employees from JSON to database")
+            return json.load(f)
     except Exception as e:
-        current_app.logger.error(f"Error migrating employees: {str(e)}")
+        current_app.logger.error(f"Error reading {filename}: {str(e)}")
+        return None
 
-def try_migrate_timesheets(data_folder):
-    """Attempt to migrate timesheet data from JSON files"""
-    for filename in os.listdir(data_folder):
-        if not (filename.startswith('timesheet_') and filename.endswith('.json')):
-            continue
-        
-        try:
-            period_id = filename.replace('timesheet_', '').replace('.json', '')
-            with open(os.path.join(data_folder, filename), 'r') as f:
-                timesheet_data = json.load(f)
-            
-            for employee_name, days in timesheet_data.items():
-                for day, data in days.items():
-                    for field, value in data.items():
-                        # Only save valid fields with non-empty values
-                        if value and field in ['hours', 'pay', 'project_name', 'install_days', 'install', 
-                                              'regular_hours', 'overtime_hours', 'job_name', 'notes', 'reimbursement']:
-                            save_timesheet_entry(period_id, employee_name, day, field, value)
-            
-            current_app.logger.info(f"Migrated timesheet {filename} to database")
-        except Exception as e:
-            current_app.logger.error(f"Error migrating timesheet {filename}: {str(e)}")
-
-def save_pay_period(period_data):
-    """Save a pay period to the database"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO pay_periods (id, name, start_date, end_date) VALUES (%s, %s, %s, %s) '
-            'ON CONFLICT (id) DO UPDATE SET name = %s, start_date = %s, end_date = %s',
-            (
-                period_data['id'], period_data['name'], period_data['start_date'], period_data['end_date'],
-                period_data['name'], period_data['start_date'], period_data['end_date']
-            )
-        )
-        conn.commit()
+def employee_row(employee_data):
+    """An employee from employees.json as a row of EMPLOYEE_COLUMNS"""
+    values = {name: employee_data.get(name) for name in EMPLOYEE_COLUMNS}
+    values['id'] = values['id'] or str(uuid.uuid4())
+    for name in EMPLOYEE_COLUMNS:
+        # Blank strings are not valid numbers
+        if values[name] in (None, ''):
+            values[name] = EMPLOYEE_DEFAULTS.get(name)
+    return tuple(values[name] for name in EMPLOYEE_COLUMNS)
 
-def save_employee(employee_data):
-    """Save an employee to the database"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        # Generate ID if it doesn't exist
-        if 'id' not in employee_data or not employee_data['id']:
-            employee_data['id'] = str(uuid.uuid4())
-        
-        # Set default values if they don't exist
-        employee_data.setdefault('rate', None)
-        employee_data.setdefault('install_crew', 0)
-        employee_data.setdefault('position', None)
-        employee_data.setdefault('pay_type', 'hourly')
-        employee_data.setdefault('salary', None)
-        employee_data.setdefault('commission_rate', None)
-        
-        cursor.execute(
-            'INSERT INTO employees (id, name, rate, install_crew, position, pay_type, salary, commission_rate) '
-            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s) '
-            'ON CONFLICT (id) DO UPDATE SET '
-            'name = %s, rate = %s, install_crew = %s, position = %s, pay_type = %s, salary = %s, commission_rate = %s',
-            (
-                employee_data['id'], employee_data['name'], employee_data['rate'], 
-                employee_data['install_crew'], employee_data['position'], 
-                employee_data['pay_type'], employee_data['salary'], employee_data['commission_rate'],
-                employee_data['name'], employee_data['rate'], 
-                employee_data['install_crew'], employee_data['position'], 
-                employee_data['pay_type'], employee_data['salary'], employee_data['commission_rate']
-            )
-        )
-        conn.commit()
-
-def save_timesheet_entry(period_id, employee_name, day, field, value):
-    """Save a timesheet entry to the database with improved reimbursement handling"""
-    # Make sure the field is valid for a timesheet entry
-    valid_fields = ['hours', 'pay', 'project_name', 'install_days', 'install', 
-                    'regular_hours', 'overtime_hours', 'job_name', 'notes', 'reimbursement']
-    
-    if field not in valid_fields:
-        current_app.logger.warning(f"Attempt to save invalid field '{field}' to timesheet entry")
-        return False
-    
-    # Special handling for reimbursement field
-    is_reimbursement = (field == 'reimbursement')
-    if is_reimbursement:
-        print(f"==== SAVING REIMBURSEMENT: {value} for {employee_name} on {day} ====")
-    
-    try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            # Check if the entry exists
-            cursor.execute(
-                'SELECT id FROM timesheet_entries WHERE period_id = %s AND employee_name = %s AND day = %s',
-                (period_id, employee_name, day)
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Get the existing ID correctly regardless of return format
-                existing_id = existing['id'] if isinstance(existing, dict) else existing[0]
-                
-                # Update the existing entry with the new field value
-                if is_reimbursement:
-                    # For reimbursement, use a direct SQL update with explicit parameters
-                    sql = "UPDATE timesheet_entries SET reimbursement = %s WHERE id = %s"
-                    print(f"==== UPDATING EXISTING ENTRY: ID {existing_id} with reimbursement {value} ====")
-                else:
-                    sql = f'UPDATE timesheet_entries SET {field} = %s WHERE id = %s'
-                
-                cursor.execute(sql, (value, existing_id))
-                
-                if is_reimbursement:
-                    print(f"==== UPDATE COMPLETE ====")
-            else:
-                # Create a new entry with this field set
-                if is_reimbursement:
-                    print(f"==== CREATING NEW ENTRY for {employee_name} on {day} with reimbursement {value} ====")
-                    
-                    # For reimbursement, always create a full entry with explicit field
-                    cursor.execute(
-                        '''INSERT INTO timesheet_entries 
-                           (period_id, employee_name, day, reimbursement) 
-                           VALUES (%s, %s, %s, %s)''',
-                        (period_id, employee_name, day, value)
+def timesheet_rows(period_id, timesheet_data, entries, adjustments):
+    """Add one period's timesheet_<period_id>.json to the entry and adjustment rows
+
+    Only valid fields with non-empty values are kept. Adjustment kinds
+    (e.g. 'reimbursement') are stored once per period, so their day is
+    ignored and the last day's value wins.
+    """
+    for employee_name, days in timesheet_data.items():
+        for day, data in days.items():
+            values = {field: value for field, value in data.items() if value}
+
+            if any(field in EDITABLE_FIELDS for field in values):
+                entries.append((period_id, employee_name, day) + tuple(
+                    values.get(field, ENTRY_DEFAULTS.get(field)) for field in EDITABLE_FIELDS
+                ))
+
+            for kind in ADJUSTMENT_KINDS:
+                if kind not in values:
+                    continue
+                try:
+                    adjustments.append((period_id, employee_name, kind, float(values[kind])))
+                except (ValueError, TypeError):
+                    current_app.logger.warning(
+                        f"Skipping {kind} '{values[kind]}' of {employee_name} in period {period_id}"
                     )
-                    print(f"==== INSERT COMPLETE ====")
-                else:
-                    # For other fields, use the dynamic approach
-                    fields = ['period_id', 'employee_name', 'day', field]
-                    values = [period_id, employee_name, day, value]
-                    
-                    placeholders = ', '.join(['%s'] * len(fields))
-                    fields_str = ', '.join(fields)
-                    
-                    sql = f'INSERT INTO timesheet_entries ({fields_str}) VALUES ({placeholders})'
-                    cursor.execute(sql, values)
-            
-            # Commit the transaction
-            conn.commit()
-            
-            # For reimbursement, verify the save
-            if is_reimbursement:
-                cursor.execute(
-                    'SELECT reimbursement FROM timesheet_entries WHERE period_id = %s AND employee_name = %s AND day = %s',
-                    (period_id, employee_name, day)
-                )
-                saved_entry = cursor.fetchone()
-                saved_value = saved_entry['reimbursement'] if isinstance(saved_entry, dict) else (saved_entry[0] if saved_entry else None)
-                
-                if saved_value == value:
-                    print(f"==== VERIFICATION SUCCESS: Reimbursement {value} saved for {employee_name} ====")
-                    return True
-                else:
-                    print(f"==== VERIFICATION FAILED: Got {saved_value} instead of {value} ====")
-                    return False
-            
-            return True
-    except Exception as e:
-        if is_reimbursement:
-            print(f"==== REIMBURSEMENT SAVE ERROR: {str(e)} ====")
-        try:
-            current_app.logger.error(f"Error saving timesheet entry: {str(e)}")
-        except:
-            print(f"Error logging exception: {str(e)}")
-        return False
-
-def migrate_database():
-    """Run any necessary database migrations"""
-    # This function is a placeholder for future migrations
-    current_app.logger.info("No migrations needed") 
\ No newline at end of file
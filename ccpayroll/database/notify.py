@@ -0,0 +1,177 @@
+"""
+Cross-worker change notifications for Creative Closets Payroll
+
+Triggers (schema migrations 3 and 12) send a NOTIFY on the ccpayroll_changes
+channel after writes to employees, pay_periods, timesheet_entries and
+employee_period_adjustments. The payload names what changed: 'employees',
+'pay_periods' or 'timesheet_entries:<period_id>' (also sent for a period's
+adjustments).
+
+Each worker process runs one listener thread that bumps a local generation
+counter per payload, so in-process caches can tell they are stale without
+asking the database.
+"""
+
+import os
+import select
+import threading
+import time
+from flask import current_app
+from psycopg2 import extensions
+
+CHANNEL = 'ccpayroll_changes'
+
+# Seconds between reconnect attempts after the listen connection fails
+RECONNECT_DELAY = 5.0
+
+def migrate_statement_notifications(conn):
+    """Notify once per statement and pay period instead of once per row
+
+    The timesheet_entries and employee_period_adjustments triggers read the
+    changed rows from transition tables and send one NOTIFY for each period
+    they touch. Transition tables need one trigger per event.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE OR REPLACE FUNCTION ccp_notify_period_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify('ccpayroll_changes', 'timesheet_entries:' || period_id)
+            FROM (SELECT DISTINCT period_id FROM new_rows) changed;
+        ELSIF TG_OP = 'UPDATE' THEN
+            PERFORM pg_notify('ccpayroll_changes', 'timesheet_entries:' || period_id)
+            FROM (SELECT period_id FROM old_rows UNION SELECT period_id FROM new_rows) changed;
+        ELSE
+            PERFORM pg_notify('ccpayroll_changes', 'timesheet_entries:' || period_id)
+            FROM (SELECT DISTINCT period_id FROM old_rows) changed;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    ''')
+
+    for table in ('timesheet_entries', 'employee_period_adjustments'):
+        cursor.execute(f'''
+        DROP TRIGGER IF EXISTS {table}_notify_change ON {table};
+
+        DROP TRIGGER IF EXISTS {table}_notify_change_insert ON {table};
+        CREATE TRIGGER {table}_notify_change_insert
+            AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION ccp_notify_period_change();
+
+        DROP TRIGGER IF EXISTS {table}_notify_change_update ON {table};
+        CREATE TRIGGER {table}_notify_change_update
+            AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION ccp_notify_period_change();
+
+        DROP TRIGGER IF EXISTS {table}_notify_change_delete ON {table};
+        CREATE TRIGGER {table}_notify_change_delete
+            AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION ccp_notify_period_change();
+        ''')
+
+    cursor.execute('DROP FUNCTION IF EXISTS ccp_notify_timesheet_change()')
+    conn.commit()
+
+def timesheet_key(period_id):
+    """Generation name for the timesheet entries of one pay period"""
+    return f'timesheet_entries:{period_id}'
+
+class Generations:
+    """Thread-safe local write counters, keyed by notification payload"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._epoch = 0
+
+    def get(self, name):
+        """Return the local generation of ``name``
+
+        The epoch is part of the value, so bump_all() changes every name at once.
+        """
+        with self._lock:
+            return (self._epoch, self._counts.get(name, 0))
+
+    def bump(self, name):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def bump_all(self):
+        """Mark everything changed, e.g. after notifications may have been missed"""
+        with self._lock:
+            self._epoch += 1
+
+# Local generations of this worker process
+generations = Generations()
+
+class ChangeListener(threading.Thread):
+    """Daemon thread that LISTENs for change notifications on its own connection"""
+
+    def __init__(self, app, connect, poll_timeout=5.0):
+        super().__init__(name='ccpayroll-change-listener', daemon=True)
+        self.app = app
+        self._connect = connect
+        self.poll_timeout = poll_timeout
+        self._listening = threading.Event()
+
+    @property
+    def listening(self):
+        """Whether notifications are currently being received"""
+        return self._listening.is_set()
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                self.app.logger.warning(f"Change listener disconnected in process {os.getpid()}: {str(e)}")
+            finally:
+                # Anything could have changed while we were not listening
+                self._listening.clear()
+                generations.bump_all()
+            time.sleep(RECONNECT_DELAY)
+
+    def _listen(self):
+        with self.app.app_context():
+            conn = self._connect()
+        try:
+            conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            conn.cursor().execute(f'LISTEN {CHANNEL}')
+            self._listening.set()
+
+            while True:
+                if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    generations.bump(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+def running_listener():
+    """Get this process's change listener if one was started, without starting it"""
+    if _listener is not None and _listener_pid == os.getpid():
+        return _listener
+    return None
+
+def get_listener():
+    """Get this process's change listener, starting it if needed"""
+    global _listener, _listener_pid
+
+    # Threads do not survive fork, so each worker starts its own
+    if _listener is not None and _listener_pid == os.getpid():
+        return _listener
+
+    with _listener_lock:
+        if _listener is None or _listener_pid != os.getpid():
+            from . import _connect
+            _listener = ChangeListener(current_app._get_current_object(), _connect)
+            _listener.start()
+            _listener_pid = os.getpid()
+
+    return _listener
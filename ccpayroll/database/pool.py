@@ -0,0 +1,193 @@
+"""
+Connection pool for Creative Closets Payroll
+
+A bounded, thread-safe pool of psycopg2 connections shared by all requests
+handled by a worker process.
+"""
+
+import os
+import threading
+import time
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of PostgreSQL connections
+
+    Connections are opened lazily up to ``max_size``; ``min_size`` of them are
+    opened up front. Every checkout is health checked, and connections older
+    than ``max_age`` seconds are closed instead of being handed out again.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=30.0, max_age=3600.0, check_idle=30.0):
+        """Create a pool
+
+        Args:
+            connect: Callable returning a new psycopg2 connection
+            min_size: Number of connections opened when the pool is created
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection before giving up
+            max_age: Seconds after which a connection is retired
+            check_idle: Connections idle for longer than this are pinged on checkout
+        """
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check_idle = check_idle
+
+        self._cond = threading.Condition()
+        self._idle = []        # (connection, last_used) pairs, most recently used last
+        self._created = {}     # id(connection) -> (connection, creation time)
+        self._size = 0         # open connections, idle or checked out
+
+        for _ in range(self.min_size):
+            conn = self._open()
+            self._idle.append((conn, time.monotonic()))
+
+    @property
+    def size(self):
+        """Number of open connections"""
+        return self._size
+
+    @property
+    def idle(self):
+        """Number of open connections waiting in the pool"""
+        return len(self._idle)
+
+    def getconn(self):
+        """Check a connection out of the pool
+
+        Raises:
+            PoolTimeout: If no connection is available within the timeout
+        """
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            conn = None
+            last_used = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout:.1f}s "
+                            f"({self._size} of {self.max_size} in use)"
+                        )
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    # Reserve a slot and open the connection outside the lock
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    return self._open(reserved=True)
+                except Exception:
+                    self._release_slot()
+                    raise
+
+            if self._healthy(conn, last_used):
+                return conn
+
+            self._discard(conn)
+
+    def putconn(self, conn):
+        """Return a connection to the pool, resetting any open transaction"""
+        if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+
+        if conn.closed or self._expired(conn) or \
+                conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection; checked-out connections close when returned"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def forget(self):
+        """Drop every connection without ending its session
+
+        For a pool inherited across fork: the connections' sockets are shared
+        with the parent, and closing them would end the parent's sessions.
+        Each socket is swapped for /dev/null in this process first, so
+        nothing the child does with them reaches the server. Only call this
+        while no other thread uses the pool, e.g. right after fork.
+        """
+        connections = [conn for conn, _ in self._created.values()]
+        self._cond = threading.Condition()
+        self._idle = []
+        self._created = {}
+        self._size = 0
+
+        devnull = os.open(os.devnull, os.O_RDWR)
+        try:
+            for conn in connections:
+                if not conn.closed:
+                    os.dup2(devnull, conn.fileno())
+        finally:
+            os.close(devnull)
+
+    def _open(self, reserved=False):
+        """Open a new connection, counting it against the pool size"""
+        conn = self._connect()
+        with self._cond:
+            if not reserved:
+                self._size += 1
+            self._created[id(conn)] = (conn, time.monotonic())
+        return conn
+
+    def _healthy(self, conn, last_used):
+        """Check that an idle connection can be handed out"""
+        if conn.closed or self._expired(conn):
+            return False
+
+        if time.monotonic() - last_used < self.check_idle:
+            return True
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _expired(self, conn):
+        """Whether a connection has outlived max_age"""
+        created = self._created.get(id(conn))
+        return created is not None and time.monotonic() - created[1] > self.max_age
+
+    def _discard(self, conn):
+        """Close a connection and free its slot"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._created.pop(id(conn), None)
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
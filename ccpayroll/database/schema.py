@@ -0,0 +1,375 @@
+"""
+Versioned schema migrations for Creative Closets Payroll
+
+Schema changes are applied by the upgrade-db command (run in the release
+phase), never by web workers. Workers only check on boot that the database
+is at the version this code expects.
+"""
+
+from flask import current_app
+from . import get_db, init_db, ensure_indexes
+from .totals import migrate_period_totals, migrate_statement_period_totals
+from .jobs import migrate_jobs, migrate_job_progress
+from .generations import migrate_period_generations
+from .manifest import migrate_import_manifest
+from .notify import migrate_statement_notifications
+
+
+class SchemaVersionError(Exception):
+    """Raised when the database schema is older than the running code expects"""
+
+
+# Rows updated per transaction when backfilling new columns
+BACKFILL_BATCH_SIZE = 1000
+
+def backfill_in_batches(conn, table, touch_column, batch_size=BACKFILL_BATCH_SIZE):
+    """Rewrite every row of a table in small committed batches
+    
+    Setting a column to itself fires the table's BEFORE UPDATE trigger, which
+    fills derived columns. Each batch is its own short transaction, so the
+    table is never locked as a whole.
+    """
+    cursor = conn.cursor()
+    last_id = None
+    updated = 0
+    
+    while True:
+        cursor.execute(
+            f'''
+            UPDATE {table} SET {touch_column} = {touch_column}
+            WHERE id IN (
+                SELECT id FROM {table}
+                WHERE %(last_id)s::text IS NULL OR id > %(last_id)s
+                ORDER BY id LIMIT %(batch_size)s
+            )
+            RETURNING id
+            ''',
+            {'last_id': last_id, 'batch_size': batch_size}
+        )
+        ids = [row['id'] for row in cursor.fetchall()]
+        conn.commit()
+        
+        if not ids:
+            return updated
+        
+        updated += len(ids)
+        last_id = max(ids)
+
+def migrate_typed_columns(conn):
+    """Add typed NUMERIC/DATE columns alongside the legacy TEXT columns
+    
+    A trigger derives the typed columns from the TEXT columns on every write,
+    so existing writers keep working until the TEXT columns are retired.
+    New databases get the legacy reimbursement column here, since init_db no
+    longer creates it; migration 5 moves it to employee_period_adjustments.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute(r'''
+    CREATE OR REPLACE FUNCTION ccp_to_numeric(value TEXT) RETURNS NUMERIC AS $$
+        SELECT CASE WHEN value ~ '^\s*-?([0-9]+\.?[0-9]*|\.[0-9]+)\s*$' THEN trim(value)::numeric END
+    $$ LANGUAGE SQL IMMUTABLE;
+    
+    CREATE OR REPLACE FUNCTION ccp_to_date(value TEXT) RETURNS DATE AS $$
+    BEGIN
+        IF value ~ '^\s*[0-9]{4}-[0-9]{2}-[0-9]{2}\s*$' THEN
+            RETURN trim(value)::date;
+        END IF;
+        RETURN NULL;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql IMMUTABLE;
+    ''')
+    
+    cursor.execute('''
+    ALTER TABLE timesheet_entries
+        ADD COLUMN IF NOT EXISTS reimbursement TEXT,
+        ADD COLUMN IF NOT EXISTS work_date DATE,
+        ADD COLUMN IF NOT EXISTS hours_num NUMERIC,
+        ADD COLUMN IF NOT EXISTS pay_num NUMERIC,
+        ADD COLUMN IF NOT EXISTS install_days_num NUMERIC,
+        ADD COLUMN IF NOT EXISTS install_num NUMERIC,
+        ADD COLUMN IF NOT EXISTS reimbursement_num NUMERIC;
+    
+    ALTER TABLE pay_periods
+        ADD COLUMN IF NOT EXISTS start_on DATE,
+        ADD COLUMN IF NOT EXISTS end_on DATE;
+    
+    CREATE OR REPLACE FUNCTION timesheet_entries_typed_columns() RETURNS trigger AS $$
+    BEGIN
+        NEW.work_date := ccp_to_date(NEW.day);
+        NEW.hours_num := ccp_to_numeric(NEW.hours);
+        NEW.pay_num := ccp_to_numeric(NEW.pay);
+        NEW.install_days_num := ccp_to_numeric(NEW.install_days);
+        NEW.install_num := ccp_to_numeric(NEW.install);
+        NEW.reimbursement_num := ccp_to_numeric(NEW.reimbursement);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    
+    DROP TRIGGER IF EXISTS timesheet_entries_typed_columns ON timesheet_entries;
+    CREATE TRIGGER timesheet_entries_typed_columns
+        BEFORE INSERT OR UPDATE OF day, hours, pay, install_days, install, reimbursement
+        ON timesheet_entries
+        FOR EACH ROW EXECUTE FUNCTION timesheet_entries_typed_columns();
+    
+    CREATE OR REPLACE FUNCTION pay_periods_typed_columns() RETURNS trigger AS $$
+    BEGIN
+        NEW.start_on := ccp_to_date(NEW.start_date);
+        NEW.end_on := ccp_to_date(NEW.end_date);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    
+    DROP TRIGGER IF EXISTS pay_periods_typed_columns ON pay_periods;
+    CREATE TRIGGER pay_periods_typed_columns
+        BEFORE INSERT OR UPDATE OF start_date, end_date
+        ON pay_periods
+        FOR EACH ROW EXECUTE FUNCTION pay_periods_typed_columns();
+    ''')
+    conn.commit()
+    
+    periods = backfill_in_batches(conn, 'pay_periods', 'start_date')
+    entries = backfill_in_batches(conn, 'timesheet_entries', 'day')
+    current_app.logger.info(f"Backfilled typed columns for {periods} pay periods and {entries} timesheet entries")
+
+def migrate_cache_generations(conn):
+    """Count writes to cached tables so workers can detect stale caches
+    
+    A statement-level trigger bumps the table's generation on every
+    INSERT, UPDATE or DELETE, whichever code path performs it.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cache_generations (
+        name TEXT PRIMARY KEY,
+        generation BIGINT NOT NULL DEFAULT 0
+    );
+    
+    CREATE OR REPLACE FUNCTION ccp_bump_generation() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO cache_generations (name, generation) VALUES (TG_TABLE_NAME, 1)
+        ON CONFLICT (name) DO UPDATE SET generation = cache_generations.generation + 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    
+    DROP TRIGGER IF EXISTS employees_bump_generation ON employees;
+    CREATE TRIGGER employees_bump_generation
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON employees
+        FOR EACH STATEMENT EXECUTE FUNCTION ccp_bump_generation();
+    ''')
+    conn.commit()
+
+def migrate_change_notifications(conn):
+    """NOTIFY listening workers after writes to employees, pay periods and timesheets
+    
+    The timesheet trigger runs per row so the payload can name the period;
+    identical notifications within a transaction are delivered once.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE OR REPLACE FUNCTION ccp_notify_table_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('ccpayroll_changes', TG_TABLE_NAME);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    
+    CREATE OR REPLACE FUNCTION ccp_notify_timesheet_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('ccpayroll_changes', 'timesheet_entries:' || OLD.period_id);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM pg_notify('ccpayroll_changes', 'timesheet_entries:' || NEW.period_id);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    
+    DROP TRIGGER IF EXISTS employees_notify_change ON employees;
+    CREATE TRIGGER employees_notify_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON employees
+        FOR EACH STATEMENT EXECUTE FUNCTION ccp_notify_table_change();
+    
+    DROP TRIGGER IF EXISTS pay_periods_notify_change ON pay_periods;
+    CREATE TRIGGER pay_periods_notify_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pay_periods
+        FOR EACH STATEMENT EXECUTE FUNCTION ccp_notify_table_change();
+    
+    DROP TRIGGER IF EXISTS timesheet_entries_notify_change ON timesheet_entries;
+    CREATE TRIGGER timesheet_entries_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON timesheet_entries
+        FOR EACH ROW EXECUTE FUNCTION ccp_notify_timesheet_change();
+    ''')
+    conn.commit()
+
+def migrate_reimbursements_to_first_day(conn):
+    """Store each employee's reimbursement once per period, on its first day
+    
+    Older code copied reimbursements onto other days. The first-day value
+    wins; otherwise the largest one is kept. Other days are then cleared.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    INSERT INTO timesheet_entries (period_id, employee_name, day, reimbursement)
+    SELECT DISTINCT ON (t.period_id, t.employee_name) t.period_id, t.employee_name, p.start_date, t.reimbursement
+    FROM timesheet_entries t
+    JOIN pay_periods p ON p.id = t.period_id
+    WHERE t.reimbursement_num IS NOT NULL
+    ORDER BY t.period_id, t.employee_name, (t.day = p.start_date) DESC, t.reimbursement_num DESC
+    ON CONFLICT (period_id, employee_name, day) DO UPDATE SET reimbursement = EXCLUDED.reimbursement;
+    
+    UPDATE timesheet_entries t SET reimbursement = NULL
+    FROM pay_periods p
+    WHERE p.id = t.period_id AND t.day <> p.start_date AND t.reimbursement IS NOT NULL;
+    ''')
+    conn.commit()
+
+def migrate_period_adjustments(conn):
+    """Move reimbursements out of timesheet_entries into their own table
+
+    employee_period_adjustments holds one typed amount per pay period,
+    employee and kind (reimbursement, bonus or deduction). Existing
+    reimbursements are copied over, then the TEXT column and its typed
+    shadow are dropped. Writes notify listeners like timesheet entries do.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS employee_period_adjustments (
+        period_id TEXT NOT NULL REFERENCES pay_periods(id) ON DELETE CASCADE,
+        employee_name TEXT NOT NULL,
+        kind TEXT NOT NULL CHECK (kind IN ('reimbursement', 'bonus', 'deduction')),
+        amount NUMERIC(12, 2) NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (period_id, employee_name, kind)
+    );
+
+    INSERT INTO employee_period_adjustments (period_id, employee_name, kind, amount)
+    SELECT DISTINCT ON (period_id, employee_name) period_id, employee_name, 'reimbursement', reimbursement_num
+    FROM timesheet_entries
+    WHERE reimbursement_num IS NOT NULL
+    ORDER BY period_id, employee_name, reimbursement_num DESC
+    ON CONFLICT (period_id, employee_name, kind) DO NOTHING;
+
+    DROP TRIGGER IF EXISTS timesheet_entries_typed_columns ON timesheet_entries;
+
+    CREATE OR REPLACE FUNCTION timesheet_entries_typed_columns() RETURNS trigger AS $$
+    BEGIN
+        NEW.work_date := ccp_to_date(NEW.day);
+        NEW.hours_num := ccp_to_numeric(NEW.hours);
+        NEW.pay_num := ccp_to_numeric(NEW.pay);
+        NEW.install_days_num := ccp_to_numeric(NEW.install_days);
+        NEW.install_num := ccp_to_numeric(NEW.install);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    ALTER TABLE timesheet_entries
+        DROP COLUMN IF EXISTS reimbursement_num,
+        DROP COLUMN IF EXISTS reimbursement;
+
+    CREATE TRIGGER timesheet_entries_typed_columns
+        BEFORE INSERT OR UPDATE OF day, hours, pay, install_days, install
+        ON timesheet_entries
+        FOR EACH ROW EXECUTE FUNCTION timesheet_entries_typed_columns();
+
+    DROP TRIGGER IF EXISTS employee_period_adjustments_notify_change ON employee_period_adjustments;
+    CREATE TRIGGER employee_period_adjustments_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON employee_period_adjustments
+        FOR EACH ROW EXECUTE FUNCTION ccp_notify_timesheet_change();
+    ''')
+    conn.commit()
+
+# Versioned schema migrations, applied in order by migrate_database()
+MIGRATIONS = [
+    (1, 'Typed numeric and date columns', migrate_typed_columns),
+    (2, 'Cache generation counters', migrate_cache_generations),
+    (3, 'Change notifications', migrate_change_notifications),
+    (4, 'Reimbursements stored once per period', migrate_reimbursements_to_first_day),
+    (5, 'Per-period employee adjustments', migrate_period_adjustments),
+    (6, 'Employee period totals rollup', migrate_period_totals),
+    (7, 'Background jobs', migrate_jobs),
+    (8, 'Per-period data generations', migrate_period_generations),
+    (9, 'Import manifest', migrate_import_manifest),
+    (10, 'Job progress and uploads', migrate_job_progress),
+    (11, 'Statement-level period totals', migrate_statement_period_totals),
+    (12, 'Statement-level change notifications', migrate_statement_notifications),
+]
+
+# Schema version this code expects the database to be at
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    """Return the highest applied migration version, or 0 for an unmigrated database"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL AS present")
+    if not cursor.fetchone()['present']:
+        return 0
+    
+    cursor.execute('SELECT COALESCE(MAX(version), 0) AS version FROM schema_version')
+    return cursor.fetchone()['version']
+
+def verify_schema_version():
+    """Check that the database has been migrated to SCHEMA_VERSION
+    
+    Raises:
+        SchemaVersionError: If migrations are still pending
+    """
+    with get_db() as conn:
+        version = get_schema_version(conn)
+        conn.rollback()
+    
+    if version < SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Database schema is at version {version}, but this code needs version "
+            f"{SCHEMA_VERSION}. Run 'flask --app app upgrade-db' first."
+        )
+    return version
+
+def migrate_database():
+    """Apply any schema migrations that have not been recorded in schema_version"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        
+        # Serialize concurrent runs, e.g. a release command racing a developer
+        cursor.execute("SELECT pg_advisory_lock(hashtext('ccpayroll.migrate_database'))")
+        try:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            ''')
+            conn.commit()
+            
+            cursor.execute('SELECT version FROM schema_version')
+            applied = {row['version'] for row in cursor.fetchall()}
+            
+            pending = [m for m in MIGRATIONS if m[0] not in applied]
+            if not pending:
+                current_app.logger.info("No migrations needed")
+                return
+            
+            for version, description, migrate in pending:
+                current_app.logger.info(f"Applying migration {version}: {description}")
+                migrate(conn)
+                cursor.execute(
+                    'INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                    (version, description)
+                )
+                conn.commit()
+        finally:
+            conn.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(hashtext('ccpayroll.migrate_database'))")
+            conn.commit()
+
+def upgrade_database():
+    """Create the base tables, apply pending migrations and ensure indexes"""
+    init_db()
+    migrate_database()
+    ensure_indexes()
+    return verify_schema_version()
@@ -0,0 +1,297 @@
+"""
+Per-employee, per-period totals rollup for Creative Closets Payroll
+
+employee_period_totals holds one row per pay period and employee with the
+sums of their timesheet entries (hours, pay, regular and overtime hours,
+entry count) and their adjustments. Statement triggers on timesheet_entries
+and employee_period_adjustments apply each statement's net difference, so
+readers get totals without scanning the daily entries. rebuild_period_totals()
+recomputes the rollup from scratch, e.g. after a manual fix or TRUNCATE.
+"""
+
+from . import get_db
+
+def migrate_period_totals(conn):
+    """Create the employee_period_totals rollup, its triggers, and fill it"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS employee_period_totals (
+        period_id TEXT NOT NULL REFERENCES pay_periods(id) ON DELETE CASCADE,
+        employee_name TEXT NOT NULL,
+        hours NUMERIC NOT NULL DEFAULT 0,
+        pay NUMERIC NOT NULL DEFAULT 0,
+        regular_hours NUMERIC NOT NULL DEFAULT 0,
+        overtime_hours NUMERIC NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0,
+        reimbursement NUMERIC NOT NULL DEFAULT 0,
+        bonus NUMERIC NOT NULL DEFAULT 0,
+        deduction NUMERIC NOT NULL DEFAULT 0,
+        last_modified TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (period_id, employee_name)
+    );
+
+    -- Add a difference to one employee's period totals; rows left with
+    -- no entries and no adjustments are removed
+    CREATE OR REPLACE FUNCTION ccp_add_period_totals(
+        p_period_id TEXT, p_employee_name TEXT,
+        d_hours NUMERIC, d_pay NUMERIC, d_regular_hours NUMERIC, d_overtime_hours NUMERIC,
+        d_entries INTEGER, d_reimbursement NUMERIC, d_bonus NUMERIC, d_deduction NUMERIC
+    ) RETURNS void AS $$
+    BEGIN
+        -- Nothing to track once the period itself is being deleted
+        PERFORM 1 FROM pay_periods WHERE id = p_period_id;
+        IF NOT FOUND THEN
+            RETURN;
+        END IF;
+
+        INSERT INTO employee_period_totals AS t
+            (period_id, employee_name, hours, pay, regular_hours, overtime_hours,
+             entries, reimbursement, bonus, deduction, last_modified)
+        VALUES (p_period_id, p_employee_name, d_hours, d_pay, d_regular_hours, d_overtime_hours,
+                d_entries, d_reimbursement, d_bonus, d_deduction, NOW())
+        ON CONFLICT (period_id, employee_name) DO UPDATE SET
+            hours = t.hours + EXCLUDED.hours,
+            pay = t.pay + EXCLUDED.pay,
+            regular_hours = t.regular_hours + EXCLUDED.regular_hours,
+            overtime_hours = t.overtime_hours + EXCLUDED.overtime_hours,
+            entries = t.entries + EXCLUDED.entries,
+            reimbursement = t.reimbursement + EXCLUDED.reimbursement,
+            bonus = t.bonus + EXCLUDED.bonus,
+            deduction = t.deduction + EXCLUDED.deduction,
+            last_modified = NOW();
+
+        IF d_entries < 0 OR d_reimbursement <> 0 OR d_bonus <> 0 OR d_deduction <> 0 THEN
+            DELETE FROM employee_period_totals
+            WHERE period_id = p_period_id AND employee_name = p_employee_name
+              AND entries = 0 AND reimbursement = 0 AND bonus = 0 AND deduction = 0;
+        END IF;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION ccp_timesheet_entries_totals() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.period_id = NEW.period_id AND OLD.employee_name = NEW.employee_name THEN
+            PERFORM ccp_add_period_totals(
+                NEW.period_id, NEW.employee_name,
+                COALESCE(NEW.hours_num, 0) - COALESCE(OLD.hours_num, 0),
+                COALESCE(NEW.pay_num, 0) - COALESCE(OLD.pay_num, 0),
+                COALESCE(NEW.regular_hours, 0)::numeric - COALESCE(OLD.regular_hours, 0)::numeric,
+                COALESCE(NEW.overtime_hours, 0)::numeric - COALESCE(OLD.overtime_hours, 0)::numeric,
+                0, 0, 0, 0);
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM ccp_add_period_totals(
+                OLD.period_id, OLD.employee_name,
+                -COALESCE(OLD.hours_num, 0), -COALESCE(OLD.pay_num, 0),
+                -COALESCE(OLD.regular_hours, 0)::numeric, -COALESCE(OLD.overtime_hours, 0)::numeric,
+                -1, 0, 0, 0);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM ccp_add_period_totals(
+                NEW.period_id, NEW.employee_name,
+                COALESCE(NEW.hours_num, 0), COALESCE(NEW.pay_num, 0),
+                COALESCE(NEW.regular_hours, 0)::numeric, COALESCE(NEW.overtime_hours, 0)::numeric,
+                1, 0, 0, 0);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION ccp_adjustments_totals() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM ccp_add_period_totals(
+                OLD.period_id, OLD.employee_name, 0, 0, 0, 0, 0,
+                CASE WHEN OLD.kind = 'reimbursement' THEN -OLD.amount ELSE 0 END,
+                CASE WHEN OLD.kind = 'bonus' THEN -OLD.amount ELSE 0 END,
+                CASE WHEN OLD.kind = 'deduction' THEN -OLD.amount ELSE 0 END);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM ccp_add_period_totals(
+                NEW.period_id, NEW.employee_name, 0, 0, 0, 0, 0,
+                CASE WHEN NEW.kind = 'reimbursement' THEN NEW.amount ELSE 0 END,
+                CASE WHEN NEW.kind = 'bonus' THEN NEW.amount ELSE 0 END,
+                CASE WHEN NEW.kind = 'deduction' THEN NEW.amount ELSE 0 END);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS timesheet_entries_totals ON timesheet_entries;
+    CREATE TRIGGER timesheet_entries_totals
+        AFTER INSERT OR UPDATE OR DELETE ON timesheet_entries
+        FOR EACH ROW EXECUTE FUNCTION ccp_timesheet_entries_totals();
+
+    DROP TRIGGER IF EXISTS employee_period_adjustments_totals ON employee_period_adjustments;
+    CREATE TRIGGER employee_period_adjustments_totals
+        AFTER INSERT OR UPDATE OR DELETE ON employee_period_adjustments
+        FOR EACH ROW EXECUTE FUNCTION ccp_adjustments_totals();
+    ''')
+
+    rebuild_totals(conn)
+    conn.commit()
+
+# Each source table's share of one row in the rollup columns it feeds
+ENTRY_TOTALS = {
+    'hours': 'COALESCE(hours_num, 0)',
+    'pay': 'COALESCE(pay_num, 0)',
+    'regular_hours': 'COALESCE(regular_hours, 0)::numeric',
+    'overtime_hours': 'COALESCE(overtime_hours, 0)::numeric',
+    'entries': '1'
+}
+ADJUSTMENT_TOTALS = {
+    kind: f"CASE WHEN kind = '{kind}' THEN amount ELSE 0 END"
+    for kind in ('reimbursement', 'bonus', 'deduction')
+}
+TOTAL_COLUMNS = tuple(ENTRY_TOTALS) + tuple(ADJUSTMENT_TOTALS)
+
+def _apply_totals_sql(shares, sources):
+    """SQL adding transition table rows to the rollup, one upsert per employee and period
+
+    Args:
+        shares: Rollup column to the expression of one row's share
+        sources: (transition table, sign) pairs, sign '' or '-'
+    """
+    deltas = ' UNION ALL '.join(
+        f"SELECT period_id, employee_name, "
+        f"{', '.join(f'{sign}{shares.get(column, 0)} AS {column}' for column in TOTAL_COLUMNS)} FROM {table}"
+        for table, sign in sources
+    )
+    keys = ' UNION '.join(f'SELECT period_id, employee_name FROM {table}' for table, _ in sources)
+    return f'''
+        -- Periods being deleted are skipped; sorted, so concurrent statements
+        -- lock rollup rows in the same order
+        INSERT INTO employee_period_totals AS t
+            (period_id, employee_name, {', '.join(TOTAL_COLUMNS)}, last_modified)
+        SELECT d.period_id, d.employee_name, {', '.join(f'SUM(d.{column})' for column in TOTAL_COLUMNS)}, NOW()
+        FROM ({deltas}) d
+        JOIN pay_periods p ON p.id = d.period_id
+        GROUP BY d.period_id, d.employee_name
+        ORDER BY d.period_id, d.employee_name
+        ON CONFLICT (period_id, employee_name) DO UPDATE SET
+            {', '.join(f'{column} = t.{column} + EXCLUDED.{column}' for column in TOTAL_COLUMNS)},
+            last_modified = NOW();
+
+        DELETE FROM employee_period_totals t
+        WHERE (t.period_id, t.employee_name) IN ({keys})
+          AND t.entries = 0
+          AND NOT EXISTS (
+              SELECT 1 FROM employee_period_adjustments a
+              WHERE a.period_id = t.period_id AND a.employee_name = t.employee_name
+          );
+    '''
+
+def migrate_statement_period_totals(conn):
+    """Maintain the rollup once per statement instead of once per row
+
+    The triggers read the changed rows from transition tables and apply
+    their net difference with one upsert per employee and period, so bulk
+    loads no longer upsert the rollup for every row. Rows left with no
+    entries and no adjustments are removed, as rebuild_totals() would.
+    Transition tables need one trigger per event.
+    """
+    cursor = conn.cursor()
+    for function, table, shares in (
+        ('ccp_timesheet_entries_totals', 'timesheet_entries', ENTRY_TOTALS),
+        ('ccp_adjustments_totals', 'employee_period_adjustments', ADJUSTMENT_TOTALS)
+    ):
+        cursor.execute(f'''
+        DROP TRIGGER IF EXISTS {table}_totals ON {table};
+
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_apply_totals_sql(shares, [('new_rows', '')])}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {_apply_totals_sql(shares, [('new_rows', ''), ('old_rows', '-')])}
+            ELSE
+                {_apply_totals_sql(shares, [('old_rows', '-')])}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS {table}_totals_insert ON {table};
+        CREATE TRIGGER {table}_totals_insert
+            AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+
+        DROP TRIGGER IF EXISTS {table}_totals_update ON {table};
+        CREATE TRIGGER {table}_totals_update
+            AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+
+        DROP TRIGGER IF EXISTS {table}_totals_delete ON {table};
+        CREATE TRIGGER {table}_totals_delete
+            AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+        ''')
+
+    cursor.execute('''
+    DROP FUNCTION IF EXISTS ccp_add_period_totals(
+        TEXT, TEXT, NUMERIC, NUMERIC, NUMERIC, NUMERIC, INTEGER, NUMERIC, NUMERIC, NUMERIC
+    )
+    ''')
+    rebuild_totals(conn)
+    conn.commit()
+
+def rebuild_totals(conn, period_id=None):
+    """Recompute the rollup from timesheet_entries and employee_period_adjustments
+
+    Writers to both tables are blocked until the caller commits, so no write
+    is counted twice or missed.
+
+    Args:
+        period_id: Only rebuild this pay period (default: every period)
+
+    Returns:
+        Number of rollup rows written
+    """
+    cursor = conn.cursor()
+    cursor.execute('LOCK TABLE timesheet_entries, employee_period_adjustments IN SHARE MODE')
+    cursor.execute(
+        'DELETE FROM employee_period_totals WHERE %(period_id)s::text IS NULL OR period_id = %(period_id)s',
+        {'period_id': period_id}
+    )
+    cursor.execute(
+        '''
+        INSERT INTO employee_period_totals
+            (period_id, employee_name, hours, pay, regular_hours, overtime_hours,
+             entries, reimbursement, bonus, deduction)
+        SELECT period_id, employee_name,
+               COALESCE(worked.hours, 0), COALESCE(worked.pay, 0),
+               COALESCE(worked.regular_hours, 0), COALESCE(worked.overtime_hours, 0),
+               COALESCE(worked.entries, 0),
+               COALESCE(adjusted.reimbursement, 0), COALESCE(adjusted.bonus, 0),
+               COALESCE(adjusted.deduction, 0)
+        FROM (
+            SELECT period_id, employee_name,
+                   SUM(hours_num) AS hours, SUM(pay_num) AS pay,
+                   SUM(regular_hours) AS regular_hours, SUM(overtime_hours) AS overtime_hours,
+                   COUNT(*) AS entries
+            FROM timesheet_entries
+            WHERE %(period_id)s::text IS NULL OR period_id = %(period_id)s
+            GROUP BY period_id, employee_name
+        ) worked
+        FULL JOIN (
+            SELECT period_id, employee_name,
+                   SUM(amount) FILTER (WHERE kind = 'reimbursement') AS reimbursement,
+                   SUM(amount) FILTER (WHERE kind = 'bonus') AS bonus,
+                   SUM(amount) FILTER (WHERE kind = 'deduction') AS deduction
+            FROM employee_period_adjustments
+            WHERE %(period_id)s::text IS NULL OR period_id = %(period_id)s
+            GROUP BY period_id, employee_name
+        ) adjusted USING (period_id, employee_name)
+        ''',
+        {'period_id': period_id}
+    )
+    return cursor.rowcount
+
+def rebuild_period_totals(period_id=None):
+    """Rebuild the rollup in its own transaction (see rebuild_totals)"""
+    with get_db() as conn:
+        rows = rebuild_totals(conn, period_id)
+        conn.commit()
+    return rows
@@ -0,0 +1,13 @@
+"""
+Importer module for Creative Closets Payroll
+
+This module reads the office's payroll workbooks into pay periods and
+timesheet records, and imports them in background jobs.
+"""
+
+from .parser import SheetPeriod, TimesheetRecord, iter_sheet_records, content_hash, check_workbook_path
+from .pipeline import ParsedSheet, parse_workbook, import_workbook
+from .jobs import import_workbook_job
+
+__all__ = ['SheetPeriod', 'TimesheetRecord', 'iter_sheet_records', 'content_hash', 'check_workbook_path',
+           'ParsedSheet', 'parse_workbook', 'import_workbook', 'import_workbook_job']
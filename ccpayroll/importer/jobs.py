@@ -0,0 +1,45 @@
+"""
+Background import jobs for Creative Closets Payroll
+
+An uploaded workbook is stored in its job row, so the worker that imports it
+does not need to share a filesystem with the web process that received it.
+Progress and the final summary are kept in the job's progress (see
+ccpayroll.worker.report_progress).
+"""
+
+import os
+import tempfile
+from dataclasses import asdict
+from ..worker import job_handler, job_upload, report_progress
+from .pipeline import import_workbook
+
+@job_handler('workbook_import')
+def import_workbook_job(filename: str):
+    """Background job: import the payroll workbook uploaded with the job"""
+    upload = job_upload()
+    if upload is None:
+        raise ValueError('The uploaded workbook is no longer available')
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, os.path.basename(filename))
+        with open(path, 'wb') as f:
+            f.write(upload)
+
+        progress = {}
+
+        def record(state):
+            progress.update(state)
+            report_progress(progress)
+
+        summary = import_workbook(path, progress=record)
+
+    # Keep the summary with the final progress for the results page
+    progress.update(
+        new=summary['new'],
+        changed=summary['changed'],
+        recorded=summary['recorded'],
+        skipped=summary['skipped'],
+        entries=summary['entries'],
+        loaded={table: asdict(result) for table, result in summary['loaded'].items()}
+    )
+    report_progress(progress)
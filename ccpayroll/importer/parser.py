@@ -0,0 +1,180 @@
+"""
+Single-pass payroll workbook parser for Creative Closets Payroll
+
+Each pay-period sheet of the office's payroll workbook lists employees one
+block after another: the employee's name in the first column, a header row
+(DAY, DATE, PROJECT NAME, ..., HOURS, PAY), then one row per weekday. Every
+sheet is read top to bottom a single time (see pipeline.py); a small state
+machine tracks the current employee and header columns and yields one typed
+record per day row.
+"""
+
+import re
+import hashlib
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional, Iterable, Iterator, Tuple, Dict
+
+# The workbook's first sheet is an empty template, not a pay period
+TEMPLATE_SHEET = 'PAYROLL TIMESHEET'
+
+WEEKDAYS = ('MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY')
+
+# Upper-case first-column labels that are not employee names
+NOT_EMPLOYEES = ('DAY', 'DATE', 'PERIOD', 'REIMBURSEMENT', 'TOTAL', 'CREATIVE CLOSETS PAYROLL TIME SHEET')
+NOT_EMPLOYEE_PREFIXES = ('PAY PERIOD', 'INSTALL CREW', 'TOTAL')
+
+# Header cell text -> record field; an exact label wins over one containing the text
+HEADER_COLUMNS = (('PROJECT', 'project'), ('HOURS', 'hours'), ('DATE', 'date'), ('PAY', 'pay'))
+
+SHEET_DATES = re.compile(r'(\d+\.\d+\.\d+)\s+[Tt][Oo]\s+(\d+\.\d+\.\d+)')
+
+@dataclass(frozen=True)
+class SheetPeriod:
+    """The pay period a sheet holds; dates are None if the name has none"""
+    sheet: str
+    name: str
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+    @classmethod
+    def from_sheet_name(cls, sheet: str) -> 'SheetPeriod':
+        """Read the period from a sheet name like 'payroll 01.06.25 to 01.12.25'"""
+        name = sheet.replace('payroll ', '')
+        match = SHEET_DATES.search(sheet)
+        if match:
+            try:
+                start, end = (datetime.strptime(value, '%m.%d.%y') for value in match.groups())
+                return cls(sheet, name, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+            except ValueError:
+                pass
+        return cls(sheet, name)
+
+@dataclass(frozen=True)
+class TimesheetRecord:
+    """One employee's day on a sheet"""
+    employee: str
+    date: str
+    hours: Optional[float]
+    pay: Optional[float]
+    project: Optional[str]
+
+    @property
+    def is_blank(self) -> bool:
+        return self.hours is None and self.pay is None and not self.project
+
+    def entry_values(self) -> Dict[str, Optional[str]]:
+        """The record's timesheet_entries column values, None where blank"""
+        return {
+            'hours': f'{self.hours:g}' if self.hours is not None else None,
+            'pay': f'{self.pay:.2f}' if self.pay is not None else None,
+            'project_name': self.project or None
+        }
+
+def iter_sheet_records(rows: Iterable[Tuple], period: SheetPeriod) -> Iterator[TimesheetRecord]:
+    """Yield the records of one sheet's rows (tuples of cell values)
+
+    Day rows without a date in their DATE column take the period's dates in
+    order. Rows before an employee's first header row are ignored.
+    """
+    start = datetime.strptime(period.start_date, '%Y-%m-%d').date() if period.start_date else None
+    employee = None
+    columns = {}
+    day_number = 0
+
+    for row in rows:
+        if not row:
+            continue
+        first = row[0].strip() if isinstance(row[0], str) else row[0]
+
+        if first in ('DAY', 'DATE') or _is_header(row):
+            columns = _header_columns(row)
+        elif _is_employee(first):
+            employee = first
+            day_number = 0
+        elif employee is not None and 'pay' in columns:
+            # A day row is named by its weekday, or (in our own exports) dated
+            day = _date(_cell(row, columns.get('date')))
+            if first not in WEEKDAYS and day is None:
+                continue
+            if day is None and start is not None:
+                day = start + timedelta(days=day_number)
+            day_number += 1
+            if day is None:
+                continue
+            yield TimesheetRecord(
+                employee,
+                day.strftime('%Y-%m-%d'),
+                _number(_cell(row, columns.get('hours'))),
+                _number(_cell(row, columns['pay'])),
+                _text(_cell(row, columns.get('project')))
+            )
+
+def content_hash(rows: Iterable[Tuple]) -> str:
+    """Hash a sheet's cell values, ignoring formatting and trailing empty cells"""
+    digest = hashlib.sha256()
+    for row in rows:
+        values = list(row)
+        while values and values[-1] is None:
+            values.pop()
+        digest.update(repr(values).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+def check_workbook_path(path: str) -> None:
+    """Raise ValueError unless the file is an .xlsx workbook openpyxl can read"""
+    if not path.lower().endswith(('.xlsx', '.xlsm')):
+        raise ValueError('Only .xlsx workbooks can be imported; save .xls files as .xlsx first')
+
+def _is_employee(value) -> bool:
+    return (isinstance(value, str) and len(value) > 3 and value == value.upper()
+            and value not in WEEKDAYS and value not in NOT_EMPLOYEES
+            and not value.startswith(NOT_EMPLOYEE_PREFIXES))
+
+def _is_header(row) -> bool:
+    return any(isinstance(value, str) and value.strip().upper() == 'PAY' for value in row)
+
+def _header_columns(row) -> Dict[str, int]:
+    """Map record fields to columns, preferring exact labels (PAY over PAY TYPE)"""
+    labels = [value.strip().upper() if isinstance(value, str) else '' for value in row]
+    columns = {}
+    for text, field in HEADER_COLUMNS:
+        if text in labels:
+            columns[field] = labels.index(text)
+        else:
+            index = next((i for i, label in enumerate(labels) if text in label), None)
+            if index is not None:
+                columns[field] = index
+    return columns
+
+def _cell(row, index):
+    return row[index] if index is not None and index < len(row) else None
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace('$', '').replace(',', '').strip())
+        except ValueError:
+            return None
+    return None
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+def _date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        for fmt in ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y'):
+            try:
+                return datetime.strptime(value.strip(), fmt).date()
+            except ValueError:
+                pass
+    return None
@@ -0,0 +1,256 @@
+"""
+Payroll workbook import pipeline for Creative Closets Payroll
+
+Sheets are independent, so they are parsed in a process pool: each worker
+opens the workbook read-only once and parses its share of the sheets. The
+parent merges the results in sheet-date order and bulk loads every new pay
+period, employee and timesheet entry (see ccpayroll.database.bulk) in a
+single transaction: an import either lands completely or not at all.
+Sheets whose cell values hash the same as at their last import (see
+ccpayroll.database.manifest) are skipped, so re-uploading the workbook after
+a new week was added only loads that week.
+"""
+
+import os
+import uuid
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple, Optional, Dict, Any, Callable
+from datetime import datetime, timedelta
+from openpyxl import load_workbook
+from ..database import get_db
+from ..database.bulk import load_rows
+from ..database.cache import employee_roster
+from ..database.manifest import get_import_manifest
+from .parser import SheetPeriod, TimesheetRecord, TEMPLATE_SHEET, iter_sheet_records, content_hash, check_workbook_path
+
+# timesheet_entries columns an imported record writes (see TimesheetRecord.entry_values)
+ENTRY_COLUMNS = ('hours', 'pay', 'project_name')
+
+def import_workers() -> int:
+    """Worker processes for parsing, from IMPORT_WORKERS (default: one per CPU)"""
+    return max(1, int(os.environ.get('IMPORT_WORKERS', os.cpu_count() or 1)))
+
+@dataclass
+class ParsedSheet:
+    """One pay-period sheet of a workbook
+
+    records is None if the sheet is unchanged since its last import or
+    could not be read; error then says why it could not.
+    """
+    period: SheetPeriod
+    content_hash: Optional[str]
+    records: Optional[List[TimesheetRecord]]
+    error: Optional[str] = None
+
+def parse_sheets(path: str, titles: Optional[List[str]] = None,
+                 known: Optional[Dict[str, str]] = None,
+                 on_parsed: Optional[Callable[[int, int], None]] = None) -> List[ParsedSheet]:
+    """Parse sheets of a workbook, opening it once (runs in a pool worker)
+
+    A sheet that fails to parse is returned with its error instead of
+    failing the others.
+
+    Args:
+        titles: Sheets to parse (default: every pay-period sheet)
+        known: Sheet name to the content hash of its last import; sheets
+            whose hash still matches are hashed but not parsed
+        on_parsed: Called with (sheets parsed, sheets in total) after each sheet
+    """
+    known = known or {}
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if titles is None:
+            titles = [title for title in workbook.sheetnames if title != TEMPLATE_SHEET]
+        sheets = []
+        for title in titles:
+            period = SheetPeriod.from_sheet_name(title)
+            try:
+                rows = list(workbook[title].iter_rows(values_only=True))
+                digest = content_hash(rows)
+                records = None if known.get(title) == digest else list(iter_sheet_records(rows, period))
+                sheets.append(ParsedSheet(period, digest, records))
+            except Exception as e:
+                sheets.append(ParsedSheet(period, None, None, f'{type(e).__name__}: {e}'))
+            if on_parsed:
+                on_parsed(len(sheets), len(titles))
+        return sheets
+    finally:
+        workbook.close()
+
+def parse_workbook(path: str, workers: Optional[int] = None, known: Optional[Dict[str, str]] = None,
+                   on_parsed: Optional[Callable[[int, int], None]] = None) -> List[ParsedSheet]:
+    """Parse every pay-period sheet of a workbook, in sheet-date order
+
+    Args:
+        workers: Worker processes to parse with (default: import_workers());
+            with 1 the sheets are read in this process
+        known: Sheet name to content hash of sheets imported before (see
+            parse_sheets)
+        on_parsed: Called with (sheets parsed, sheets in total) as parsing
+            goes on; per sheet in this process, per worker's share in a pool
+
+    Returns:
+        A ParsedSheet per sheet, ordered by start date; sheets without dates
+        keep their workbook order after the dated ones
+
+    Raises:
+        ValueError: If the file is not an .xlsx workbook
+    """
+    check_workbook_path(path)
+    workers = workers or import_workers()
+    if workers == 1:
+        sheets = parse_sheets(path, known=known, on_parsed=on_parsed)
+    else:
+        workbook = load_workbook(path, read_only=True)
+        titles = [title for title in workbook.sheetnames if title != TEMPLATE_SHEET]
+        workbook.close()
+
+        # An equal share of the sheets per worker, so each opens the file once
+        workers = min(workers, len(titles) or 1)
+        chunks = [titles[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(parse_sheets, path, chunk, known) for chunk in chunks]
+            parsed = 0
+            for future in as_completed(futures):
+                parsed += len(future.result())
+                if on_parsed:
+                    on_parsed(parsed, len(titles))
+
+        # Chunk i holds sheets i, i + workers, ...; put them back in workbook order
+        sheets = [None] * len(titles)
+        for i, future in enumerate(futures):
+            for j, sheet in enumerate(future.result()):
+                sheets[i + j * workers] = sheet
+
+    ordered = sorted(enumerate(sheets), key=lambda item: (
+        item[1].period.start_date is None, item[1].period.start_date or '', item[0]
+    ))
+    return [sheet for _, sheet in ordered]
+
+def import_workbook(path: str, workers: Optional[int] = None,
+                    progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Import the new and changed sheets of a payroll workbook in one transaction
+
+    Sheets are matched to earlier imports by name in import_manifest.
+    Unchanged sheets are skipped without being parsed. A changed sheet
+    replaces the hours, pay and project names of its period, so cells
+    cleared in the workbook are cleared here too; other columns, such as
+    notes made in the app, are kept. A sheet not in the manifest whose pay
+    period name already exists (e.g. imported before the manifest was kept)
+    is only recorded in the manifest: nothing is written to the period, so
+    edits made in the app since are kept. Employees not on the roster are
+    added. Sheets that cannot be read are reported and left out; the rest
+    are still imported.
+
+    Args:
+        progress: Called with a dictionary of the 'stage' ('parsing',
+            'writing' or 'done'), 'sheets', 'sheets_parsed', 'rows_written'
+            and per-sheet 'errors' whenever they change. It is never called
+            while the import transaction is open.
+
+    Returns:
+        Summary with 'new', 'changed', 'recorded' (existing periods only
+        added to the manifest) and 'skipped' (pay period names), 'errors'
+        (sheet name to error), 'entries' (timesheet entries written) and
+        'loaded' (a LoadResult per table)
+    """
+    state = {'stage': 'parsing', 'sheets': 0, 'sheets_parsed': 0, 'rows_written': 0, 'errors': {}}
+
+    def report(**changes):
+        state.update(changes)
+        if progress:
+            progress(dict(state))
+
+    manifest = get_import_manifest()
+    sheets = parse_workbook(
+        path, workers, known={sheet: digest for sheet, (_, digest) in manifest.items()},
+        on_parsed=lambda parsed, total: report(sheets_parsed=parsed, sheets=total)
+    )
+    errors = {sheet.period.sheet: sheet.error for sheet in sheets if sheet.error}
+    report(stage='writing', errors=errors)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, name FROM pay_periods')
+        existing = {row['name']: row['id'] for row in cursor.fetchall()}
+
+        new_periods, changed, recorded, skipped = [], [], [], []
+        imported = []
+        for sheet in sheets:
+            if sheet.error:
+                continue
+            if sheet.records is None:
+                skipped.append(sheet.period.name)
+                continue
+
+            if sheet.period.sheet in manifest:
+                period_id = manifest[sheet.period.sheet][0]
+                changed.append((period_id, sheet))
+                imported.append((period_id, sheet))
+            elif any(row[1] == sheet.period.name for row in new_periods):
+                errors[sheet.period.sheet] = f'Another sheet in this workbook is pay period {sheet.period.name}'
+            elif sheet.period.name in existing:
+                recorded.append((existing[sheet.period.name], sheet))
+            else:
+                row = _period_row(sheet.period)
+                new_periods.append(row)
+                imported.append((row[0], sheet))
+
+        if changed:
+            cursor.execute(
+                f"UPDATE timesheet_entries SET {', '.join(f'{name} = NULL' for name in ENTRY_COLUMNS)} "
+                f"WHERE period_id = ANY(%s)",
+                ([period_id for period_id, _ in changed],)
+            )
+
+        names = sorted({record.employee for _, sheet in imported for record in sheet.records})
+        entry_rows = [
+            (period_id, record.employee, record.date) + tuple(record.entry_values()[name] for name in ENTRY_COLUMNS)
+            for period_id, sheet in imported
+            for record in sheet.records if not record.is_blank
+        ]
+        loaded = {
+            'pay_periods': load_rows(
+                cursor, 'pay_periods', ('id', 'name', 'start_date', 'end_date'), new_periods, key=('id',)
+            ),
+            'employees': load_rows(
+                cursor, 'employees', ('id', 'name', 'install_crew', 'position'),
+                [(str(uuid.uuid4()), name, 0, 'none') for name in names],
+                key=('name',), update=()
+            ),
+            'timesheet_entries': load_rows(
+                cursor, 'timesheet_entries', ('period_id', 'employee_name', 'day') + ENTRY_COLUMNS,
+                entry_rows, key=('period_id', 'employee_name', 'day')
+            ),
+            'import_manifest': load_rows(
+                cursor, 'import_manifest', ('sheet', 'period_id', 'content_hash', 'imported_at'),
+                [(sheet.period.sheet, period_id, sheet.content_hash, datetime.now())
+                 for period_id, sheet in imported + recorded],
+                key=('sheet',)
+            )
+        }
+
+        conn.commit()
+
+    if loaded['employees'].inserted:
+        employee_roster.invalidate()
+
+    report(stage='done', rows_written=sum(result.inserted + result.updated for result in loaded.values()))
+
+    entries = loaded['timesheet_entries']
+    return {
+        'new': [row[1] for row in new_periods],
+        'changed': [sheet.period.name for _, sheet in changed],
+        'recorded': [sheet.period.name for _, sheet in recorded],
+        'skipped': skipped,
+        'errors': errors,
+        'entries': entries.inserted + entries.updated,
+        'loaded': loaded
+    }
+
+def _period_row(period: SheetPeriod) -> Tuple[str, str, str, str]:
+    # Use the current week if the sheet name has no dates
+    start_date = period.start_date or datetime.now().strftime('%Y-%m-%d')
+    end_date = period.end_date or (datetime.strptime(start_date, '%Y-%m-%d') + timedelta(days=6)).strftime('%Y-%m-%d')
+    return (str(uuid.uuid4()), period.name, start_date, end_date)
@@ -7,5 +7,8 @@ This module provides the data models used throughout the application.
 from .employee import Employee
 from .pay_period import PayPeriod
 from .timesheet_entry import TimesheetEntry
+from .crew import Crew
+from .adjustment import Adjustment
+from .period_grid import PeriodGrid
 
-__all__ = ['Employee', 'PayPeriod', 'TimesheetEntry'] 
\ No newline at end of file
+__all__ = ['Employee', 'PayPeriod', 'TimesheetEntry', 'Crew', 'Adjustment', 'PeriodGrid'] 
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Per-period employee adjustments for Creative Closets Payroll
+"""
+
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Tuple
+from psycopg2.extras import execute_values
+from ..database import get_db
+
+# Kinds of adjustment, each stored at most once per employee and pay period
+ADJUSTMENT_KINDS = ('reimbursement', 'bonus', 'deduction')
+
+@dataclass
+class Adjustment:
+    """A reimbursement, bonus or deduction for one employee in one pay period
+
+    Amounts are positive; a deduction is subtracted from the employee's pay.
+    """
+    period_id: str
+    employee_name: str
+    kind: str
+    amount: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert adjustment to dictionary"""
+        return {
+            'period_id': self.period_id,
+            'employee_name': self.employee_name,
+            'kind': self.kind,
+            'amount': self.amount
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Adjustment':
+        """Create an Adjustment instance from a dictionary"""
+        return cls(
+            period_id=data['period_id'],
+            employee_name=data['employee_name'],
+            kind=data['kind'],
+            amount=float(data['amount'])
+        )
+
+    @classmethod
+    def get_by_period(cls, period_id: str) -> List['Adjustment']:
+        """Get every adjustment of a pay period in one query"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT period_id, employee_name, kind, amount
+                FROM employee_period_adjustments
+                WHERE period_id = %s
+                ORDER BY employee_name, kind
+                ''',
+                (period_id,)
+            )
+            rows = cursor.fetchall()
+
+        return [cls.from_dict(dict(row)) for row in rows]
+
+    @staticmethod
+    def get_amounts(period_ids: List[str]) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Get the adjustment amounts of several pay periods in one query
+
+        Returns:
+            Dictionary keyed by period id, then employee name, then kind
+        """
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT period_id, employee_name, kind, amount
+                FROM employee_period_adjustments
+                WHERE period_id = ANY(%s)
+                ''',
+                (list(period_ids),)
+            )
+            rows = cursor.fetchall()
+
+        amounts = {}
+        for row in rows:
+            employees = amounts.setdefault(row['period_id'], {})
+            employees.setdefault(row['employee_name'], {})[row['kind']] = float(row['amount'])
+        return amounts
+
+    @staticmethod
+    def get_period_amounts(period_id: str) -> Dict[str, Dict[str, float]]:
+        """Get the adjustment amounts of one pay period, keyed by employee name then kind"""
+        return Adjustment.get_amounts([period_id]).get(period_id, {})
+
+    @staticmethod
+    def write_amounts(cursor, period_id: str, amounts: Dict[Tuple[str, str], Optional[str]]) -> None:
+        """Write adjustment amounts on an open cursor, without committing
+
+        Args:
+            amounts: (employee name, kind) to amount; a blank or None amount
+                removes the adjustment
+
+        Raises:
+            ValueError: If a kind is unknown or an amount is not a number
+        """
+        upserts = []
+        deletes = []
+        for (employee_name, kind), amount in amounts.items():
+            if kind not in ADJUSTMENT_KINDS:
+                raise ValueError(f"Invalid adjustment kind: {kind}")
+            if amount is None or str(amount).strip() == '':
+                deletes.append((employee_name, kind))
+            else:
+                upserts.append((period_id, employee_name, kind, float(amount)))
+
+        if upserts:
+            execute_values(
+                cursor,
+                '''
+                INSERT INTO employee_period_adjustments (period_id, employee_name, kind, amount)
+                VALUES %s
+                ON CONFLICT (period_id, employee_name, kind)
+                DO UPDATE SET amount = EXCLUDED.amount, updated_at = NOW()
+                ''',
+                upserts
+            )
+
+        if deletes:
+            cursor.execute(
+                '''
+                DELETE FROM employee_period_adjustments
+                WHERE period_id = %s
+                  AND (employee_name, kind) IN (SELECT * FROM unnest(%s::text[], %s::text[]))
+                ''',
+                (period_id, [name for name, _ in deletes], [kind for _, kind in deletes])
+            )
+
+    @staticmethod
+    def set_amounts(period_id: str, amounts: Dict[Tuple[str, str], Optional[str]]) -> None:
+        """Write adjustment amounts in one transaction (see write_amounts)"""
+        with get_db() as conn:
+            Adjustment.write_amounts(conn.cursor(), period_id, amounts)
+            conn.commit()
@@ -0,0 +1,153 @@
+"""
+Install crew pay for Creative Closets Payroll
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any
+from ..database import get_db
+from .employee import Employee
+
+@dataclass
+class Crew:
+    """An install crew: one lead installer and the assistants working with them
+
+    The lead is paid the day's install amount minus what the assistants earn
+    (hours x their hourly rate), plus their own hours x hourly rate.
+    """
+    number: int
+    lead: Optional[Employee] = None
+    assistants: List[Employee] = field(default_factory=list)
+
+    @property
+    def members(self) -> List[Employee]:
+        return ([self.lead] if self.lead else []) + self.assistants
+
+    @classmethod
+    def get_all(cls) -> Dict[int, 'Crew']:
+        """Group the roster into crews, keyed by crew number"""
+        crews = {}
+        for employee in Employee.get_all():
+            if (employee.install_crew or 0) <= 0 or employee.position not in ('lead', 'assistant'):
+                continue
+
+            crew = crews.setdefault(employee.install_crew, cls(employee.install_crew))
+            if employee.position == 'assistant':
+                crew.assistants.append(employee)
+            elif crew.lead is None:
+                # The first lead (by name) is the crew lead; any other lead is
+                # paid as entered, as on the timesheet page
+                crew.lead = employee
+
+        return crews
+
+    @staticmethod
+    def calculate_period_pay(period_id: str, crew_number: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+        """Calculate lead and assistant pay for every day of a pay period
+
+        Loads the crew roster from the cache and every crew member's entries in
+        one query.
+
+        Args:
+            crew_number: Only calculate this crew (default: every crew)
+
+        Returns:
+            Dictionary keyed by crew number, each holding the crew 'lead' name
+            and 'days', a dictionary keyed by date with 'install', 'assistants'
+            (name to pay), 'assistant_pay' (their total) and 'lead_pay'. Lead
+            pay is None on days without an install amount and when the lead
+            has no hourly rate.
+        """
+        crews = Crew.get_all()
+        if crew_number is not None:
+            crews = {number: crew for number, crew in crews.items() if number == crew_number}
+
+        names = [member.name for crew in crews.values() for member in crew.members]
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT employee_name, day, hours_num, install_num
+                FROM timesheet_entries
+                WHERE period_id = %s AND employee_name = ANY(%s)
+                ''',
+                (period_id, names)
+            )
+            entries = {(row['employee_name'], row['day']): row for row in cursor.fetchall()}
+
+        days = sorted({day for _, day in entries})
+        result = {}
+        for number, crew in sorted(crews.items()):
+            crew_days = {}
+            for day in days:
+                assistants = {}
+                for assistant in crew.assistants:
+                    entry = entries.get((assistant.name, day))
+                    if entry and entry['hours_num']:
+                        assistants[assistant.name] = float(entry['hours_num']) * (assistant.rate or 0)
+
+                assistant_pay = sum(assistants.values())
+                install = None
+                lead_pay = None
+                if crew.lead:
+                    lead_entry = entries.get((crew.lead.name, day))
+                    if lead_entry and lead_entry['install_num']:
+                        install = float(lead_entry['install_num'])
+                        if crew.lead.rate:
+                            lead_hours = float(lead_entry['hours_num'] or 0)
+                            lead_pay = install - assistant_pay + lead_hours * crew.lead.rate
+
+                if assistants or install is not None:
+                    crew_days[day] = {
+                        'install': install,
+                        'assistants': {name: round(pay, 2) for name, pay in assistants.items()},
+                        'assistant_pay': round(assistant_pay, 2),
+                        'lead_pay': round(lead_pay, 2) if lead_pay is not None else None
+                    }
+
+            result[number] = {
+                'lead': crew.lead.name if crew.lead else None,
+                'days': crew_days
+            }
+
+        return result
+
+# Position of each non-installer group in the roster grouping
+POSITION_GROUP_KEYS = {
+    'project_manager': 'project_managers',
+    'engineer': 'engineers',
+    'salesman': 'salesmen',
+    'ceo': 'ceo'
+}
+
+def group_roster(employees: List[Dict[str, Any]]):
+    """Group roster rows the way the timesheet page and export lay them out
+
+    Returns:
+        (position_groups, install_crews): position_groups maps
+        'install_crews' to {crew number: installers} and 'project_managers',
+        'engineers', 'salesmen', 'ceo' and 'other' to their employees sorted
+        by name; install_crews lists (crew number, installers) by crew
+        number, lead installers first.
+    """
+    position_groups = {'install_crews': {}, 'project_managers': [], 'engineers': [],
+                       'salesmen': [], 'ceo': [], 'other': []}
+
+    for employee in employees:
+        position = employee.get('position', 'none')
+        crew_num = employee.get('install_crew') or 0
+
+        if position in ['lead', 'assistant'] and crew_num > 0:
+            position_groups['install_crews'].setdefault(crew_num, []).append(employee)
+        else:
+            position_groups[POSITION_GROUP_KEYS.get(position, 'other')].append(employee)
+
+    for crew_num, installers in position_groups['install_crews'].items():
+        position_groups['install_crews'][crew_num] = sorted(installers, key=lambda emp: (
+            0 if emp.get('position') == 'lead' else 1 if emp.get('position') == 'assistant' else 2,
+            emp.get('name', '')
+        ))
+
+    for key in ['project_managers', 'engineers', 'salesmen', 'ceo', 'other']:
+        position_groups[key] = sorted(position_groups[key], key=lambda emp: emp.get('name', ''))
+
+    return position_groups, sorted(position_groups['install_crews'].items())
@@ -6,6 +6,7 @@ import uuid
 from dataclasses import dataclass, field
 from typing import Optional, ClassVar, Dict, Any
 from ..database import get_db
+from ..database.cache import employee_roster
 
 @dataclass
 class Employee:
@@ -39,7 +40,7 @@ class Employee:
             id=data.get('id', str(uuid.uuid4())),
             name=data['name'],
             position=data.get('position', 'none'),
-            install_crew=int(data.get('install_crew', 0)),
+            install_crew=int(data.get('install_crew') or 0),
             pay_type=data.get('pay_type', 'hourly'),
             rate=float(data['rate']) if data.get('rate') else None,
             salary=float(data['salary']) if data.get('salary') else None,
@@ -48,33 +49,20 @@ class Employee:
     
     @classmethod
     def get_all(cls) -> list['Employee']:
-        """Get all employees from the database"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM employees ORDER BY name')
-            rows = cursor.fetchall()
-        
-        return [cls.from_dict(dict(row)) for row in rows]
+        """Get all employees, ordered by name, from the roster cache"""
+        return [cls.from_dict(row) for row in employee_roster.rows()]
     
     @classmethod
     def get_by_id(cls, employee_id: str) -> Optional['Employee']:
         """Get an employee by ID"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM employees WHERE id = ?', (employee_id,))
-            row = cursor.fetchone()
-        
-        return cls.from_dict(dict(row)) if row else None
+        row = employee_roster.get('id', employee_id)
+        return cls.from_dict(row) if row else None
     
     @classmethod
     def get_by_name(cls, name: str) -> Optional['Employee']:
         """Get an employee by name"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM employees WHERE name = ?', (name,))
-            row = cursor.fetchone()
-        
-        return cls.from_dict(dict(row)) if row else None
+        row = employee_roster.get('name', name)
+        return cls.from_dict(row) if row else None
     
     def save(self) -> None:
         """Save this employee to the database"""
@@ -82,10 +70,14 @@ class Employee:
             cursor = conn.cursor()
             cursor.execute(
                 '''
-                INSERT OR REPLACE INTO employees (
+                INSERT INTO employees (
                     id, name, rate, install_crew, position, 
                     pay_type, salary, commission_rate
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (id) DO UPDATE SET
+                    name = EXCLUDED.name, rate = EXCLUDED.rate, install_crew = EXCLUDED.install_crew,
+                    position = EXCLUDED.position, pay_type = EXCLUDED.pay_type,
+                    salary = EXCLUDED.salary, commission_rate = EXCLUDED.commission_rate
                 ''',
                 (
                     self.id, 
@@ -99,13 +91,15 @@ class Employee:
                 )
             )
             conn.commit()
+        employee_roster.invalidate()
     
     def delete(self) -> None:
         """Delete this employee from the database"""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM employees WHERE id = ?', (self.id,))
+            cursor.execute('DELETE FROM employees WHERE id = %s', (self.id,))
             conn.commit()
+        employee_roster.invalidate()
     
     def calculate_pay(self, regular_hours: float, overtime_hours: float = 0) -> Dict[str, float]:
         """Calculate pay based on hours and pay type
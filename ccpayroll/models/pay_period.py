@@ -40,7 +40,7 @@ class PayPeriod:
         """Get all pay periods from the database, ordered by start date descending"""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM pay_periods ORDER BY start_date DESC')
+            cursor.execute('SELECT * FROM pay_periods ORDER BY start_on DESC')
             rows = cursor.fetchall()
         
         return [cls.from_dict(dict(row)) for row in rows]
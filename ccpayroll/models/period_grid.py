@@ -0,0 +1,189 @@
+"""
+Dense timesheet grid for one pay period of Creative Closets Payroll
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Iterable
+import numpy as np
+from ..database import get_db
+from ..database.cache import employee_roster
+from .adjustment import Adjustment, ADJUSTMENT_KINDS
+
+# Grid column name to the typed timesheet_entries column it is loaded from
+NUMERIC_COLUMNS = {
+    'hours': 'hours_num',
+    'pay': 'pay_num',
+    'install_days': 'install_days_num',
+    'install': 'install_num',
+    'regular_hours': 'regular_hours',
+    'overtime_hours': 'overtime_hours'
+}
+
+# Text columns, read from the database only when first needed
+TEXT_FIELDS = ('hours', 'pay', 'project_name', 'install_days', 'install', 'job_name', 'notes')
+
+def period_days(start_date: str, end_date: str) -> List[str]:
+    """Every date from start_date to end_date inclusive, as YYYY-MM-DD strings"""
+    current = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    days = []
+    while current <= end:
+        days.append(current.strftime('%Y-%m-%d'))
+        current += timedelta(days=1)
+    return days
+
+class PeriodGrid:
+    """Timesheet entries of one pay period as employees x days arrays
+
+    Rows follow the roster order and columns the period's days;
+    ``employee_index`` and ``day_index`` map names and dates to positions.
+    Numeric columns are float arrays with NaN for blank cells, so totals are
+    array reductions. Adjustments are one value per employee (NaN when not
+    set). Entries of employees no longer on the roster, or dated outside the
+    period, are left out.
+    """
+
+    def __init__(self, period: Dict[str, Any], employees: List[str], days: List[str]):
+        self.period = period
+        self.period_id = period['id']
+        self.employees = employees
+        self.days = days
+        self.employee_index = {name: i for i, name in enumerate(employees)}
+        self.day_index = {day: j for j, day in enumerate(days)}
+
+        shape = (len(employees), len(days))
+        self.values = {name: np.full(shape, np.nan) for name in NUMERIC_COLUMNS}
+        self.present = np.zeros(shape, dtype=bool)
+        self.adjustments = {kind: np.full(len(employees), np.nan) for kind in ADJUSTMENT_KINDS}
+        self._text = {}
+
+    @classmethod
+    def load(cls, period_id: str, text_fields: Iterable[str] = ()) -> Optional['PeriodGrid']:
+        """Load the grid of a pay period, or None if the period does not exist
+
+        Args:
+            text_fields: Text columns to read up front, in the same query as
+                the numeric columns (others are read on first use)
+        """
+        text_fields = cls._check_text_fields(text_fields)
+        columns = list(NUMERIC_COLUMNS.values()) + text_fields
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM pay_periods WHERE id = %s', (period_id,))
+            period = cursor.fetchone()
+            if not period:
+                return None
+
+            cursor.execute(
+                f'SELECT employee_name, day, {", ".join(columns)} FROM timesheet_entries WHERE period_id = %s',
+                (period_id,)
+            )
+            rows = cursor.fetchall()
+
+        grid = cls(
+            dict(period),
+            [employee['name'] for employee in employee_roster.rows()],
+            period_days(period['start_date'], period['end_date'])
+        )
+        rows, i, j = grid._locate(rows)
+        grid.present[i, j] = True
+        for name, column in NUMERIC_COLUMNS.items():
+            grid.values[name][i, j] = [np.nan if row[column] is None else float(row[column]) for row in rows]
+        grid._set_text(text_fields, rows, i, j)
+
+        for name, amounts in Adjustment.get_period_amounts(period_id).items():
+            index = grid.employee_index.get(name)
+            if index is not None:
+                for kind, amount in amounts.items():
+                    grid.adjustments[kind][index] = amount
+
+        return grid
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """The employees x days array of a numeric column"""
+        return self.values[name]
+
+    @property
+    def entry_count(self) -> int:
+        """Number of stored timesheet entries in the grid"""
+        return int(self.present.sum())
+
+    def totals(self, name: str, axis: Optional[int] = 1):
+        """Sum a numeric column per employee (axis=1), per day (axis=0) or overall (None)"""
+        return np.nansum(self.values[name], axis=axis)
+
+    def adjustment_totals(self, kind: str):
+        """Each employee's adjustment of one kind, 0 where not set"""
+        return np.nan_to_num(self.adjustments[kind])
+
+    def text(self, name: str) -> np.ndarray:
+        """The employees x days object array of a text column ('' when blank)"""
+        self.load_text(name)
+        return self._text[name]
+
+    def load_text(self, *names: str) -> None:
+        """Read any of the given text columns not loaded yet, in one query"""
+        missing = [name for name in self._check_text_fields(names) if name not in self._text]
+        if not missing:
+            return
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f'SELECT employee_name, day, {", ".join(missing)} FROM timesheet_entries WHERE period_id = %s',
+                (self.period_id,)
+            )
+            rows = cursor.fetchall()
+
+        self._set_text(missing, *self._locate(rows))
+
+    def to_timesheet(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Materialize the employee -> day -> fields dictionaries the timesheet pages use
+
+        Each employee's reimbursement is shown on every day.
+        """
+        self.load_text(*TEXT_FIELDS)
+        regular_hours = np.nan_to_num(self.values['regular_hours']).tolist()
+        overtime_hours = np.nan_to_num(self.values['overtime_hours']).tolist()
+        text = {name: self._text[name].tolist() for name in TEXT_FIELDS}
+        reimbursements = self.adjustments['reimbursement']
+
+        timesheet = {}
+        for i, employee_name in enumerate(self.employees):
+            reimbursement = '' if np.isnan(reimbursements[i]) else f'{reimbursements[i]:.2f}'
+            days = timesheet[employee_name] = {}
+            for j, day in enumerate(self.days):
+                fields = {name: text[name][i][j] for name in TEXT_FIELDS}
+                fields['regular_hours'] = regular_hours[i][j]
+                fields['overtime_hours'] = overtime_hours[i][j]
+                fields['reimbursement'] = reimbursement
+                days[day] = fields
+
+        return timesheet
+
+    def _locate(self, rows):
+        """Keep the rows inside the grid, with their row and column positions"""
+        kept, rows_i, cols_j = [], [], []
+        for row in rows:
+            i = self.employee_index.get(row['employee_name'])
+            j = self.day_index.get(row['day'])
+            if i is not None and j is not None:
+                kept.append(row)
+                rows_i.append(i)
+                cols_j.append(j)
+        return kept, np.array(rows_i, dtype=int), np.array(cols_j, dtype=int)
+
+    def _set_text(self, names, rows, i, j):
+        for name in names:
+            column = np.full(self.present.shape, '', dtype=object)
+            column[i, j] = ['' if row[name] is None else row[name] for row in rows]
+            self._text[name] = column
+
+    @staticmethod
+    def _check_text_fields(names) -> List[str]:
+        names = list(names)
+        invalid = [name for name in names if name not in TEXT_FIELDS]
+        if invalid:
+            raise ValueError(f"Invalid text fields: {', '.join(invalid)}")
+        return names
@@ -4,8 +4,25 @@ TimesheetEntry model for Creative Closets Payroll
 
 import uuid
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+from psycopg2.extras import execute_values
 from ..database import get_db
+from .adjustment import Adjustment, ADJUSTMENT_KINDS
+
+# Columns a timesheet cell edit may write
+EDITABLE_FIELDS = (
+    'hours', 'pay', 'project_name', 'install_days', 'install',
+    'regular_hours', 'overtime_hours', 'job_name', 'notes'
+)
+
+# Editable columns stored as numbers; a blank cell is written as NULL
+NUMBER_FIELDS = ('regular_hours', 'overtime_hours')
+
+def column_value(name: str, value: Any) -> Any:
+    """The value to write to an editable column for a cell edit"""
+    if name in NUMBER_FIELDS and value == '':
+        return None
+    return value
 
 @dataclass
 class TimesheetEntry:
@@ -22,7 +39,6 @@ class TimesheetEntry:
     overtime_hours: float = 0.0
     job_name: str = ""
     notes: str = ""
-    reimbursement: str = ""
     id: int = None
     
     def to_dict(self) -> Dict[str, Any]:
@@ -40,8 +56,7 @@ class TimesheetEntry:
             'regular_hours': self.regular_hours,
             'overtime_hours': self.overtime_hours,
             'job_name': self.job_name,
-            'notes': self.notes,
-            'reimbursement': self.reimbursement
+            'notes': self.notes
         }
     
     @classmethod
@@ -60,8 +75,7 @@ class TimesheetEntry:
             regular_hours=float(data.get('regular_hours', 0)),
             overtime_hours=float(data.get('overtime_hours', 0)),
             job_name=data.get('job_name', ''),
-            notes=data.get('notes', ''),
-            reimbursement=data.get('reimbursement', '')
+            notes=data.get('notes', '')
         )
     
     @classmethod
@@ -70,7 +84,7 @@ class TimesheetEntry:
         with get_db() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                'SELECT * FROM timesheet_entries WHERE period_id = %s AND employee_name = %s ORDER BY day',
+                'SELECT * FROM timesheet_entries WHERE period_id = %s AND employee_name = %s ORDER BY work_date, day',
                 (period_id, employee_id)
             )
             rows = cursor.fetchall()
@@ -99,8 +113,8 @@ class TimesheetEntry:
                 cursor.execute(
                     '''
                     INSERT INTO timesheet_entries 
-                    (period_id, employee_name, day, hours, pay, project_name, install_days, install, regular_hours, overtime_hours, job_name, notes, reimbursement) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    (period_id, employee_name, day, hours, pay, project_name, install_days, install, regular_hours, overtime_hours, job_name, notes) 
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     RETURNING id
                     ''',
                     (
@@ -115,8 +129,7 @@ class TimesheetEntry:
                         self.regular_hours,
                         self.overtime_hours,
                         self.job_name,
-                        self.notes,
-                        self.reimbursement
+                        self.notes
                     )
                 )
                 result = cursor.fetchone()
@@ -126,7 +139,7 @@ class TimesheetEntry:
                     '''
                     UPDATE timesheet_entries SET
                     period_id = %s, employee_name = %s, day = %s, hours = %s, pay = %s, 
-                    project_name = %s, install_days = %s, install = %s, regular_hours = %s, overtime_hours = %s, job_name = %s, notes = %s, reimbursement = %s
+                    project_name = %s, install_days = %s, install = %s, regular_hours = %s, overtime_hours = %s, job_name = %s, notes = %s
                     WHERE id = %s
                     ''',
                     (
@@ -142,12 +155,158 @@ class TimesheetEntry:
                         self.overtime_hours,
                         self.job_name,
                         self.notes,
-                        self.reimbursement,
                         self.id
                     )
                 )
             conn.commit()
     
+    @staticmethod
+    def upsert(period_id: str, employee_name: str, day: str, values: Dict[str, Any],
+               adjustments: Optional[Dict[Tuple[str, str], Optional[str]]] = None) -> Dict[str, Any]:
+        """Write fields of one timesheet entry and return the employee's period totals
+        
+        The insert-or-update and the totals are a single statement. The totals
+        query cannot see the row written by the same statement, so the saved
+        row is added to the sum of the employee's other entries.
+        
+        Args:
+            values: Column name to value, limited to EDITABLE_FIELDS
+            adjustments: Adjustment amounts to write first, in the same
+                transaction (see Adjustment.write_amounts)
+        
+        Returns:
+            Dictionary with the entry 'id' and the 'hours', 'pay', 'regular_hours',
+            'overtime_hours' and 'entries' totals, plus the employee's
+            'reimbursement', 'bonus' and 'deduction' for the period
+        """
+        invalid = [name for name in values if name not in EDITABLE_FIELDS]
+        if invalid or not values:
+            raise ValueError(f"Invalid timesheet fields: {', '.join(invalid) or 'none given'}")
+        
+        columns = list(values)
+        column_list = ', '.join(columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        updates = ', '.join(f'{name} = EXCLUDED.{name}' for name in columns)
+        
+        with get_db() as conn:
+            cursor = conn.cursor()
+            if adjustments:
+                Adjustment.write_amounts(cursor, period_id, adjustments)
+            cursor.execute(
+                f'''
+                WITH saved AS (
+                    INSERT INTO timesheet_entries (period_id, employee_name, day, {column_list})
+                    VALUES (%s, %s, %s, {placeholders})
+                    ON CONFLICT (period_id, employee_name, day) DO UPDATE SET {updates}
+                    RETURNING id, period_id, employee_name, hours_num, pay_num,
+                              regular_hours, overtime_hours
+                )
+                SELECT saved.id,
+                       COALESCE(SUM(other.hours_num), 0) + COALESCE(saved.hours_num, 0) AS hours,
+                       COALESCE(SUM(other.pay_num), 0) + COALESCE(saved.pay_num, 0) AS pay,
+                       COALESCE(SUM(other.regular_hours), 0) + COALESCE(saved.regular_hours, 0) AS regular_hours,
+                       COALESCE(SUM(other.overtime_hours), 0) + COALESCE(saved.overtime_hours, 0) AS overtime_hours,
+                       adjusted.reimbursement, adjusted.bonus, adjusted.deduction,
+                       COUNT(other.id) + 1 AS entries
+                FROM saved
+                CROSS JOIN LATERAL (
+                    SELECT COALESCE(SUM(amount) FILTER (WHERE kind = 'reimbursement'), 0) AS reimbursement,
+                           COALESCE(SUM(amount) FILTER (WHERE kind = 'bonus'), 0) AS bonus,
+                           COALESCE(SUM(amount) FILTER (WHERE kind = 'deduction'), 0) AS deduction
+                    FROM employee_period_adjustments
+                    WHERE period_id = saved.period_id AND employee_name = saved.employee_name
+                ) adjusted
+                LEFT JOIN timesheet_entries other
+                       ON other.period_id = saved.period_id
+                      AND other.employee_name = saved.employee_name
+                      AND other.id <> saved.id
+                GROUP BY saved.id, saved.hours_num, saved.pay_num, saved.regular_hours,
+                         saved.overtime_hours, adjusted.reimbursement, adjusted.bonus, adjusted.deduction
+                ''',
+                [period_id, employee_name, day] + [column_value(name, values[name]) for name in columns]
+            )
+            row = cursor.fetchone()
+            conn.commit()
+        
+        return {
+            'id': row['id'],
+            'hours': float(row['hours']),
+            'pay': float(row['pay']),
+            'regular_hours': float(row['regular_hours']),
+            'overtime_hours': float(row['overtime_hours']),
+            'reimbursement': float(row['reimbursement']),
+            'bonus': float(row['bonus']),
+            'deduction': float(row['deduction']),
+            'entries': row['entries']
+        }
+    
+    @staticmethod
+    def upsert_many(period_id: str, changes: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+        """Apply a batch of cell changes in one transaction (see write_many)
+        
+        Returns:
+            Period totals for every touched employee, keyed by employee name
+            (see get_period_totals)
+        """
+        with get_db() as conn:
+            cursor = conn.cursor()
+            employee_names = TimesheetEntry.write_many(cursor, period_id, changes)
+            totals = TimesheetEntry.get_period_totals(period_id, employee_names)
+            conn.commit()
+        
+        return totals
+    
+    @staticmethod
+    def write_many(cursor, period_id: str, changes: List[Dict[str, Any]]) -> List[str]:
+        """Write a batch of cell changes with the caller's cursor, without committing
+        
+        Changes to the same entry are merged, later ones winning, so each row
+        is written once. Rows that set the same columns share one
+        execute_values statement. Changes to an adjustment kind (e.g.
+        'reimbursement') set the employee's adjustment for the period; their
+        day is ignored.
+        
+        Args:
+            changes: Dictionaries with 'employee', 'day', 'field' and 'value'
+                keys; fields must be in EDITABLE_FIELDS or ADJUSTMENT_KINDS
+        
+        Returns:
+            Names of the employees touched, sorted
+        """
+        rows = {}
+        adjustments = {}
+        for change in changes:
+            if change['field'] in ADJUSTMENT_KINDS:
+                adjustments[(change['employee'], change['field'])] = change['value']
+            elif change['field'] in EDITABLE_FIELDS:
+                rows.setdefault((change['employee'], change['day']), {})[change['field']] = change['value']
+            else:
+                raise ValueError(f"Invalid timesheet field: {change['field']}")
+        
+        # Group rows by the set of columns they write
+        groups = {}
+        for (employee_name, day), values in rows.items():
+            columns = tuple(sorted(values))
+            groups.setdefault(columns, []).append(
+                (period_id, employee_name, day) + tuple(column_value(name, values[name]) for name in columns)
+            )
+        
+        for columns, values in groups.items():
+            updates = ', '.join(f'{name} = EXCLUDED.{name}' for name in columns)
+            execute_values(
+                cursor,
+                f'''
+                INSERT INTO timesheet_entries (period_id, employee_name, day, {', '.join(columns)})
+                VALUES %s
+                ON CONFLICT (period_id, employee_name, day) DO UPDATE SET {updates}
+                ''',
+                values
+            )
+        Adjustment.write_amounts(cursor, period_id, adjustments)
+        
+        return sorted({employee_name for employee_name, _ in rows} |
+                      {employee_name for employee_name, _ in adjustments})
+    
     def delete(self) -> None:
         """Delete this timesheet entry"""
         with get_db() as conn:
@@ -161,23 +320,55 @@ class TimesheetEntry:
         
         Returns a dictionary with 'hours' and 'pay'
         """
-        total = {'hours': 0.0, 'pay': 0.0}
-        
-        entries = TimesheetEntry.get_by_period_and_employee(period_id, employee_id)
-        
-        for entry in entries:
-            # Add hours
-            if entry.hours and entry.hours.strip():
-                try:
-                    total['hours'] += float(entry.hours)
-                except (ValueError, TypeError):
-                    pass
-            
-            # Add pay
-            if entry.pay and entry.pay.strip():
-                try:
-                    total['pay'] += float(entry.pay)
-                except (ValueError, TypeError):
-                    pass
-        
-        return total 
\ No newline at end of file
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT COALESCE(SUM(hours_num), 0) AS hours, COALESCE(SUM(pay_num), 0) AS pay
+                FROM timesheet_entries
+                WHERE period_id = %s AND employee_name = %s
+                ''',
+                (period_id, employee_id)
+            )
+            row = cursor.fetchone()
+        
+        return {'hours': float(row['hours']), 'pay': float(row['pay'])}
+    
+    @staticmethod
+    def get_period_totals(period_id: str, employee_names: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        """Get totals for every employee in a pay period from the employee_period_totals rollup
+        
+        Args:
+            employee_names: Only total these employees (default: everyone)
+        
+        Returns a dictionary keyed by employee name, each value holding 'hours',
+        'pay', 'regular_hours', 'overtime_hours', 'reimbursement', 'bonus',
+        'deduction' and 'entries'. Employees with only adjustments are included.
+        """
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT employee_name, hours, pay, regular_hours, overtime_hours,
+                       reimbursement, bonus, deduction, entries
+                FROM employee_period_totals
+                WHERE period_id = %(period_id)s
+                  AND (%(names)s::text[] IS NULL OR employee_name = ANY(%(names)s::text[]))
+                ''',
+                {'period_id': period_id, 'names': employee_names}
+            )
+            rows = cursor.fetchall()
+        
+        return {
+            row['employee_name']: {
+                'hours': float(row['hours']),
+                'pay': float(row['pay']),
+                'regular_hours': float(row['regular_hours']),
+                'overtime_hours': float(row['overtime_hours']),
+                'reimbursement': float(row['reimbursement']),
+                'bonus': float(row['bonus']),
+                'deduction': float(row['deduction']),
+                'entries': row['entries']
+            }
+            for row in rows
+        }
@@ -0,0 +1,45 @@
+"""
+Multi-period payroll aggregation for Creative Closets Payroll
+"""
+
+from typing import List, Dict
+import pandas as pd
+from ..database import get_db
+from ..models.adjustment import ADJUSTMENT_KINDS
+
+def aggregate_payroll(period_ids: List[str], employee_names: List[str]) -> Dict[str, pd.DataFrame]:
+    """Total hours, pay and adjustments per employee and pay period
+
+    Reads the selected periods' rows of the employee_period_totals rollup in
+    one query (one small row per employee and period, instead of every daily
+    entry) and pivots them with pandas.
+
+    Args:
+        period_ids: Pay periods to aggregate, in report order
+        employee_names: Employees to report on, in report order
+
+    Returns:
+        Dictionary with 'hours', 'pay' and one entry per adjustment kind, each
+        a DataFrame indexed by employee name with one column per period id.
+        Missing values are 0.
+    """
+    period_ids = list(period_ids)
+    columns = ['hours', 'pay'] + list(ADJUSTMENT_KINDS)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f'''
+            SELECT period_id, employee_name, {', '.join(columns)}
+            FROM employee_period_totals
+            WHERE period_id = ANY(%s)
+            ''',
+            (period_ids,)
+        )
+        totals = pd.DataFrame(cursor.fetchall(), columns=['period_id', 'employee_name'] + columns)
+
+    result = {}
+    for column in columns:
+        totals[column] = pd.to_numeric(totals[column]).astype(float)
+        pivot = totals.pivot(index='employee_name', columns='period_id', values=column)
+        result[column] = pivot.reindex(index=employee_names, columns=period_ids).fillna(0.0)
+    return result
@@ -0,0 +1,150 @@
+"""
+Content-addressed cache of generated report files for Creative Closets Payroll
+
+A report file is stored under a key hashed from the report kind, its pay
+periods, its parameters and the data generations of those periods (see
+database/generations.py), so the same report of unchanged data is served
+from disk instead of being built again. Files are written to a temporary
+name and renamed into place, which is atomic, so workers sharing the
+folder never see a partial file. Entries older than REPORT_CACHE_MAX_AGE
+seconds are removed, and the oldest entries go first once the folder holds
+more than REPORT_CACHE_MAX_MB megabytes.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+from ..database.generations import get_data_generations
+
+# Entries younger than this many seconds are never evicted, so a file that
+# was just handed to a request is still there when it is sent
+EVICTION_GRACE_SECONDS = 60
+
+# Temporary files left behind by a crashed build are removed after this
+TEMP_MAX_AGE_SECONDS = 3600
+
+TEMP_PREFIX = '.tmp-'
+
+# Entry directories are named by artifact_key(); anything else in the root
+# belongs to someone else and is never evicted
+KEY_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+def artifact_key(kind, period_ids, **params):
+    """Hash what a report is built from into its cache key
+
+    The current data generations are read here, so compute the key before
+    reading the report's data: a write made in between then changes the
+    generations and the next request builds a fresh report.
+    """
+    period_ids = list(period_ids)
+    source = json.dumps(
+        [kind, period_ids, get_data_generations(period_ids), params],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(source.encode()).hexdigest()[:32]
+
+class ArtifactStore:
+    """Generated files kept in <root>/<key>/<filename>"""
+
+    def __init__(self, root, max_age=None, max_bytes=None):
+        self.root = root
+        self.max_age = max_age if max_age is not None else int(os.environ.get('REPORT_CACHE_MAX_AGE', 7 * 86400))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            float(os.environ.get('REPORT_CACHE_MAX_MB', 200)) * 1024 * 1024
+        )
+
+    def path(self, key, filename):
+        return os.path.join(self.root, key, filename)
+
+    def get_or_create(self, key, filename, build):
+        """Return the path of a cached file, building it first if needed
+
+        Args:
+            key: Cache key from artifact_key()
+            filename: Name of the file within the entry
+            build: Called with a temporary path to write the file to
+        """
+        path = self.path(key, filename)
+        try:
+            if time.time() - os.path.getmtime(path) < self.max_age:
+                return path
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(self.root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix=TEMP_PREFIX, suffix=os.path.splitext(filename)[1])
+        os.close(fd)
+        try:
+            build(temp_path)
+            self._publish(temp_path, path)
+        except BaseException:
+            _remove(temp_path)
+            raise
+
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove expired entries, then the oldest until the size limit is met
+
+        Only the store's own entry directories and stale temporary files
+        are removed; other files in the root are left alone.
+        """
+        now = time.time()
+        entries = []
+        try:
+            listing = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+
+        for entry in listing:
+            try:
+                if entry.name.startswith(TEMP_PREFIX):
+                    if now - entry.stat().st_mtime > TEMP_MAX_AGE_SECONDS:
+                        _remove(entry.path)
+                elif KEY_PATTERN.fullmatch(entry.name) and entry.is_dir():
+                    stats = [f.stat() for f in os.scandir(entry.path)]
+                    mtime = max((s.st_mtime for s in stats), default=entry.stat().st_mtime)
+                    entries.append((mtime, sum(s.st_size for s in stats), entry.path))
+            except FileNotFoundError:
+                # Removed by another worker's eviction
+                continue
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, entry_path in entries:
+            age = now - mtime
+            if age < EVICTION_GRACE_SECONDS:
+                break
+            if age > self.max_age or total > self.max_bytes:
+                _remove_entry(entry_path)
+                total -= size
+
+    def _publish(self, temp_path, path):
+        # Another worker's eviction may remove the empty entry directory
+        # between creating it and renaming into it, so retry
+        for attempt in range(3):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.replace(temp_path, path)
+                return
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _remove_entry(entry_path):
+    try:
+        for f in os.scandir(entry_path):
+            _remove(f.path)
+        os.rmdir(entry_path)
+    except OSError:
+        pass
@@ -0,0 +1,74 @@
+"""
+Streaming timesheet CSV for Creative Closets Payroll
+
+Rows are read through a server-side cursor ordered by employee and day and
+turned into CSV lines one batch at a time, so an export of any size uses
+constant memory and its first lines are ready as soon as the query starts
+returning rows.
+"""
+
+import csv
+from io import StringIO
+from typing import Iterator, List, Optional
+from ..database import get_db
+from ..utils import format_date
+
+CSV_HEADER = ['Employee', 'Position', 'Date', 'Regular Hours', 'Overtime Hours', 'Job', 'Notes', 'Pay']
+
+# Rows fetched from the server-side cursor per round trip
+FETCH_SIZE = 2000
+
+def iter_timesheet_csv(period_ids: List[str], employee_name: Optional[str] = None) -> Iterator[str]:
+    """Yield a timesheet CSV of the given pay periods, a chunk of lines at a time
+
+    Salaried employees without a pay value get a week of their salary.
+
+    Args:
+        period_ids: Pay periods to export
+        employee_name: Only export this employee's entries
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield _drain(buffer)
+
+    with get_db() as conn:
+        cursor = conn.cursor('timesheet_csv')
+        cursor.itersize = FETCH_SIZE
+        cursor.execute(
+            '''
+            SELECT t.employee_name, e.position, t.day, t.regular_hours, t.overtime_hours,
+                   t.job_name, t.notes, t.pay, e.pay_type, e.salary
+            FROM timesheet_entries t
+            JOIN employees e ON e.name = t.employee_name
+            WHERE t.period_id = ANY(%s) AND (%s::text IS NULL OR t.employee_name = %s)
+            ORDER BY t.employee_name, t.day
+            ''',
+            (list(period_ids), employee_name, employee_name)
+        )
+
+        try:
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    pay = row['pay']
+                    if row['pay_type'] == 'salary' and row['salary'] and (not pay or pay.strip() == ''):
+                        pay = str(round(row['salary'] / 52, 2))
+                    writer.writerow([
+                        row['employee_name'], row['position'], format_date(row['day']),
+                        row['regular_hours'], row['overtime_hours'], row['job_name'], row['notes'], pay
+                    ])
+                yield _drain(buffer)
+        finally:
+            # Also runs when the client disconnects, so the server-side cursor
+            # and its read transaction never outlive the response
+            cursor.close()
+            conn.rollback()
+
+def _drain(buffer: StringIO) -> str:
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text
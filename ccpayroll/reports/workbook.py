@@ -0,0 +1,167 @@
+"""
+Excel timesheet export for Creative Closets Payroll
+
+Workbooks are written with openpyxl's write-only mode, which streams each
+row to the file as it is appended. Only one pay period's grid is held in
+memory at a time, so a workbook of a whole year of periods, one sheet per
+period, needs about as much memory as a single period.
+"""
+
+import re
+from typing import List, Dict, Any
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Border, Side
+from ..database.cache import employee_roster
+from ..models.crew import group_roster
+from ..models.period_grid import PeriodGrid
+
+# Non-installer sections, in sheet order
+POSITION_TITLES = {
+    'project_managers': 'PROJECT MANAGERS',
+    'engineers': 'ENGINEERS',
+    'salesmen': 'SALES TEAM',
+    'ceo': 'EXECUTIVE',
+    'other': 'OTHER EMPLOYEES'
+}
+
+# Sections whose salaried employees get one row per period instead of one per day
+SALARIED_GROUPS = ('project_managers', 'engineers', 'ceo')
+
+TITLE_FONT = Font(bold=True, size=14)
+SECTION_FONT = Font(bold=True, color='FFFFFF')
+SECTION_FILL = PatternFill('solid', fgColor='1F4E78')
+EMPLOYEE_FONT = Font(bold=True)
+HEADER_FILL = PatternFill('solid', fgColor='D9E1F2')
+TOTAL_BORDER = Border(top=Side(style='thin'))
+HOURS_FORMAT = '0.0'
+MONEY_FORMAT = '"$"#,##0.00'
+
+COLUMN_WIDTHS = {'A': 16, 'B': 14, 'C': 32, 'D': 10, 'E': 12, 'F': 10, 'G': 12}
+
+def write_timesheet_workbook(path: str, period_ids: List[str]) -> None:
+    """Write the timesheets of one or more pay periods, a sheet per period
+
+    Raises:
+        ValueError: If a pay period does not exist
+    """
+    position_groups, install_crews = group_roster(list(employee_roster.rows()))
+    workbook = Workbook(write_only=True)
+    titles = set()
+
+    for period_id in period_ids:
+        grid = PeriodGrid.load(period_id, text_fields=('hours', 'pay', 'project_name', 'install_days', 'install'))
+        if grid is None:
+            raise ValueError(f"Pay period with ID {period_id} not found")
+
+        sheet = workbook.create_sheet(_sheet_title(grid.period['name'], titles))
+        for column, width in COLUMN_WIDTHS.items():
+            sheet.column_dimensions[column].width = width
+        _write_period(sheet, grid, position_groups, install_crews)
+
+    workbook.save(path)
+
+def _write_period(sheet, grid: PeriodGrid, position_groups: Dict[str, Any], install_crews) -> None:
+    period = grid.period
+    hours, pay = grid.text('hours'), grid.text('pay')
+    project_names = grid.text('project_name')
+    install_days, install = grid.text('install_days'), grid.text('install')
+    hour_totals, pay_totals = grid.totals('hours'), grid.totals('pay')
+    reimbursements = grid.adjustment_totals('reimbursement')
+
+    def row(values, font=None, fill=None, border=None, formats=None):
+        cells = []
+        for index, value in enumerate(values):
+            cell = WriteOnlyCell(sheet, value=value)
+            if font:
+                cell.font = font
+            if fill:
+                cell.fill = fill
+            if border:
+                cell.border = border
+            if formats and formats.get(index):
+                cell.number_format = formats[index]
+            cells.append(cell)
+        sheet.append(cells)
+
+    def reimbursement_row(employee, i, width):
+        if employee['position'] != 'salesman' and reimbursements[i]:
+            row(['REIMBURSEMENT'] + [None] * (width - 2) + [float(reimbursements[i])],
+                font=Font(italic=True), formats={width - 1: MONEY_FORMAT})
+
+    row(['CREATIVE CLOSETS PAYROLL TIME SHEET'], font=TITLE_FONT)
+    row([f'PAY PERIOD: {period["name"]}'], font=EMPLOYEE_FONT)
+    sheet.append([])
+
+    for crew_num, crew_employees in install_crews:
+        row([f'INSTALL CREW # {crew_num}'] + [None] * 6, font=SECTION_FONT, fill=SECTION_FILL)
+
+        for employee in crew_employees:
+            i = grid.employee_index[employee['name']]
+            row([employee['name']], font=EMPLOYEE_FONT)
+            row(['DAY', 'DATE', 'PROJECT NAME', 'DAYS', 'INSTALL', 'HOURS', 'PAY'], font=EMPLOYEE_FONT, fill=HEADER_FILL)
+            for j, day in enumerate(grid.days):
+                row([None, day, project_names[i, j], _value(install_days[i, j]), _value(install[i, j]),
+                     _value(hours[i, j]), _value(pay[i, j])],
+                    formats={4: MONEY_FORMAT, 6: MONEY_FORMAT})
+            row([None] * 5 + [float(hour_totals[i]), float(pay_totals[i])], font=EMPLOYEE_FONT,
+                border=TOTAL_BORDER, formats={5: HOURS_FORMAT, 6: MONEY_FORMAT})
+            reimbursement_row(employee, i, 7)
+            sheet.append([])
+
+    for group_key, title in POSITION_TITLES.items():
+        if not position_groups[group_key]:
+            continue
+        row([title] + [None] * 4, font=SECTION_FONT, fill=SECTION_FILL)
+
+        for employee in position_groups[group_key]:
+            i = grid.employee_index[employee['name']]
+            display_name = employee['name']
+            if employee.get('pay_type') == 'salary' and employee.get('salary'):
+                display_name += f" (Salary: ${employee['salary']}/year)"
+            row([display_name], font=EMPLOYEE_FONT)
+
+            if employee.get('pay_type') == 'salary' and group_key in SALARIED_GROUPS:
+                # One row for the period: a week of salary unless pay was set on its first day
+                row(['PERIOD', 'PAY TYPE', 'PROJECT NAME', 'HOURS', 'PAY'], font=EMPLOYEE_FONT, fill=HEADER_FILL)
+                weekly_pay = 0
+                if employee.get('salary'):
+                    try:
+                        weekly_pay = round(float(employee['salary']) / 52, 2)
+                    except (ValueError, TypeError):
+                        pass
+                pay_value = weekly_pay
+                if grid.days and pay[i, 0]:
+                    pay_value = _value(pay[i, 0])
+                row([period['name'], 'Salary', project_names[i, 0] if grid.days else '', 'Salaried', pay_value],
+                    formats={4: MONEY_FORMAT})
+                row([None] * 4 + [pay_value], font=EMPLOYEE_FONT, border=TOTAL_BORDER, formats={4: MONEY_FORMAT})
+            else:
+                row(['DAY', 'DATE', 'PROJECT NAME', 'HOURS', 'PAY'], font=EMPLOYEE_FONT, fill=HEADER_FILL)
+                for j, day in enumerate(grid.days):
+                    row([None, day, project_names[i, j], _value(hours[i, j]), _value(pay[i, j])],
+                        formats={4: MONEY_FORMAT})
+                row([None] * 3 + [float(hour_totals[i]), float(pay_totals[i])], font=EMPLOYEE_FONT,
+                    border=TOTAL_BORDER, formats={3: HOURS_FORMAT, 4: MONEY_FORMAT})
+
+            reimbursement_row(employee, i, 5)
+            sheet.append([])
+
+def _value(text):
+    """A stored text value as a number when it is one, so Excel can sum it"""
+    if text in ('', None):
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def _sheet_title(name: str, used: set) -> str:
+    """A unique sheet title: at most 31 characters, none of []:*?/\\"""
+    base = re.sub(r'[\[\]:*?/\\]', '-', name)[:31] or 'Sheet'
+    title, n = base, 2
+    while title.lower() in used:
+        suffix = f' ({n})'
+        title, n = base[:31 - len(suffix)] + suffix, n + 1
+    used.add(title.lower())
+    return title
@@ -9,5 +9,7 @@ from .employees import employees
 from .pay_periods import pay_periods
 from .timesheet import timesheet
 from .reports import reports
+from .metrics import metrics
+from .jobs import jobs
 
-__all__ = ['main', 'employees', 'pay_periods', 'timesheet', 'reports'] 
\ No newline at end of file
+__all__ = ['main', 'employees', 'pay_periods', 'timesheet', 'reports', 'metrics', 'jobs'] 
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+Background job routes for Creative Closets Payroll
+
+This module lets the browser poll a submitted job and download its file
+once it is ready.
+"""
+
+from io import BytesIO
+from flask import Blueprint, render_template, redirect, url_for, jsonify, send_file, abort, current_app
+from ..database.jobs import get_job
+
+jobs = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+def job_status(job):
+    """The JSON fields the wait page polls for"""
+    status = {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'error': job['error'],
+        'progress': job['progress'],
+        'created_at': job['created_at'].isoformat(),
+        'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None
+    }
+    if job['status'] == 'done' and job['output_name']:
+        status['download_url'] = url_for('jobs.download', job_id=job['id'])
+    return status
+
+@jobs.route('/<job_id>')
+def status(job_id):
+    """Return a job's status as JSON"""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+@jobs.route('/<job_id>/wait')
+def wait(job_id):
+    """Show a page that waits for a job and then starts its download"""
+    job = get_job(job_id)
+    if not job:
+        abort(404)
+
+    # The package app's pages extend layout.html, the monolith's base.html
+    layout = 'layout.html' if 'main.index' in current_app.view_functions else 'base.html'
+    return render_template('jobs/wait.html', job=job_status(job), layout=layout)
+
+@jobs.route('/<job_id>/download')
+def download(job_id):
+    """Send a finished job's file, or wait for it if it is not done yet"""
+    job = get_job(job_id, with_output=True)
+    if not job:
+        abort(404)
+    if job['status'] != 'done':
+        return redirect(url_for('jobs.wait', job_id=job_id))
+    if job['output'] is None:
+        abort(404)
+
+    return send_file(
+        BytesIO(job['output']),
+        mimetype=job['output_type'],
+        as_attachment=True,
+        download_name=job['output_name']
+    )
@@ -35,14 +35,13 @@ def index():
             'total_hours': 0
         }
         
-        # Calculate totals for current period
+        # Calculate totals for current period in a single query
+        period_totals = TimesheetEntry.get_period_totals(current_period.id)
         for employee in employees:
-            total_hours = TimesheetEntry.get_total_hours_for_period(current_period.id, employee.name)
-            period_stats['total_hours'] += total_hours
-            
-            # Count entries for this employee
-            entries = TimesheetEntry.get_by_period_and_employee(current_period.id, employee.name)
-            period_stats['total_entries'] += len(entries)
+            totals = period_totals.get(employee.name)
+            if totals:
+                period_stats['total_hours'] += totals['hours']
+                period_stats['total_entries'] += totals['entries']
         
         stats.update(period_stats)
     
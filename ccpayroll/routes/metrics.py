@@ -0,0 +1,27 @@
+"""
+Metrics routes for Creative Closets Payroll
+
+This module exposes database pool and query metrics in the Prometheus text format.
+"""
+
+import os
+from flask import Blueprint, Response, request, abort
+from ..database import get_pool
+from ..database.metrics import registry
+
+metrics = Blueprint('metrics', __name__)
+
+@metrics.route('/metrics')
+def index():
+    """Render metrics for this worker process
+    
+    If METRICS_TOKEN is set, requests must send it as a bearer token.
+    """
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    
+    return Response(
+        registry.render(get_pool()),
+        mimetype='text/plain; version=0.0.4'
+    )
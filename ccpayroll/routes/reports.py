@@ -5,9 +5,11 @@ This module handles report generation and viewing routes.
 """
 
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
-from ..models import Employee, PayPeriod, TimesheetEntry
-from ..reports import generate_payroll_report, generate_timesheet_csv
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, send_file, stream_with_context
+from ..models import Employee, PayPeriod
+from ..reports import generate_timesheet_csv, get_payroll_data
+from ..reports.timesheet_csv import iter_timesheet_csv
+from ..worker import submit_job
 
 reports = Blueprint('reports', __name__, url_prefix='/reports')
 
@@ -31,19 +33,9 @@ def payroll(period_id):
         flash('Pay period not found', 'error')
         return redirect(url_for('reports.index'))
     
-    try:
-        # Generate the report PDF
-        filepath = generate_payroll_report(period_id)
-        
-        # Send the file to the user
-        return send_file(
-            filepath,
-            as_attachment=True,
-            download_name=f"payroll_{pay_period.name.replace(' ', '_')}.pdf"
-        )
-    except Exception as e:
-        flash(f'Error generating report: {str(e)}', 'error')
-        return redirect(url_for('reports.index'))
+    # Build the PDF in a background job and wait for it to download
+    job_id = submit_job('payroll_pdf', period_id=period_id)
+    return redirect(url_for('jobs.wait', job_id=job_id))
 
 @reports.route('/timesheet/<period_id>')
 def timesheet(period_id):
@@ -71,6 +63,36 @@ def timesheet(period_id):
         flash(f'Error generating report: {str(e)}', 'error')
         return redirect(url_for('reports.index'))
 
+@reports.route('/timesheet.csv')
+def timesheet_stream():
+    """Stream a timesheet CSV of one or more pay periods
+    
+    Query parameters: period_id (repeatable) and an optional employee_id.
+    """
+    period_ids = request.args.getlist('period_id')
+    periods = [PayPeriod.get_by_id(period_id) for period_id in period_ids]
+    if not periods or None in periods:
+        flash('Pay period not found', 'error')
+        return redirect(url_for('reports.index'))
+    
+    employee_name = None
+    employee_id = request.args.get('employee_id')
+    if employee_id:
+        employee = Employee.get_by_id(employee_id)
+        if not employee:
+            flash('Employee not found', 'error')
+            return redirect(url_for('reports.index'))
+        employee_name = employee.name
+    
+    start_date = min(period.start_date for period in periods)
+    end_date = max(period.end_date for period in periods)
+    filename = f"timesheet_{start_date}_to_{end_date}.csv"
+    return Response(
+        stream_with_context(iter_timesheet_csv(period_ids, employee_name)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @reports.route('/preview/payroll/<period_id>')
 def preview_payroll(period_id):
     """Preview payroll report for a specific pay period"""
@@ -79,25 +101,7 @@ def preview_payroll(period_id):
         flash('Pay period not found', 'error')
         return redirect(url_for('reports.index'))
     
-    employees = Employee.get_all()
-    
-    # Collect data for each employee
-    report_data = []
-    
-    for employee in employees:
-        hours = TimesheetEntry.get_total_hours_for_period(period_id, employee.id)
-        pay_data = employee.calculate_pay(hours['regular'], hours['overtime'])
-        
-        report_data.append({
-            'name': employee.name,
-            'position': employee.position,
-            'pay_type': employee.pay_type,
-            'regular_hours': hours['regular'],
-            'overtime_hours': hours['overtime'],
-            'regular_pay': pay_data['regular'],
-            'overtime_pay': pay_data['overtime'],
-            'total_pay': pay_data['total']
-        })
+    report_data = get_payroll_data(period_id)
     
     return render_template(
         'reports/payroll.html',
@@ -67,7 +67,6 @@ def save():
     project_name = data.get('project_name', '')
     install_days = data.get('install_days', '')
     install = data.get('install', '')
-    reimbursement = data.get('reimbursement', '')
     
     # Validate required fields
     if not all([period_id, employee_id, day]):
@@ -78,41 +77,26 @@ def save():
     if not employee:
         return jsonify({'success': False, 'error': 'Employee not found'}), 404
     
-    # Get existing entry or create new one
-    entry = TimesheetEntry.get_by_date(period_id, employee.name, day)
-    
-    if entry:
-        # Update existing entry
-        entry.hours = hours
-        entry.pay = pay
-        entry.project_name = project_name
-        entry.install_days = install_days
-        entry.install = install
-        entry.reimbursement = reimbursement
-    else:
-        # Create new entry
-        entry = TimesheetEntry(
-            employee_name=employee.name,
-            period_id=period_id,
-            day=day,
-            hours=hours,
-            pay=pay,
-            project_name=project_name,
-            install_days=install_days,
-            install=install,
-            reimbursement=reimbursement
-        )
-    
-    # Save to database
-    entry.save()
-    
-    # Calculate new totals
-    total_hours = TimesheetEntry.get_total_hours_for_period(period_id, employee.name)
+    # The reimbursement is per period, not per day; it is saved in the same
+    # transaction as the entry
+    adjustments = None
+    if 'reimbursement' in data:
+        adjustments = {(employee.name, 'reimbursement'): data['reimbursement']}
+    
+    # Insert or update the entry and read back the new totals in one statement
+    totals = TimesheetEntry.upsert(period_id, employee.name, day, {
+        'hours': hours,
+        'pay': pay,
+        'project_name': project_name,
+        'install_days': install_days,
+        'install': install
+    }, adjustments=adjustments)
     
     return jsonify({
         'success': True, 
-        'entry_id': entry.id,
-        'total_hours': total_hours
+        'entry_id': totals['id'],
+        'total_hours': totals['hours'],
+        'totals': totals
     })
 
 @timesheet.route('/api/entries/<period_id>/<employee_id>', methods=['GET'])
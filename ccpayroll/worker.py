@@ -0,0 +1,137 @@
+"""
+Background job worker for Creative Closets Payroll
+
+Slow work such as PDF reports and Excel exports runs as jobs (see
+database/jobs.py) instead of inside the web request. Each kind of job has a
+handler registered with @job_handler; a handler takes the job's params as
+keyword arguments and returns the path of the file it wrote and the name to
+download it as. The worker stores that file in the job row. Handlers that
+produce no file (e.g. imports) return None and leave their result in the
+job's progress (see report_progress).
+
+Start workers with ``flask run-worker`` (the Procfile ``worker:`` process).
+With RUN_JOBS_INLINE=true, jobs run inside the request that submits them,
+so development needs no separate worker.
+"""
+
+import os
+import time
+import logging
+import mimetypes
+from flask import current_app, g
+from .database.jobs import (
+    enqueue_job, claim_job, finish_job, fail_job, purge_jobs, get_job_upload, set_job_progress
+)
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> handler
+JOB_HANDLERS = {}
+
+def job_handler(kind):
+    """Register a function as the handler for a kind of job"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+def run_jobs_inline():
+    return os.environ.get('RUN_JOBS_INLINE', 'false').lower() in ('1', 'true', 'yes')
+
+def submit_job(kind, upload=None, **params):
+    """Queue a job and return its id
+
+    Params must be JSON serializable. With RUN_JOBS_INLINE set, the job
+    is also claimed and run before returning.
+
+    Args:
+        upload: Bytes of a file the handler reads with job_upload()
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'No handler registered for job kind: {kind}')
+
+    job_id = enqueue_job(kind, params, upload)
+    if run_jobs_inline():
+        job = claim_job(job_id)
+        if job:
+            run_job(job)
+    return job_id
+
+def run_job(job):
+    """Run a claimed job and record its output or error
+
+    The outcome is only recorded for the attempt that was claimed: if the
+    job's lease expired and another worker claimed it, that worker's
+    attempt is left alone.
+    """
+    handler = JOB_HANDLERS.get(job['kind'])
+    if handler is None:
+        fail_job(job['id'], job['attempts'], f"No handler registered for job kind: {job['kind']}")
+        return
+
+    g.job_id = job['id']
+    try:
+        result = handler(**job['params'])
+        if result is not None:
+            path, filename = result
+            with open(path, 'rb') as f:
+                output = f.read()
+    except Exception as e:
+        logger.exception('Job %s (%s) failed', job['id'], job['kind'])
+        if not fail_job(job['id'], job['attempts'], str(e)):
+            logger.warning('Job %s was claimed again after its lease expired; error not recorded', job['id'])
+        return
+    finally:
+        g.pop('job_id', None)
+
+    if result is None:
+        recorded = finish_job(job['id'], job['attempts'])
+    else:
+        recorded = finish_job(job['id'], job['attempts'], output, filename,
+                              mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    if recorded:
+        logger.info('Job %s (%s) finished', job['id'], job['kind'])
+    else:
+        logger.warning('Job %s was claimed again after its lease expired; output not recorded', job['id'])
+
+def job_upload():
+    """Return the bytes uploaded with the running job, or None"""
+    job_id = g.get('job_id')
+    return get_job_upload(job_id) if job_id else None
+
+def report_progress(progress):
+    """Record the running job's progress, a JSON-serializable dictionary
+
+    Does nothing outside a job. This commits the database connection, so
+    call it between the job's transactions.
+    """
+    job_id = g.get('job_id')
+    if job_id:
+        set_job_progress(job_id, progress)
+
+def run_worker(poll_interval=2.0, burst=False):
+    """Claim and run jobs until stopped
+
+    Each job runs in its own request context, so handlers can render
+    templates that build URLs and its pooled database connection is
+    returned when it finishes. While the queue is empty the
+    worker purges old jobs and sleeps for poll_interval seconds.
+
+    Args:
+        poll_interval: Seconds to wait between polls of an empty queue
+        burst: Return once the queue is empty instead of polling
+    """
+    app = current_app._get_current_object()
+    logger.info('Worker started (handlers: %s)', ', '.join(sorted(JOB_HANDLERS)))
+
+    while True:
+        with app.test_request_context():
+            job = claim_job()
+            if job:
+                run_job(job)
+                continue
+            purge_jobs()
+
+        if burst:
+            return
+        time.sleep(poll_interval)
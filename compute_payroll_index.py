@@ -1,107 +1,45 @@
-import pandas as pd
-import numpy as np
 import os
-import re
-from datetime import datetime
 import matplotlib.pyplot as plt
+from ccpayroll.importer import parse_workbook
 
 # Path to the Excel file
 excel_file = os.path.join('Local Docs', 'PAYROLL 2025.xlsx')
 
-def extract_date_range(sheet_name):
-    """Extract start and end dates from sheet name."""
-    match = re.search(r'(\d+\.\d+\.\d+)\s+[Tt][Oo]\s+(\d+\.\d+\.\d+)', sheet_name)
-    if match:
-        start_date_str, end_date_str = match.groups()
-        return start_date_str, end_date_str
-    return None, None
-
 def compute_indices():
     """Compute various payroll indices."""
     print("Reading Excel file:", excel_file)
     
-    # Get all sheet names
-    xl = pd.ExcelFile(excel_file)
-    sheet_names = xl.sheet_names
-    
-    # Skip the first sheet which is a template
-    sheet_names = [sheet for sheet in sheet_names if sheet != 'PAYROLL TIMESHEET']
-    
-    # Sort sheets by date
-    def extract_date(sheet_name):
-        start_date, _ = extract_date_range(sheet_name)
-        if start_date:
-            try:
-                return datetime.strptime(start_date, '%m.%d.%y')
-            except ValueError:
-                pass
-        return datetime(2025, 1, 1)  # Default date
-    
-    sheet_names.sort(key=extract_date)
+    # Parse every pay period sheet (in parallel), sorted by date
+    sheets = parse_workbook(excel_file)
+    sheet_names = [parsed.period.sheet for parsed in sheets]
     
     # Initialize data structures for indices
-    all_employees = set()
     employee_pay_by_period = {}
     period_totals = {}
     
-    # First pass: identify all employees
-    for sheet in sheet_names:
-        df = pd.read_excel(excel_file, sheet_name=sheet)
-        
-        # Find employee names (they are typically in the first column)
-        for idx, value in enumerate(df.iloc[:, 0]):
-            if pd.notna(value) and isinstance(value, str) and value.strip().upper() == value.strip() and len(value.strip()) > 3 and value.strip() not in ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY', 'DAY', 'DATE', 'CREATIVE CLOSETS PAYROLL TIME SHEET']:
-                all_employees.add(value.strip())
+    # Identify all employees
+    all_employees = {record.employee for parsed in sheets for record in parsed.records}
     
     print(f"\nIdentified {len(all_employees)} employees:")
     for emp in sorted(all_employees):
         print(f"  - {emp}")
         employee_pay_by_period[emp] = []
     
-    # Second pass: extract pay data for each employee in each period
-    for sheet in sheet_names:
+    # Extract pay data for each employee in each period
+    for parsed in sheets:
+        sheet = parsed.period.sheet
         print(f"\nProcessing pay period: {sheet}")
-        df = pd.read_excel(excel_file, sheet_name=sheet)
         
         period_total = 0
         period_data = {}
         
-        # Find the PAY column
-        pay_col_idx = None
-        for col_idx, col_name in enumerate(df.iloc[1]):
-            if pd.notna(col_name) and isinstance(col_name, str) and 'PAY' in col_name.upper():
-                pay_col_idx = col_idx
-                break
+        # Calculate total pay for each employee in this period
+        pay_by_employee = {}
+        for record in parsed.records:
+            pay_by_employee[record.employee] = pay_by_employee.get(record.employee, 0) + (record.pay or 0)
         
-        if pay_col_idx is None:
-            print(f"  Warning: Could not find PAY column in sheet {sheet}")
-            continue
-        
-        # Process each employee
         for employee in all_employees:
-            employee_rows = []
-            employee_found = False
-            
-            # Find rows for this employee
-            for idx, row in df.iterrows():
-                if pd.notna(row.iloc[0]) and isinstance(row.iloc[0], str) and row.iloc[0].strip() == employee:
-                    employee_found = True
-                elif employee_found and pd.notna(row.iloc[0]) and isinstance(row.iloc[0], str) and row.iloc[0].strip() in ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']:
-                    employee_rows.append(row)
-                elif employee_found and pd.notna(row.iloc[0]) and isinstance(row.iloc[0], str) and row.iloc[0].strip().upper() == row.iloc[0].strip() and len(row.iloc[0].strip()) > 3 and row.iloc[0].strip() not in ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY', 'DAY', 'DATE']:
-                    # Found next employee
-                    employee_found = False
-            
-            # Calculate total pay for this employee in this period
-            employee_total_pay = 0
-            for row in employee_rows:
-                if pd.notna(row.iloc[pay_col_idx]) and row.iloc[pay_col_idx] != '':
-                    try:
-                        pay = float(row.iloc[pay_col_idx])
-                        employee_total_pay += pay
-                    except (ValueError, TypeError):
-                        pass
-            
+            employee_total_pay = pay_by_employee.get(employee, 0)
             print(f"  {employee}: ${employee_total_pay:.2f}")
             
             # Store employee pay for this period
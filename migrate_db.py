@@ -3,17 +3,20 @@
 Migration script to transfer data from SQLite to PostgreSQL.
 This script will:
 1. Extract all data from the SQLite database
-2. Create the necessary tables in PostgreSQL
-3. Insert the data into PostgreSQL
+2. Create the PostgreSQL schema with the app's migrations
+3. Bulk load the data into PostgreSQL in one transaction
 """
 
 import os
 import sqlite3
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-import json
 from dotenv import load_dotenv
 import sys
+from flask import Flask
+from ccpayroll.database import close_db
+from ccpayroll.database.bulk import load_rows
+from ccpayroll.database.schema import upgrade_database
 
 # Load environment variables from .env file
 load_dotenv()
@@ -28,6 +31,12 @@ PG_DB = os.environ.get('PG_DB', 'ccpayroll')
 # SQLite database path
 SQLITE_DB_PATH = 'data/payroll.db'
 
+# timesheet_entries columns copied as they are
+TIMESHEET_COLUMNS = (
+    'period_id', 'employee_name', 'day', 'hours', 'pay', 'project_name',
+    'install_days', 'install', 'regular_hours', 'overtime_hours', 'job_name', 'notes'
+)
+
 def connect_sqlite():
     """Connect to SQLite database and return connection"""
     if not os.path.exists(SQLITE_DB_PATH):
@@ -83,62 +92,29 @@ def connect_pg():
         print(f"Error connecting to PostgreSQL: {str(e)}")
         sys.exit(1)
 
-def create_pg_tables(pg_conn):
-    """Create tables in PostgreSQL"""
-    cursor = pg_conn.cursor()
-    
-    # Create pay_periods table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS pay_periods (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        start_date TEXT NOT NULL,
-        end_date TEXT NOT NULL
-    )
-    ''')
-    
-    # Create employees table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS employees (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL UNIQUE,
-        rate REAL,
-        install_crew INTEGER DEFAULT 0,
-        position TEXT,
-        pay_type TEXT DEFAULT 'hourly',
-        salary REAL,
-        commission_rate REAL
-    )
-    ''')
-    
-    # Create timesheet_entries table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS timesheet_entries (
-        id SERIAL PRIMARY KEY,
-        period_id TEXT NOT NULL,
-        employee_name TEXT NOT NULL,
-        day TEXT NOT NULL,
-        hours TEXT,
-        pay TEXT,
-        project_name TEXT,
-        install_days TEXT,
-        install TEXT,
-        regular_hours REAL DEFAULT 0,
-        overtime_hours REAL DEFAULT 0,
-        job_name TEXT,
-        notes TEXT,
-        FOREIGN KEY (period_id) REFERENCES pay_periods(id),
-        UNIQUE (period_id, employee_name, day)
-    )
-    ''')
-    
-    pg_conn.commit()
-    print("PostgreSQL tables created successfully")
+def create_pg_tables():
+    """Create the PostgreSQL schema by applying the app's migrations"""
+    app = Flask(__name__)
+    app.teardown_appcontext(lambda exception: close_db())
+    with app.app_context():
+        version = upgrade_database()
+    print(f"PostgreSQL schema is at version {version}")
+
+def report(result):
+    """Print the row counts of one bulk load"""
+    print(f"Migrated {result.staged} {result.table.replace('_', ' ')}: "
+          f"{result.inserted} inserted, {result.updated} updated")
+
+def to_float(value):
+    """Convert a SQLite value to a float, or None if it is empty or not a number"""
+    try:
+        return float(value) if value not in (None, '') else None
+    except (ValueError, TypeError):
+        return None
 
-def migrate_pay_periods(sqlite_conn, pg_conn):
+def migrate_pay_periods(sqlite_conn, pg_cursor):
     """Migrate pay periods from SQLite to PostgreSQL"""
     sqlite_cursor = sqlite_conn.cursor()
-    pg_cursor = pg_conn.cursor()
     
     # Get all pay periods from SQLite
     sqlite_cursor.execute("SELECT id, name, start_date, end_date FROM pay_periods")
@@ -148,20 +124,14 @@ def migrate_pay_periods(sqlite_conn, pg_conn):
         print("No pay periods found in SQLite database")
         return
     
-    # Insert pay periods into PostgreSQL
-    for period in pay_periods:
-        pg_cursor.execute(
-            "INSERT INTO pay_periods (id, name, start_date, end_date) VALUES (%s, %s, %s, %s)",
-            (period['id'], period['name'], period['start_date'], period['end_date'])
-        )
-    
-    pg_conn.commit()
-    print(f"Migrated {len(pay_periods)} pay periods")
+    report(load_rows(
+        pg_cursor, 'pay_periods', ('id', 'name', 'start_date', 'end_date'),
+        [tuple(period) for period in pay_periods], key=('id',)
+    ))
 
-def migrate_employees(sqlite_conn, pg_conn):
+def migrate_employees(sqlite_conn, pg_cursor):
     """Migrate employees from SQLite to PostgreSQL"""
     sqlite_cursor = sqlite_conn.cursor()
-    pg_cursor = pg_conn.cursor()
     
     # Get all employees from SQLite
     sqlite_cursor.execute("SELECT id, name, rate, install_crew, position, pay_type, salary, commission_rate FROM employees")
@@ -171,45 +141,22 @@ def migrate_employees(sqlite_conn, pg_conn):
         print("No employees found in SQLite database")
         return
     
-    # Insert employees into PostgreSQL
-    for employee in employees:
-        # Convert empty strings to None for numeric fields
-        rate = None
-        if employee['rate'] and employee['rate'] != '':
-            try:
-                rate = float(employee['rate'])
-            except (ValueError, TypeError):
-                rate = None
-                
-        salary = None
-        if employee['salary'] and employee['salary'] != '':
-            try:
-                salary = float(employee['salary'])
-            except (ValueError, TypeError):
-                salary = None
-                
-        commission_rate = None
-        if employee['commission_rate'] and employee['commission_rate'] != '':
-            try:
-                commission_rate = float(employee['commission_rate'])
-            except (ValueError, TypeError):
-                commission_rate = None
-        
-        pg_cursor.execute(
-            """INSERT INTO employees 
-               (id, name, rate, install_crew, position, pay_type, salary, commission_rate) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-            (employee['id'], employee['name'], rate, employee['install_crew'], 
-             employee['position'], employee['pay_type'], salary, commission_rate)
-        )
-    
-    pg_conn.commit()
-    print(f"Migrated {len(employees)} employees")
+    # Convert empty strings to None for numeric fields
+    report(load_rows(
+        pg_cursor, 'employees',
+        ('id', 'name', 'rate', 'install_crew', 'position', 'pay_type', 'salary', 'commission_rate'),
+        [
+            (employee['id'], employee['name'], to_float(employee['rate']), employee['install_crew'],
+             employee['position'], employee['pay_type'], to_float(employee['salary']),
+             to_float(employee['commission_rate']))
+            for employee in employees
+        ],
+        key=('id',)
+    ))
 
-def migrate_timesheet_entries(sqlite_conn, pg_conn):
+def migrate_timesheet_entries(sqlite_conn, pg_cursor):
     """Migrate timesheet entries from SQLite to PostgreSQL"""
     sqlite_cursor = sqlite_conn.cursor()
-    pg_cursor = pg_conn.cursor()
     
     # Get all timesheet entries from SQLite
     sqlite_cursor.execute("""
@@ -223,21 +170,27 @@ def migrate_timesheet_entries(sqlite_conn, pg_conn):
         print("No timesheet entries found in SQLite database")
         return
     
-    # Insert timesheet entries into PostgreSQL
-    for entry in entries:
-        pg_cursor.execute(
-            """INSERT INTO timesheet_entries 
-               (period_id, employee_name, day, hours, pay, project_name, 
-                install_days, install, regular_hours, overtime_hours, job_name, notes, reimbursement) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-            (entry['period_id'], entry['employee_name'], entry['day'], entry['hours'], 
-             entry['pay'], entry['project_name'], entry['install_days'], entry['install'], 
-             entry['regular_hours'], entry['overtime_hours'], entry['job_name'], entry['notes'],
-             entry.get('reimbursement', ''))
-        )
+    report(load_rows(
+        pg_cursor, 'timesheet_entries', TIMESHEET_COLUMNS,
+        [tuple(entry[name] for name in TIMESHEET_COLUMNS) for entry in entries],
+        key=('period_id', 'employee_name', 'day')
+    ))
     
-    pg_conn.commit()
-    print(f"Migrated {len(entries)} timesheet entries")
+    # Reimbursements are stored once per employee and period
+    reimbursements = {}
+    for entry in entries:
+        amount = to_float(entry['reimbursement'])
+        if amount is None:
+            continue
+        key = (entry['period_id'], entry['employee_name'])
+        reimbursements[key] = max(amount, reimbursements.get(key, amount))
+    
+    report(load_rows(
+        pg_cursor, 'employee_period_adjustments', ('period_id', 'employee_name', 'kind', 'amount'),
+        [(period_id, employee_name, 'reimbursement', amount)
+         for (period_id, employee_name), amount in reimbursements.items()],
+        key=('period_id', 'employee_name', 'kind')
+    ))
 
 def main():
     print("Starting migration from SQLite to PostgreSQL...")
@@ -255,12 +208,14 @@ def main():
     
     try:
         # Create tables in PostgreSQL
-        create_pg_tables(pg_conn)
+        create_pg_tables()
         
-        # Migrate data
-        migrate_pay_periods(sqlite_conn, pg_conn)
-        migrate_employees(sqlite_conn, pg_conn)
-        migrate_timesheet_entries(sqlite_conn, pg_conn)
+        # Bulk load every table in one transaction
+        pg_cursor = pg_conn.cursor()
+        migrate_pay_periods(sqlite_conn, pg_cursor)
+        migrate_employees(sqlite_conn, pg_cursor)
+        migrate_timesheet_entries(sqlite_conn, pg_cursor)
+        pg_conn.commit()
         
         print("Migration completed successfully!")
     except Exception as e:
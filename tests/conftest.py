@@ -0,0 +1,135 @@
+"""
+Shared fixtures for the Creative Closets Payroll tests
+
+Database tests run against a scratch PostgreSQL database, PG_TEST_DB
+(default ccpayroll_test), on the server configured by the usual PG_HOST,
+PG_PORT, PG_USER and PG_PASSWORD variables. It is created and migrated on
+first use and emptied before every test. Without a reachable server those
+tests are skipped.
+"""
+
+import os
+import uuid
+import pytest
+import psycopg2
+from flask import Flask
+
+TEST_DB = os.environ.get('PG_TEST_DB', 'ccpayroll_test')
+
+# Tables emptied before each test; cache_generations is kept so table caches
+# never see a generation go backwards
+DATA_TABLES = ('jobs', 'import_manifest', 'employee_period_totals', 'employee_period_adjustments',
+               'timesheet_entries', 'employees', 'pay_periods')
+
+def _create_test_database():
+    """Create TEST_DB if it does not exist, or skip if PostgreSQL is unreachable"""
+    try:
+        conn = psycopg2.connect(
+            host=os.environ.get('PG_HOST', 'localhost'),
+            port=os.environ.get('PG_PORT', '5432'),
+            user=os.environ.get('PG_USER', 'postgres'),
+            password=os.environ.get('PG_PASSWORD', 'postgres'),
+            dbname='postgres',
+            connect_timeout=3
+        )
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'PostgreSQL is not available: {e}')
+
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1 FROM pg_database WHERE datname = %s', (TEST_DB,))
+    if cursor.fetchone() is None:
+        cursor.execute(f'CREATE DATABASE {TEST_DB}')
+    conn.close()
+
+@pytest.fixture(scope='session')
+def app():
+    """Flask app bound to the migrated test database"""
+    _create_test_database()
+
+    # Never let the tests reach the database DATABASE_URL points at
+    saved = {name: os.environ.pop(name, None) for name in ('DATABASE_URL', 'PG_DB')}
+    os.environ['PG_DB'] = TEST_DB
+
+    from ccpayroll.database import close_db
+    from ccpayroll.database.schema import upgrade_database
+
+    app = Flask('ccpayroll_tests')
+    app.teardown_appcontext(lambda exception: close_db())
+    with app.app_context():
+        upgrade_database()
+
+    yield app
+
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+@pytest.fixture
+def db(app):
+    """An app context on an empty test database; yields the context's connection"""
+    from ccpayroll.database import get_db
+    from ccpayroll.database.cache import employee_roster
+
+    with app.app_context():
+        with get_db() as conn:
+            conn.cursor().execute(f"TRUNCATE {', '.join(DATA_TABLES)}")
+            conn.commit()
+        employee_roster.invalidate()
+        yield conn
+
+@pytest.fixture
+def period(db):
+    """A pay period, as a dictionary of its columns"""
+    period = {'id': str(uuid.uuid4()), 'name': '01.06.25 to 01.12.25',
+              'start_date': '2025-01-06', 'end_date': '2025-01-12'}
+    cursor = db.cursor()
+    cursor.execute(
+        'INSERT INTO pay_periods (id, name, start_date, end_date) VALUES (%(id)s, %(name)s, %(start_date)s, %(end_date)s)',
+        period
+    )
+    db.commit()
+    return period
+
+def payroll_rows(employees, dated=False, start=None):
+    """Rows of a pay-period sheet laid out like the office's workbook
+
+    Args:
+        employees: Employee name to seven (project, hours, pay) tuples, one
+            per weekday starting Monday; None for an empty day
+        dated: Fill the DATE column from start, as our own exports do
+        start: First day of the period, a datetime.date
+    """
+    from datetime import timedelta
+    from ccpayroll.importer.parser import WEEKDAYS
+
+    rows = [('CREATIVE CLOSETS PAYROLL TIME SHEET',)]
+    for name, days in employees.items():
+        rows.append((name,))
+        rows.append(('DAY', 'DATE', 'PROJECT NAME', 'DAYS', 'INSTALL', 'HOURS', 'PAY'))
+        for i, (weekday, day) in enumerate(zip(WEEKDAYS, days)):
+            project, hours, pay = day or (None, None, None)
+            rows.append((weekday, start + timedelta(days=i) if dated else None, project, None, None, hours, pay))
+        rows.append(())
+    return rows
+
+@pytest.fixture
+def write_workbook(tmp_path):
+    """Write sheets (sheet name to rows) to an .xlsx after the template sheet and return its path"""
+    from openpyxl import Workbook
+    from ccpayroll.importer.parser import TEMPLATE_SHEET
+
+    def write(sheets, name='payroll.xlsx'):
+        workbook = Workbook()
+        workbook.active.title = TEMPLATE_SHEET
+        for title, rows in sheets.items():
+            sheet = workbook.create_sheet(title)
+            for row in rows:
+                sheet.append(row)
+        path = str(tmp_path / name)
+        workbook.save(path)
+        return path
+
+    return write
@@ -0,0 +1,51 @@
+"""
+Tests for the generated report cache (ccpayroll.reports.artifacts.ArtifactStore)
+"""
+
+import os
+import time
+from ccpayroll.reports.artifacts import ArtifactStore
+
+KEYS = ('0' * 32, '1' * 32)
+
+def _age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+def _build(text):
+    def build(path):
+        with open(path, 'w') as f:
+            f.write(text)
+    return build
+
+def test_cached_file_is_built_once(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    path = store.get_or_create(KEYS[0], 'report.csv', _build('first'))
+
+    assert store.get_or_create(KEYS[0], 'report.csv', _build('second')) == path
+    assert open(path).read() == 'first'
+    assert [name for name in os.listdir(tmp_path)] == [KEYS[0]]
+
+def test_eviction_only_removes_the_stores_own_entries(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_age=3600)
+    old = store.get_or_create(KEYS[0], 'chart.png', _build('old'))
+    _age(old, 7200)
+
+    # A file and a folder in the root that the store did not create
+    (tmp_path / 'logo.png').write_text('keep')
+    (tmp_path / 'charts').mkdir()
+    for name in ('logo.png', 'charts'):
+        _age(tmp_path / name, 7200)
+
+    store.get_or_create(KEYS[1], 'chart.png', _build('new'))
+
+    assert sorted(os.listdir(tmp_path)) == sorted([KEYS[1], 'logo.png', 'charts'])
+
+def test_size_limit_evicts_the_oldest_entries_first(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=5)
+    first = store.get_or_create(KEYS[0], 'a.csv', _build('12345'))
+    _age(first, 600)
+
+    store.get_or_create(KEYS[1], 'b.csv', _build('67890'))
+
+    assert os.listdir(tmp_path) == [KEYS[1]]
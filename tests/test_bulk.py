@@ -0,0 +1,79 @@
+"""
+Tests for the COPY-based bulk loader (ccpayroll.database.bulk)
+"""
+
+from ccpayroll.database.bulk import load_rows
+
+EMPLOYEE_COLUMNS = ('id', 'name', 'rate', 'position')
+
+def _employees(db):
+    cursor = db.cursor()
+    cursor.execute('SELECT id, name, rate, position FROM employees ORDER BY id')
+    return [tuple(row.values()) for row in cursor.fetchall()]
+
+def test_new_rows_are_inserted(db):
+    result = load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS,
+                       [('1', 'JOSE MEDINA', 22, 'lead'), ('2', 'VICTOR LAZO', 20, 'assistant')], key=('id',))
+    db.commit()
+
+    assert (result.table, result.staged, result.inserted, result.updated, result.unchanged) == \
+        ('employees', 2, 2, 0, 0)
+    assert _employees(db) == [('1', 'JOSE MEDINA', 22, 'lead'), ('2', 'VICTOR LAZO', 20, 'assistant')]
+
+def test_existing_rows_are_updated_and_counted_apart(db):
+    load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS, [('1', 'JOSE MEDINA', 22, 'lead')], key=('id',))
+
+    result = load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS,
+                       [('1', 'JOSE MEDINA', 25, 'lead'), ('2', 'VICTOR LAZO', 20, None)], key=('id',))
+    db.commit()
+
+    assert (result.staged, result.inserted, result.updated) == (2, 1, 1)
+    assert _employees(db) == [('1', 'JOSE MEDINA', 25, 'lead'), ('2', 'VICTOR LAZO', 20, None)]
+
+def test_duplicate_keys_merge_with_the_last_row_winning(db):
+    result = load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS,
+                       [('1', 'JOSE MEDINA', 22, 'lead'), ('1', 'JOSE MEDINA', 24, 'assistant')], key=('id',))
+    db.commit()
+
+    assert (result.staged, result.inserted) == (1, 1)
+    assert _employees(db) == [('1', 'JOSE MEDINA', 24, 'assistant')]
+
+def test_empty_update_leaves_existing_rows_alone(db):
+    load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS, [('1', 'JOSE MEDINA', 22, 'lead')], key=('id',))
+
+    result = load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS,
+                       [('9', 'JOSE MEDINA', 0, 'none'), ('2', 'VICTOR LAZO', 20, 'none')],
+                       key=('name',), update=())
+    db.commit()
+
+    assert (result.staged, result.inserted, result.updated, result.unchanged) == (2, 1, 0, 1)
+    assert _employees(db) == [('1', 'JOSE MEDINA', 22, 'lead'), ('2', 'VICTOR LAZO', 20, 'none')]
+
+def test_keep_existing_does_not_overwrite_with_null(db):
+    load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS, [('1', 'JOSE MEDINA', 22, 'lead')], key=('id',))
+
+    result = load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS, [('1', 'JOSE MEDINA', None, 'assistant')],
+                       key=('id',), keep_existing=True)
+    db.commit()
+
+    assert result.updated == 1
+    assert _employees(db) == [('1', 'JOSE MEDINA', 22, 'assistant')]
+
+def test_special_characters_survive_copy(db, period):
+    notes = 'tab\there, newline\nthere, backslash \\N and \\ and \r'
+    load_rows(db.cursor(), 'timesheet_entries', ('period_id', 'employee_name', 'day', 'notes', 'hours'),
+              [(period['id'], 'JOSE MEDINA', '2025-01-06', notes, None)], key=('period_id', 'employee_name', 'day'))
+    db.commit()
+
+    cursor = db.cursor()
+    cursor.execute('SELECT notes, hours FROM timesheet_entries WHERE period_id = %s', (period['id'],))
+    assert tuple(cursor.fetchone().values()) == (notes, None)
+
+def test_nothing_is_loaded_from_no_rows(db):
+    result = load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS, [], key=('id',))
+    assert (result.staged, result.inserted, result.updated) == (0, 0, 0)
+
+def test_load_is_undone_by_rollback(db):
+    load_rows(db.cursor(), 'employees', EMPLOYEE_COLUMNS, [('1', 'JOSE MEDINA', 22, 'lead')], key=('id',))
+    db.rollback()
+    assert _employees(db) == []
@@ -0,0 +1,63 @@
+"""
+Tests for install crew pay (ccpayroll.models.crew)
+
+Crew.calculate_period_pay follows the rules the timesheet page used to
+apply in the browser.
+"""
+
+from ccpayroll.models import Crew, TimesheetEntry
+
+def _employees(db, *rows):
+    cursor = db.cursor()
+    for i, (name, rate, crew, position) in enumerate(rows):
+        cursor.execute(
+            'INSERT INTO employees (id, name, rate, install_crew, position) VALUES (%s, %s, %s, %s, %s)',
+            (str(i), name, rate, crew, position)
+        )
+    db.commit()
+
+def _day(period, name, hours=None, install=None):
+    values = {'hours': hours, 'install': install}
+    TimesheetEntry.upsert(period['id'], name, '2025-01-06', {k: v for k, v in values.items() if v is not None})
+
+def test_lead_is_paid_the_install_less_assistant_pay_plus_hours(db, period):
+    _employees(db, ('ANA LEAD', 20, 1, 'lead'), ('BEN HELPER', 15, 1, 'assistant'), ('CAL HELPER', None, 1, 'assistant'))
+    _day(period, 'ANA LEAD', hours='2', install='500')
+    _day(period, 'BEN HELPER', hours='8')
+    _day(period, 'CAL HELPER', hours='4')
+
+    crew = Crew.calculate_period_pay(period['id'])[1]
+
+    assert crew['lead'] == 'ANA LEAD'
+    assert crew['days']['2025-01-06'] == {
+        'install': 500.0,
+        'assistants': {'BEN HELPER': 120.0, 'CAL HELPER': 0.0},
+        'assistant_pay': 120.0,
+        'lead_pay': 420.0
+    }
+
+def test_second_lead_is_not_paid_as_an_assistant(db, period):
+    _employees(db, ('ANA LEAD', 20, 1, 'lead'), ('BOB LEAD', 25, 1, 'lead'), ('CAL HELPER', 15, 1, 'assistant'))
+    _day(period, 'ANA LEAD', install='300')
+    _day(period, 'BOB LEAD', hours='8')
+    _day(period, 'CAL HELPER', hours='4')
+
+    crew = Crew.calculate_period_pay(period['id'])[1]
+
+    assert crew['lead'] == 'ANA LEAD'
+    assert crew['days']['2025-01-06']['assistants'] == {'CAL HELPER': 60.0}
+    assert crew['days']['2025-01-06']['lead_pay'] == 240.0
+
+def test_lead_without_a_rate_is_not_paid(db, period):
+    _employees(db, ('ANA LEAD', None, 1, 'lead'), ('CAL HELPER', 15, 1, 'assistant'))
+    _day(period, 'ANA LEAD', hours='2', install='300')
+    _day(period, 'CAL HELPER', hours='4')
+
+    day = Crew.calculate_period_pay(period['id'])[1]['days']['2025-01-06']
+
+    assert (day['install'], day['assistant_pay'], day['lead_pay']) == (300.0, 60.0, None)
+
+def test_employees_without_a_crew_number_are_left_out(db, period):
+    _employees(db, ('ANA LEAD', 20, None, 'lead'), ('BEN LEAD', 20, 2, 'lead'))
+
+    assert list(Crew.get_all()) == [2]
@@ -0,0 +1,20 @@
+"""
+Tests for the query plan checks (ccpayroll.database.explain)
+"""
+
+from ccpayroll.database.explain import explain_model_queries
+from ccpayroll.models import Employee, PayPeriod, TimesheetEntry
+
+def test_adjustment_grid_crew_and_report_queries_are_explained(db, period):
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO employees (id, name, rate, position, install_crew) VALUES ('1', 'JOSE MEDINA', 22, 'lead', 1)")
+    db.commit()
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '8', 'pay': '176'})
+    pay_period, employee = PayPeriod.get_by_id(period['id']), Employee.get_by_name('JOSE MEDINA')
+
+    results = explain_model_queries(pay_period, employee)
+
+    assert [result for result in results if result['error']] == []
+    explained = {result['label'] for result in results if result['sql']}
+    assert {'Adjustment.get_by_period', 'Adjustment.get_amounts', 'PeriodGrid.load',
+            'Crew.calculate_period_pay', 'aggregate_payroll'} <= explained
@@ -0,0 +1,149 @@
+"""
+Tests for incremental workbook imports (ccpayroll.importer.pipeline.import_workbook)
+
+Sheets are matched to earlier imports through import_manifest: unchanged
+sheets are skipped, changed ones reloaded and new ones added.
+"""
+
+from conftest import payroll_rows
+from ccpayroll.importer import import_workbook
+from ccpayroll.database.manifest import get_import_manifest
+
+FIRST = 'payroll 01.06.25 to 01.12.25'
+SECOND = 'payroll 01.13.25 to 01.19.25'
+WEEK = [('Job', 8, 160), ('Job', 6.5, 130), None, None, None, None, None]
+
+def _import(path):
+    return import_workbook(path, workers=1)
+
+def _entries(db, period_name):
+    cursor = db.cursor()
+    cursor.execute(
+        '''
+        SELECT t.employee_name, t.day, t.hours, t.pay, t.project_name, t.notes
+        FROM timesheet_entries t JOIN pay_periods p ON p.id = t.period_id
+        WHERE p.name = %s
+        ORDER BY t.employee_name, t.day
+        ''',
+        (period_name,)
+    )
+    rows = [dict(row) for row in cursor.fetchall()]
+    db.commit()
+    return rows
+
+def _set_notes(db, period_name, notes):
+    cursor = db.cursor()
+    cursor.execute(
+        'UPDATE timesheet_entries t SET notes = %s FROM pay_periods p WHERE p.id = t.period_id AND p.name = %s',
+        (notes, period_name)
+    )
+    db.commit()
+
+def test_first_import_adds_every_sheet(db, write_workbook):
+    path = write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK}),
+                           SECOND: payroll_rows({'JOSE MEDINA': WEEK, 'VICTOR LAZO': WEEK})})
+
+    summary = _import(path)
+
+    assert summary['new'] == ['01.06.25 to 01.12.25', '01.13.25 to 01.19.25']
+    assert (summary['changed'], summary['recorded'], summary['skipped'], summary['errors']) == ([], [], [], {})
+    assert summary['entries'] == 6
+    assert summary['loaded']['employees'].inserted == 2
+    assert set(get_import_manifest()) == {FIRST, SECOND}
+    assert [row['hours'] for row in _entries(db, '01.06.25 to 01.12.25')] == ['8', '6.5']
+
+def test_unchanged_sheets_are_skipped(db, write_workbook):
+    path = write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK})})
+    _import(path)
+    _set_notes(db, '01.06.25 to 01.12.25', 'edited in the app')
+
+    summary = _import(path)
+
+    assert (summary['new'], summary['changed'], summary['skipped']) == ([], [], ['01.06.25 to 01.12.25'])
+    assert summary['entries'] == 0
+    assert all(row['notes'] == 'edited in the app' for row in _entries(db, '01.06.25 to 01.12.25'))
+
+def test_changed_sheet_replaces_imported_columns_only(db, write_workbook):
+    _import(write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK}),
+                            SECOND: payroll_rows({'JOSE MEDINA': WEEK})}))
+    _set_notes(db, '01.06.25 to 01.12.25', 'edited in the app')
+
+    # Monday's hours change and Tuesday is cleared in the workbook
+    changed = [('Job', 9, 180)] + [None] * 6
+    summary = _import(write_workbook({FIRST: payroll_rows({'JOSE MEDINA': changed}),
+                                      SECOND: payroll_rows({'JOSE MEDINA': WEEK})}, name='changed.xlsx'))
+
+    assert summary['changed'] == ['01.06.25 to 01.12.25']
+    assert summary['skipped'] == ['01.13.25 to 01.19.25']
+    assert summary['new'] == []
+    rows = _entries(db, '01.06.25 to 01.12.25')
+    assert [(row['hours'], row['pay'], row['project_name']) for row in rows] == \
+        [('9', '180.00', 'Job'), (None, None, None)]
+    assert all(row['notes'] == 'edited in the app' for row in rows)
+
+def test_new_sheet_is_added_next_to_skipped_ones(db, write_workbook):
+    _import(write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK})}))
+
+    summary = _import(write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK}),
+                                      SECOND: payroll_rows({'JOSE MEDINA': WEEK})}, name='next.xlsx'))
+
+    assert (summary['new'], summary['skipped']) == (['01.13.25 to 01.19.25'], ['01.06.25 to 01.12.25'])
+    assert summary['entries'] == 2
+
+def test_existing_period_missing_from_manifest_is_recorded_not_overwritten(db, period, write_workbook):
+    cursor = db.cursor()
+    cursor.execute(
+        "INSERT INTO timesheet_entries (period_id, employee_name, day, hours, notes) "
+        "VALUES (%s, 'JOSE MEDINA', '2025-01-06', '99', 'entered by hand')",
+        (period['id'],)
+    )
+    db.commit()
+    path = write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK})})
+
+    summary = _import(path)
+
+    assert (summary['recorded'], summary['new'], summary['changed']) == (['01.06.25 to 01.12.25'], [], [])
+    assert get_import_manifest()[FIRST][0] == period['id']
+    assert [(row['hours'], row['notes']) for row in _entries(db, period['name'])] == [('99', 'entered by hand')]
+
+    # From now on the sheet is known, so an unchanged workbook skips it
+    assert _import(path)['skipped'] == ['01.06.25 to 01.12.25']
+
+def test_second_sheet_for_the_same_period_is_an_error(db, write_workbook):
+    # Both sheets are named for pay period 01.06.25 to 01.12.25
+    summary = _import(write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK}),
+                                      '01.06.25 to 01.12.25': payroll_rows({'VICTOR LAZO': WEEK})}))
+
+    assert summary['new'] == ['01.06.25 to 01.12.25']
+    assert list(summary['errors']) == ['01.06.25 to 01.12.25']
+    assert {row['employee_name'] for row in _entries(db, '01.06.25 to 01.12.25')} == {'JOSE MEDINA'}
+
+def test_deleted_period_is_imported_again(db, write_workbook):
+    path = write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK})})
+    _import(path)
+
+    cursor = db.cursor()
+    cursor.execute('DELETE FROM timesheet_entries')
+    cursor.execute('DELETE FROM pay_periods')
+    db.commit()
+    assert get_import_manifest() == {}
+
+    summary = _import(path)
+    assert summary['new'] == ['01.06.25 to 01.12.25']
+    assert summary['entries'] == 2
+    assert set(get_import_manifest()) == {FIRST}
+
+def test_changed_sheet_is_reported_when_another_period_shares_its_name(db, write_workbook):
+    _import(write_workbook({FIRST: payroll_rows({'JOSE MEDINA': WEEK})}))
+    cursor = db.cursor()
+    cursor.execute(
+        "INSERT INTO pay_periods (id, name, start_date, end_date) "
+        "VALUES ('zzz-copy', '01.06.25 to 01.12.25', '2025-01-06', '2025-01-12')"
+    )
+    db.commit()
+
+    changed = [('Job', 9, 180)] + [None] * 6
+    summary = _import(write_workbook({FIRST: payroll_rows({'JOSE MEDINA': changed})}, name='changed.xlsx'))
+
+    assert summary['changed'] == ['01.06.25 to 01.12.25']
+    assert summary['errors'] == {}
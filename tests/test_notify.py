@@ -0,0 +1,59 @@
+"""
+Tests for the change notification triggers (ccpayroll.database.notify)
+"""
+
+import os
+import select
+import psycopg2
+from ccpayroll.database.notify import CHANNEL, timesheet_key
+
+def _listen():
+    conn = psycopg2.connect(
+        host=os.environ.get('PG_HOST', 'localhost'),
+        port=os.environ.get('PG_PORT', '5432'),
+        user=os.environ.get('PG_USER', 'postgres'),
+        password=os.environ.get('PG_PASSWORD', 'postgres'),
+        dbname=os.environ['PG_DB']
+    )
+    conn.autocommit = True
+    conn.cursor().execute(f'LISTEN {CHANNEL}')
+    return conn
+
+def _payloads(conn):
+    payloads = []
+    while select.select([conn], [], [], 0.5) != ([], [], []):
+        conn.poll()
+        payloads.extend(notify.payload for notify in conn.notifies)
+        conn.notifies.clear()
+    return payloads
+
+def test_one_notification_per_period_and_statement(db, period):
+    cursor = db.cursor()
+    cursor.execute(
+        "INSERT INTO pay_periods (id, name, start_date, end_date) VALUES ('next', 'next', '2025-01-13', '2025-01-19')"
+    )
+    db.commit()
+    listener = _listen()
+    try:
+        cursor.execute(
+            '''
+            INSERT INTO timesheet_entries (period_id, employee_name, day, hours)
+            SELECT %s, 'JOSE MEDINA', day::date::text, '8'
+            FROM generate_series('2025-01-06'::date, '2025-01-12', '1 day') day
+            UNION ALL SELECT 'next', 'JOSE MEDINA', '2025-01-13', '8'
+            ''',
+            (period['id'],)
+        )
+        db.commit()
+        # A statement that changes no rows notifies nobody
+        cursor.execute("UPDATE employee_period_adjustments SET amount = 1")
+        cursor.execute(
+            "INSERT INTO employee_period_adjustments (period_id, employee_name, kind, amount) "
+            "VALUES ('next', 'JOSE MEDINA', 'bonus', 5)"
+        )
+        db.commit()
+
+        assert sorted(_payloads(listener)) == sorted([timesheet_key(period['id']), timesheet_key('next'),
+                                                      timesheet_key('next')])
+    finally:
+        listener.close()
@@ -0,0 +1,93 @@
+"""
+Tests for the payroll workbook parser (ccpayroll.importer.parser and parse_workbook)
+"""
+
+from datetime import date
+import pytest
+from conftest import payroll_rows
+from ccpayroll.importer import SheetPeriod, iter_sheet_records, content_hash, check_workbook_path, parse_workbook
+
+WEEK = [('Job', 8, 160), ('Job', 6.5, 130), None, None, ('Shop', 4, 80), None, None]
+
+def test_sheet_period_from_dated_name():
+    period = SheetPeriod.from_sheet_name('payroll 01.06.25 to 01.12.25')
+    assert period == SheetPeriod('payroll 01.06.25 to 01.12.25', '01.06.25 to 01.12.25', '2025-01-06', '2025-01-12')
+
+@pytest.mark.parametrize('sheet', ['payroll extra week', 'payroll 13.45.25 to 13.51.25'])
+def test_sheet_period_from_undated_name(sheet):
+    period = SheetPeriod.from_sheet_name(sheet)
+    assert (period.name, period.start_date, period.end_date) == (sheet.replace('payroll ', ''), None, None)
+
+def test_weekday_rows_take_the_period_dates():
+    period = SheetPeriod.from_sheet_name('payroll 01.06.25 to 01.12.25')
+    records = list(iter_sheet_records(payroll_rows({'JOSE MEDINA': WEEK, 'VICTOR LAZO': [None] * 7}), period))
+
+    jose = [record for record in records if record.employee == 'JOSE MEDINA']
+    assert [record.date for record in jose] == [f'2025-01-{day:02d}' for day in range(6, 13)]
+    assert (jose[0].hours, jose[0].pay, jose[0].project) == (8.0, 160.0, 'Job')
+    assert jose[0].entry_values() == {'hours': '8', 'pay': '160.00', 'project_name': 'Job'}
+    assert [record.is_blank for record in jose] == [False, False, True, True, False, True, True]
+    assert all(record.is_blank for record in records if record.employee == 'VICTOR LAZO')
+
+def test_undated_sheet_uses_the_date_column_or_skips_rows():
+    period = SheetPeriod.from_sheet_name('payroll extra week')
+
+    assert list(iter_sheet_records(payroll_rows({'JOSE MEDINA': WEEK}), period)) == []
+
+    rows = payroll_rows({'JOSE MEDINA': WEEK}, dated=True, start=date(2025, 3, 3))
+    records = list(iter_sheet_records(rows, period))
+    assert [record.date for record in records][:2] == ['2025-03-03', '2025-03-04']
+    assert records[4].project == 'Shop'
+
+def test_header_prefers_the_exact_pay_column():
+    rows = [
+        ('JOSE MEDINA',),
+        ('DAY', 'PAY TYPE', 'PROJECT NAME', 'HOURS', 'PAY'),
+        ('MONDAY', 'hourly', 'Job', '8', '$1,200.50'),
+    ]
+    period = SheetPeriod.from_sheet_name('payroll 01.06.25 to 01.12.25')
+
+    [record] = iter_sheet_records(rows, period)
+    assert (record.hours, record.pay) == (8.0, 1200.5)
+
+def test_content_hash_ignores_trailing_empty_cells():
+    rows = [('JOSE MEDINA', None, None), ('MONDAY', 8, 160)]
+    assert content_hash(rows) == content_hash([('JOSE MEDINA',), ('MONDAY', 8, 160, None)])
+    assert content_hash(rows) != content_hash([('JOSE MEDINA',), ('MONDAY', 8, 170)])
+
+def test_check_workbook_path_rejects_xls():
+    check_workbook_path('PAYROLL 2025.xlsx')
+    with pytest.raises(ValueError):
+        check_workbook_path('PAYROLL 2025.xls')
+
+def _sample_workbook(write_workbook):
+    return write_workbook({
+        'payroll extra week': payroll_rows({'JOSE MEDINA': WEEK}),
+        'payroll 01.13.25 to 01.19.25': payroll_rows({'JOSE MEDINA': WEEK}),
+        'payroll bonus week': payroll_rows({'VICTOR LAZO': WEEK}),
+        'payroll 01.06.25 to 01.12.25': payroll_rows({'JOSE MEDINA': WEEK, 'VICTOR LAZO': WEEK}),
+    })
+
+def test_parse_workbook_orders_dated_sheets_first(write_workbook):
+    sheets = parse_workbook(_sample_workbook(write_workbook), workers=1)
+
+    assert [sheet.period.name for sheet in sheets] == [
+        '01.06.25 to 01.12.25', '01.13.25 to 01.19.25', 'extra week', 'bonus week'
+    ]
+    assert [len(sheet.records) for sheet in sheets] == [14, 7, 0, 0]
+    assert not any(sheet.error for sheet in sheets)
+
+def test_parse_workbook_in_a_pool_matches_one_process(write_workbook):
+    path = _sample_workbook(write_workbook)
+    assert parse_workbook(path, workers=3) == parse_workbook(path, workers=1)
+
+def test_parse_workbook_skips_sheets_with_a_known_hash(write_workbook):
+    path = _sample_workbook(write_workbook)
+    first = {sheet.period.sheet: sheet.content_hash for sheet in parse_workbook(path, workers=1)}
+    known = {'payroll 01.06.25 to 01.12.25': first['payroll 01.06.25 to 01.12.25'],
+             'payroll extra week': 'stale'}
+
+    sheets = {sheet.period.sheet: sheet for sheet in parse_workbook(path, workers=1, known=known)}
+    assert sheets['payroll 01.06.25 to 01.12.25'].records is None
+    assert sheets['payroll extra week'].records == []
+    assert {name: sheet.content_hash for name, sheet in sheets.items()} == first
@@ -0,0 +1,87 @@
+"""
+Tests for the connection pool (ccpayroll.database.pool)
+"""
+
+import os
+import pytest
+from psycopg2 import extensions
+from ccpayroll.database import _connect, get_pool
+from ccpayroll.database.pool import ConnectionPool, PoolTimeout
+
+@pytest.fixture
+def pool(app):
+    with app.app_context():
+        pool = ConnectionPool(_connect, min_size=1, max_size=2, timeout=0.2)
+        yield pool
+        pool.closeall()
+
+def test_returned_connection_is_reused(pool):
+    conn = pool.getconn()
+    assert pool.size == 1 and pool.idle == 0
+
+    pool.putconn(conn)
+    assert pool.idle == 1
+    assert pool.getconn() is conn
+
+def test_checkout_opens_connections_up_to_max_size(pool):
+    first = pool.getconn()
+    second = pool.getconn()
+    assert first is not second
+    assert pool.size == 2
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+    pool.putconn(second)
+    assert pool.getconn() is second
+
+def test_returned_connection_is_rolled_back(pool):
+    conn = pool.getconn()
+    conn.cursor().execute('SELECT 1')
+    assert conn.info.transaction_status == extensions.TRANSACTION_STATUS_INTRANS
+
+    pool.putconn(conn)
+    assert conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+
+def test_closed_connection_is_replaced(pool):
+    conn = pool.getconn()
+    conn.close()
+    pool.putconn(conn)
+    assert pool.size == 0
+
+    replacement = pool.getconn()
+    assert replacement is not conn and not replacement.closed
+
+def test_expired_connection_is_retired(pool):
+    pool.max_age = 0
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.size == 0 and conn.closed
+
+def test_forked_child_does_not_end_parent_sessions(db):
+    parent_pool = get_pool()
+    conn = parent_pool.getconn()
+    parent_pool.putconn(conn)
+
+    pid = os.fork()
+    if pid == 0:
+        # The child gets a pool of its own; closing what it inherited must
+        # not reach the server
+        code = 1
+        try:
+            if get_pool() is not parent_pool:
+                conn.close()
+                parent_pool.closeall()
+                code = 0
+        finally:
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+    reused = parent_pool.getconn()
+    assert reused is conn
+    cursor = reused.cursor()
+    cursor.execute('SELECT 1 AS one')
+    assert cursor.fetchone()['one'] == 1
+    parent_pool.putconn(reused)
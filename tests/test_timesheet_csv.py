@@ -0,0 +1,43 @@
+"""
+Tests for the streaming timesheet CSV (ccpayroll.reports.timesheet_csv)
+"""
+
+from psycopg2 import extensions
+from ccpayroll.models.timesheet_entry import TimesheetEntry
+from ccpayroll.reports import timesheet_csv
+from ccpayroll.reports.timesheet_csv import iter_timesheet_csv
+
+def _employee(db):
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO employees (id, name, rate, position) VALUES ('1', 'JOSE MEDINA', 20, 'lead')")
+    db.commit()
+
+def test_csv_lists_entries_by_employee_and_day(db, period):
+    _employee(db)
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-07', {'regular_hours': '6', 'pay': '120'})
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'regular_hours': '8', 'pay': '160'})
+
+    lines = ''.join(iter_timesheet_csv([period['id']])).splitlines()
+
+    assert lines[0].startswith('Employee,Position,Date')
+    assert [line.split(',')[-1] for line in lines[1:]] == ['160', '120']
+    assert db.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+
+def test_abandoned_download_closes_its_cursor(db, period, monkeypatch):
+    _employee(db)
+    monkeypatch.setattr(timesheet_csv, 'FETCH_SIZE', 1)
+    for day in ('2025-01-06', '2025-01-07'):
+        TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', day, {'pay': '160'})
+
+    stream = iter_timesheet_csv([period['id']])
+    next(stream)
+    next(stream)
+    assert db.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE
+
+    # What the server does when the client goes away mid-download
+    stream.close()
+
+    assert db.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+    cursor = db.cursor()
+    cursor.execute('SELECT count(*) AS cursors FROM pg_cursors')
+    assert cursor.fetchone()['cursors'] == 0
@@ -0,0 +1,106 @@
+"""
+Tests for timesheet cell saves (TimesheetEntry.upsert and upsert_many)
+"""
+
+import pytest
+import psycopg2
+from ccpayroll.models.adjustment import Adjustment
+from ccpayroll.models.timesheet_entry import TimesheetEntry
+
+def _entry(db, period_id, employee_name, day):
+    cursor = db.cursor()
+    cursor.execute(
+        'SELECT * FROM timesheet_entries WHERE period_id = %s AND employee_name = %s AND day = %s',
+        (period_id, employee_name, day)
+    )
+    return cursor.fetchone()
+
+def test_upsert_inserts_then_updates_one_entry(db, period):
+    first = TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '8', 'pay': '160'})
+    second = TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '6.5', 'pay': '130'})
+
+    assert second['id'] == first['id']
+    assert (second['hours'], second['pay'], second['entries']) == (6.5, 130.0, 1)
+    entry = _entry(db, period['id'], 'JOSE MEDINA', '2025-01-06')
+    assert (entry['hours'], entry['pay']) == ('6.5', '130')
+
+def test_upsert_totals_include_other_days_and_reimbursement(db, period):
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '8', 'pay': '160'})
+    TimesheetEntry.upsert_many(period['id'], [
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'reimbursement', 'value': '12.50'}
+    ])
+
+    totals = TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-07',
+                                   {'hours': '4', 'pay': '80', 'overtime_hours': '1.5'})
+
+    assert totals['hours'] == 12.0
+    assert totals['pay'] == 240.0
+    assert totals['overtime_hours'] == 1.5
+    assert totals['reimbursement'] == 12.5
+    assert totals['entries'] == 2
+
+def test_upsert_writes_adjustments_in_the_same_transaction(db, period):
+    adjustments = {('JOSE MEDINA', 'reimbursement'): '25'}
+    totals = TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '8'}, adjustments)
+    assert totals['reimbursement'] == 25.0
+
+    # An entry that fails to save leaves the reimbursement as it was
+    with pytest.raises(psycopg2.Error):
+        TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-07', {'regular_hours': 'eight'},
+                              {('JOSE MEDINA', 'reimbursement'): '40'})
+    assert Adjustment.get_period_amounts(period['id']) == {'JOSE MEDINA': {'reimbursement': 25.0}}
+
+def test_upsert_only_writes_given_columns(db, period):
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'notes': 'kept', 'hours': '8'})
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '7'})
+
+    entry = _entry(db, period['id'], 'JOSE MEDINA', '2025-01-06')
+    assert (entry['hours'], entry['notes']) == ('7', 'kept')
+
+def test_upsert_writes_blank_number_columns_as_null(db, period):
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'regular_hours': '8'})
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'regular_hours': ''})
+
+    assert _entry(db, period['id'], 'JOSE MEDINA', '2025-01-06')['regular_hours'] is None
+
+def test_upsert_rejects_unknown_fields(db, period):
+    with pytest.raises(ValueError):
+        TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'period_id': 'other'})
+
+def test_upsert_many_merges_changes_to_the_same_entry(db, period):
+    totals = TimesheetEntry.upsert_many(period['id'], [
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'hours', 'value': '8'},
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'pay', 'value': '160'},
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'hours', 'value': '5'},
+        {'employee': 'VICTOR LAZO', 'day': '2025-01-07', 'field': 'pay', 'value': '100'},
+        {'employee': 'VICTOR LAZO', 'day': '2025-01-08', 'field': 'regular_hours', 'value': ''},
+    ])
+
+    assert sorted(totals) == ['JOSE MEDINA', 'VICTOR LAZO']
+    assert (totals['JOSE MEDINA']['hours'], totals['JOSE MEDINA']['pay']) == (5.0, 160.0)
+    assert (totals['VICTOR LAZO']['pay'], totals['VICTOR LAZO']['entries']) == (100.0, 2)
+    entry = _entry(db, period['id'], 'JOSE MEDINA', '2025-01-06')
+    assert (entry['hours'], entry['pay']) == ('5', '160')
+
+def test_upsert_many_sets_and_clears_adjustments(db, period):
+    TimesheetEntry.upsert_many(period['id'], [
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'reimbursement', 'value': '25'}
+    ])
+    totals = TimesheetEntry.upsert_many(period['id'], [
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'hours', 'value': '8'},
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-09', 'field': 'reimbursement', 'value': ''}
+    ])
+
+    assert totals['JOSE MEDINA']['reimbursement'] == 0.0
+    cursor = db.cursor()
+    cursor.execute('SELECT COUNT(*) FROM employee_period_adjustments WHERE period_id = %s', (period['id'],))
+    assert cursor.fetchone()['count'] == 0
+
+def test_upsert_many_rejects_unknown_fields_without_writing(db, period):
+    with pytest.raises(ValueError):
+        TimesheetEntry.upsert_many(period['id'], [
+            {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'hours', 'value': '8'},
+            {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'period_id', 'value': 'other'}
+        ])
+
+    assert _entry(db, period['id'], 'JOSE MEDINA', '2025-01-06') is None
@@ -0,0 +1,121 @@
+"""
+Tests for the employee_period_totals rollup (ccpayroll.database.totals)
+
+The triggers must leave the rollup exactly as rebuild_period_totals()
+would compute it from scratch.
+"""
+
+import uuid
+from ccpayroll.database.totals import rebuild_period_totals
+from ccpayroll.models.adjustment import Adjustment
+from ccpayroll.models.timesheet_entry import TimesheetEntry
+
+def _rollup(db):
+    cursor = db.cursor()
+    cursor.execute(
+        '''
+        SELECT period_id, employee_name, hours, pay, regular_hours, overtime_hours, entries, reimbursement
+        FROM employee_period_totals
+        ORDER BY period_id, employee_name
+        '''
+    )
+    rows = [dict(row) for row in cursor.fetchall()]
+    db.commit()
+    return rows
+
+def _assert_matches_rebuild(db):
+    maintained = _rollup(db)
+    rebuild_period_totals()
+    assert _rollup(db) == maintained
+    return maintained
+
+def test_rollup_follows_inserts_updates_and_deletes(db, period):
+    TimesheetEntry.upsert_many(period['id'], [
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'hours', 'value': '8'},
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-06', 'field': 'pay', 'value': '160'},
+        {'employee': 'JOSE MEDINA', 'day': '2025-01-07', 'field': 'hours', 'value': '6.5'},
+        {'employee': 'VICTOR LAZO', 'day': '2025-01-06', 'field': 'overtime_hours', 'value': '2'},
+        {'employee': 'VICTOR LAZO', 'day': '2025-01-06', 'field': 'reimbursement', 'value': '40'},
+    ])
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-07', {'hours': 'not a number', 'pay': '100'})
+
+    cursor = db.cursor()
+    cursor.execute(
+        "UPDATE timesheet_entries SET employee_name = 'SAMUEL CASTILLO' WHERE period_id = %s AND day = '2025-01-07'",
+        (period['id'],)
+    )
+    cursor.execute(
+        "DELETE FROM timesheet_entries WHERE period_id = %s AND employee_name = 'VICTOR LAZO'",
+        (period['id'],)
+    )
+    db.commit()
+
+    rows = {row['employee_name']: row for row in _assert_matches_rebuild(db)}
+    assert sorted(rows) == ['JOSE MEDINA', 'SAMUEL CASTILLO', 'VICTOR LAZO']
+    assert (rows['JOSE MEDINA']['hours'], rows['JOSE MEDINA']['pay']) == (8, 160)
+    assert (rows['SAMUEL CASTILLO']['hours'], rows['SAMUEL CASTILLO']['pay']) == (0, 100)
+    # Only the reimbursement is left for Victor
+    assert (rows['VICTOR LAZO']['entries'], rows['VICTOR LAZO']['reimbursement']) == (0, 40)
+
+def test_rollup_row_goes_when_nothing_is_left(db, period):
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '8'})
+    Adjustment.set_amounts(period['id'], {('JOSE MEDINA', 'reimbursement'): '15'})
+    Adjustment.set_amounts(period['id'], {('JOSE MEDINA', 'reimbursement'): '20'})
+    assert _assert_matches_rebuild(db)[0]['reimbursement'] == 20
+
+    Adjustment.set_amounts(period['id'], {('JOSE MEDINA', 'reimbursement'): None})
+    cursor = db.cursor()
+    cursor.execute('DELETE FROM timesheet_entries WHERE period_id = %s', (period['id'],))
+    db.commit()
+
+    assert _assert_matches_rebuild(db) == []
+
+def test_rebuild_of_one_period_leaves_others_alone(db, period):
+    other_id = str(uuid.uuid4())
+    cursor = db.cursor()
+    cursor.execute(
+        "INSERT INTO pay_periods (id, name, start_date, end_date) VALUES (%s, 'next', '2025-01-13', '2025-01-19')",
+        (other_id,)
+    )
+    db.commit()
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '8'})
+    TimesheetEntry.upsert(other_id, 'JOSE MEDINA', '2025-01-13', {'hours': '4'})
+
+    # Knock the other period's rollup out of step, then rebuild only the first
+    cursor.execute('UPDATE employee_period_totals SET hours = 99 WHERE period_id = %s', (other_id,))
+    db.commit()
+    rebuild_period_totals(period['id'])
+
+    hours = {row['period_id']: row['hours'] for row in _rollup(db)}
+    assert hours == {period['id']: 8, other_id: 99}
+
+def test_bulk_load_is_rolled_up_per_statement(db, period):
+    from ccpayroll.database.bulk import load_rows
+
+    columns = ('period_id', 'employee_name', 'day', 'hours', 'pay')
+    key = ('period_id', 'employee_name', 'day')
+    days = [f'2025-01-{day:02d}' for day in range(6, 13)]
+    load_rows(db.cursor(), 'timesheet_entries', columns,
+              [(period['id'], name, day, '8', '160') for name in ('JOSE MEDINA', 'VICTOR LAZO') for day in days],
+              key=key)
+    # One statement updating existing rows and inserting new ones
+    load_rows(db.cursor(), 'timesheet_entries', columns,
+              [(period['id'], 'JOSE MEDINA', day, '4', '80') for day in days[:3]] +
+              [(period['id'], 'SAMUEL CASTILLO', days[0], '2', '40')],
+              key=key)
+    db.commit()
+
+    rows = {row['employee_name']: row for row in _assert_matches_rebuild(db)}
+    assert (rows['JOSE MEDINA']['hours'], rows['JOSE MEDINA']['pay'], rows['JOSE MEDINA']['entries']) == (44, 880, 7)
+    assert (rows['VICTOR LAZO']['hours'], rows['SAMUEL CASTILLO']['entries']) == (56, 1)
+
+def test_deleting_a_period_drops_its_rollup(db, period):
+    TimesheetEntry.upsert(period['id'], 'JOSE MEDINA', '2025-01-06', {'hours': '8'})
+    Adjustment.set_amounts(period['id'], {('JOSE MEDINA', 'bonus'): '50', ('VICTOR LAZO', 'deduction'): '10'})
+
+    cursor = db.cursor()
+    cursor.execute('DELETE FROM timesheet_entries WHERE period_id = %s', (period['id'],))
+    cursor.execute('DELETE FROM pay_periods WHERE id = %s', (period['id'],))
+    db.commit()
+
+    assert _assert_matches_rebuild(db) == []